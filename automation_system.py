@@ -1,37 +1,382 @@
 import os
+import re
+import sys
+import errno
+import ctypes
+import ctypes.util
+import select
+import struct
+import bz2
+import gzip
+import lzma
+import bisect
+import tarfile
+import mmap
+import hashlib
 import shutil
+import fnmatch
+import sqlite3
+import zlib
+import math
+import uuid
+import socket
+import binascii
 import smtplib
-import schedule
 import time
+import heapq
+import random
 import requests
-import csv
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 import json
 from datetime import datetime, timedelta
 from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email import encoders
+from email.header import Header
+from email.utils import formatdate, make_msgid
 from pathlib import Path
+from urllib.parse import urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import logging
+import queue
+import atexit
+from logging.handlers import QueueHandler, RotatingFileHandler
+import threading
+from collections import deque
+from contextlib import closing, contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeout
 from typing import List, Dict, Optional
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+try:
+    import psutil
+except ImportError:
+    psutil = None
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('automation.log'),
-        logging.StreamHandler()
-    ]
-)
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any extra= fields"""
+    
+    STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'msg': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in self.STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class SizeAndTimeRotatingFileHandler(RotatingFileHandler):
+    """Rotate to numbered backups when the file reaches max_bytes or every rotate_interval seconds"""
+    
+    def __init__(self, filename: str, max_bytes: int = 50 * 1024 * 1024, backup_count: int = 10,
+                 rotate_interval: float = 86400):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        self.rotate_interval = rotate_interval
+        self.next_rollover = self.compute_rollover(time.time())
+    
+    def compute_rollover(self, now: float) -> float:
+        # Boundaries are counted from local midnight, so a daily interval rotates at midnight
+        midnight = datetime.fromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+        return midnight + ((now - midnight) // self.rotate_interval + 1) * self.rotate_interval
+    
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.rotate_interval and time.time() >= self.next_rollover:
+            return True
+        return super().shouldRollover(record)
+    
+    def doRollover(self):
+        super().doRollover()
+        self.next_rollover = self.compute_rollover(time.time())
+
+class AsyncLogWriter:
+    """Background thread that drains the log queue, samples repetitive messages and writes handlers"""
+    
+    def __init__(self, log_queue, handlers: List[logging.Handler], sample_limit: int = 20,
+                 sample_window: float = 10.0):
+        self.queue = log_queue
+        self.handlers = handlers
+        self.sample_limit = sample_limit  # Per message key and window; errors are never sampled
+        self.sample_window = sample_window
+        self.counts = {}
+        self.suppressed = {}
+        self.thread = None
+        self.stopping = object()
+    
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='log-writer', daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        """Flush everything queued so far and stop the writer"""
+        if self.thread:
+            self.queue.put(self.stopping)
+            self.thread.join()
+            self.thread = None
+    
+    def run(self):
+        window_end = time.monotonic() + self.sample_window
+        while True:
+            try:
+                record = self.queue.get(timeout=max(0.0, window_end - time.monotonic()))
+            except queue.Empty:
+                record = None
+            if record is self.stopping:
+                self.flush_window()
+                for handler in self.handlers:
+                    try:
+                        handler.flush()
+                    except (OSError, ValueError):
+                        pass  # Stream already closed at interpreter exit
+                return
+            if record is not None:
+                self.handle(record)
+            if time.monotonic() >= window_end:
+                self.flush_window()
+                window_end = time.monotonic() + self.sample_window
+    
+    def handle(self, record: logging.LogRecord):
+        if record.levelno < logging.ERROR:
+            # Hot loops tag their per-item messages with sample_key; otherwise identical text is one key
+            key = (record.name, record.levelno, getattr(record, 'sample_key', None) or record.getMessage())
+            count = self.counts[key] = self.counts.get(key, 0) + 1
+            if count > self.sample_limit:
+                self.suppressed[key] = self.suppressed.get(key, 0) + 1
+                return
+        self.emit(record)
+    
+    def flush_window(self):
+        """Emit one summary per suppressed message key and start a new sampling window"""
+        for (name, levelno, key), count in self.suppressed.items():
+            self.emit(logging.makeLogRecord({
+                'name': name, 'levelno': levelno, 'levelname': logging.getLevelName(levelno),
+                'msg': f"Suppressed {count} more '{key}' messages in the last {self.sample_window:g}s",
+                'suppressed': count, 'sample_key': key
+            }))
+        self.counts.clear()
+        self.suppressed.clear()
+    
+    def emit(self, record: logging.LogRecord):
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+def setup_logging(log_file: str = 'automation.log', level: int = logging.INFO, **options) -> AsyncLogWriter:
+    """Route logging through a queue so callers never wait on disk or console writes"""
+    rotation = {key: options.pop(key) for key in ('max_bytes', 'backup_count', 'rotate_interval')
+                if key in options}
+    file_handler = SizeAndTimeRotatingFileHandler(log_file, **rotation)
+    file_handler.setFormatter(JsonFormatter())
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    
+    log_queue = queue.SimpleQueue()
+    writer = AsyncLogWriter(log_queue, [file_handler, console_handler], **options)
+    writer.start()
+    atexit.register(writer.stop)
+    
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(QueueHandler(log_queue))
+    return writer
+
+log_writer = setup_logging()
+
+def file_checksum(file_path, algorithm: str = 'sha256', chunk_size: int = 1024 * 1024,
+                  mmap_threshold: int = 16 * 1024 * 1024) -> str:
+    """Return the hex digest of a file's contents"""
+    digest = hashlib.new(algorithm)
+    with open(file_path, 'rb') as f:
+        # Large files are hashed straight from a memory map, avoiding read() copies
+        if os.fstat(f.fileno()).st_size >= mmap_threshold:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                digest.update(mapped)
+        else:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+def _checksum_or_none(file_path) -> Optional[str]:
+    """file_checksum for worker pools; None when the file cannot be read"""
+    try:
+        return file_checksum(file_path)
+    except OSError:
+        return None
+
+class InotifyWatcher:
+    """Minimal ctypes binding to Linux inotify"""
+    
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_CLOEXEC = 0o2000000
+    EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+    
+    def __init__(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify is only available on Linux")
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+    
+    def add_watch(self, path: Path, mask: int) -> int:
+        """Watch a directory for the given event mask"""
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(str(path)), mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"Cannot watch {path}")
+        return wd
+    
+    def read_events(self, timeout: Optional[float]) -> List[tuple]:
+        """Wait up to timeout seconds and return (wd, mask, name) events"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        
+        buffer = os.read(self.fd, 64 * 1024)
+        events = []
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, length = self.EVENT_HEADER.unpack_from(buffer, offset)
+            offset += self.EVENT_HEADER.size
+            name = os.fsdecode(buffer[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            events.append((wd, mask, name))
+        return events
+    
+    def close(self):
+        os.close(self.fd)
+
+class OrganizerState:
+    """Persistent record of scanned directories and files left in place"""
+    
+    def __init__(self, db_path: str):
+        self.db_path = str(db_path)
+        with closing(sqlite3.connect(self.db_path)) as conn, conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS directories (
+                    path TEXT PRIMARY KEY,
+                    mtime_ns INTEGER NOT NULL,
+                    subdirs TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS entries (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    processed_at TEXT NOT NULL
+                );
+            """)
+    
+    def load(self) -> tuple:
+        """Return ({dir: (mtime_ns, subdirs)}, {path: (size, mtime_ns)})"""
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            directories = {
+                path: (mtime_ns, json.loads(subdirs))
+                for path, mtime_ns, subdirs in conn.execute("SELECT path, mtime_ns, subdirs FROM directories")
+            }
+            entries = {
+                path: (size, mtime_ns)
+                for path, size, mtime_ns in conn.execute("SELECT path, size, mtime_ns FROM entries")
+            }
+        return directories, entries
+    
+    def save(self, directories: Dict[str, tuple], entries: Dict[str, tuple]):
+        """Replace the stored state with this run's directories and left-behind entries"""
+        now = datetime.now().isoformat()
+        with closing(sqlite3.connect(self.db_path)) as conn, conn:
+            conn.execute("DELETE FROM directories")
+            conn.executemany(
+                "INSERT INTO directories (path, mtime_ns, subdirs) VALUES (?, ?, ?)",
+                ((path, mtime_ns, json.dumps(subdirs)) for path, (mtime_ns, subdirs) in directories.items())
+            )
+            conn.execute("DELETE FROM entries")
+            conn.executemany(
+                "INSERT INTO entries (path, size, mtime_ns, status, processed_at) VALUES (?, ?, ?, ?, ?)",
+                ((path, size, mtime_ns, status, now) for path, (size, mtime_ns, status) in entries.items())
+            )
+
+class HashCache:
+    """Persistent file hash cache keyed by (inode, size, mtime_ns)"""
+    
+    def __init__(self, db_path: str):
+        self.db_path = str(db_path)
+        self.new_entries = {}
+        with closing(sqlite3.connect(self.db_path)) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS hashes (
+                    inode INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    partial TEXT,
+                    full TEXT,
+                    PRIMARY KEY (inode, size, mtime_ns)
+                ) WITHOUT ROWID
+            """)
+            self.entries = {
+                (inode, size, mtime_ns): [partial, full]
+                for inode, size, mtime_ns, partial, full in conn.execute("SELECT * FROM hashes")
+            }
+    
+    def get(self, key: tuple, kind: str) -> Optional[str]:
+        entry = self.entries.get(key)
+        return entry[0 if kind == 'partial' else 1] if entry else None
+    
+    def put(self, key: tuple, kind: str, digest: str):
+        entry = self.entries.setdefault(key, [None, None])
+        entry[0 if kind == 'partial' else 1] = digest
+        self.new_entries[key] = entry
+    
+    def save(self):
+        """Write hashes computed during this run"""
+        with closing(sqlite3.connect(self.db_path)) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO hashes (inode, size, mtime_ns, partial, full) VALUES (?, ?, ?, ?, ?)",
+                ((*key, *entry) for key, entry in self.new_entries.items())
+            )
+        self.new_entries = {}
 
 class FileOrganizer:
     """Automated file organization system"""
     
-    def __init__(self, source_dir: str, organized_dir: str):
+    def __init__(self, source_dir: str, organized_dir: str, move_workers: int = 8,
+                 batch_size: int = 256, recursive: bool = False, dedup: Optional[str] = None,
+                 prune_source: bool = False):
         self.source_dir = Path(source_dir)
         self.organized_dir = Path(organized_dir)
         self.organized_dir.mkdir(exist_ok=True)
+        self.move_workers = move_workers
+        self.batch_size = batch_size
+        self.recursive = recursive
+        self.state = OrganizerState(self.organized_dir / '.organizer_state.db') if recursive else None
+        # Source subfolders the last run moved files out of; removed once empty only with prune_source
+        self.emptied_dirs = set()
+        self.prune_source = prune_source
+        # None, 'link' (hard-link duplicates to the organized copy) or 'skip' (delete duplicates)
+        self.dedup = dedup
+        self.hash_cache = HashCache(self.organized_dir / '.hash_cache.db') if dedup else None
+        self.last_stats = {}
+        # Browsers and download tools write to these, then rename to the final name
+        self.partial_suffixes = ('.part', '.crdownload', '.download', '.tmp', '.partial')
         
         # File type mappings
         self.file_types = {
@@ -44,79 +389,1065 @@ class FileOrganizer:
             'Archives': ['.zip', '.rar', '.7z', '.tar', '.gz', '.bz2'],
             'Code': ['.py', '.js', '.html', '.css', '.java', '.cpp', '.c', '.php']
         }
+        self.extension_map = self.build_extension_map()
+    
+    def build_extension_map(self) -> Dict[str, str]:
+        """Invert file_types into an extension -> category lookup"""
+        extension_map = {}
+        for category, extensions in self.file_types.items():
+            for extension in extensions:
+                # First category listing an extension wins, as with the linear scan
+                extension_map.setdefault(extension, category)
+        return extension_map
     
     def organize_files(self):
         """Organize files from source directory into categorized folders"""
+        self.last_stats = {}
         if not self.source_dir.exists():
             logging.error(f"Source directory {self.source_dir} does not exist")
             return
         
-        organized_count = 0
+        start = time.perf_counter()
+        self.extension_map = self.build_extension_map()  # Pick up edits to file_types
+        self.emptied_dirs = set()
+        name_index = {}
+        batch = []
+        futures = []
         
-        for file_path in self.source_dir.iterdir():
-            if file_path.is_file():
-                file_extension = file_path.suffix.lower()
-                category = self.get_file_category(file_extension)
-                
-                # Create category folder if it doesn't exist
-                category_folder = self.organized_dir / category
-                category_folder.mkdir(exist_ok=True)
-                
-                # Move file to appropriate category
-                destination = category_folder / file_path.name
-                
-                # Handle duplicate names
-                counter = 1
-                while destination.exists():
-                    stem = file_path.stem
-                    suffix = file_path.suffix
-                    destination = category_folder / f"{stem}_{counter}{suffix}"
-                    counter += 1
-                
-                try:
-                    shutil.move(str(file_path), str(destination))
-                    logging.info(f"Moved {file_path.name} to {category}")
-                    organized_count += 1
-                except Exception as e:
-                    logging.error(f"Error moving {file_path.name}: {e}")
+        if self.state:
+            known_dirs, left_behind = self.state.load()
+        else:
+            known_dirs, left_behind = {}, {}
+        scanned_dirs = {}
+        kept_entries = {}
+        
+        duplicates = {}
+        destinations = {}
         
-        logging.info(f"Organized {organized_count} files")
+        with ThreadPoolExecutor(max_workers=self.move_workers) as pool:
+            candidates = self.iter_candidates(known_dirs, scanned_dirs, left_behind, kept_entries)
+            if self.dedup:
+                # Duplicate detection needs the whole run's files up front
+                candidates = list(candidates)
+                duplicates = self.find_duplicates(candidates, pool)
+            
+            for entry, _ in candidates:
+                if entry.path in duplicates:
+                    continue
+                category = self.get_file_category(os.path.splitext(entry.name)[1].lower())
+                destination = self.reserve_destination(name_index, category, entry.name)
+                if self.dedup:
+                    destinations[entry.path] = destination
+                batch.append((entry.path, destination, category))
+                self.emptied_dirs.add(os.path.dirname(entry.path))
+                if len(batch) >= self.batch_size:
+                    futures.append(pool.submit(self.move_batch, batch))
+                    batch = []
+            if batch:
+                futures.append(pool.submit(self.move_batch, batch))
+            
+            organized_count = 0
+            organized_bytes = 0
+            for future in futures:
+                moved_count, moved_bytes, failed = future.result()
+                organized_count += moved_count
+                organized_bytes += moved_bytes
+                for source in failed:
+                    source_stat = os.stat(source)
+                    kept_entries[source] = (source_stat.st_size, source_stat.st_mtime_ns, 'failed')
+        
+        reclaimed = self.resolve_duplicates(duplicates, destinations, name_index) if duplicates else 0
+        if self.hash_cache:
+            self.hash_cache.save()
+        
+        if self.state:
+            self.save_state(known_dirs, scanned_dirs, kept_entries)
+        
+        duration = time.perf_counter() - start
+        self.last_stats = {
+            'files': organized_count,
+            'bytes': organized_bytes,
+            'directories': len(scanned_dirs),
+            'duplicates': len(duplicates),
+            'bytes_reclaimed': reclaimed,
+            'duration': round(duration, 3),
+            'files_per_sec': round(organized_count / duration, 1) if duration else 0.0
+        }
+        logging.info(f"Organized {organized_count} files ({self.last_stats['files_per_sec']} files/s)")
+        if duplicates:
+            logging.info(f"Deduplicated {len(duplicates)} files, reclaimed {reclaimed} bytes")
         return organized_count
     
+    def iter_candidates(self, known_dirs: Dict, scanned_dirs: Dict, left_behind: Dict, kept_entries: Dict):
+        """Yield (entry, stat) for files to organize this run"""
+        for entry in self.iter_source_files(known_dirs, scanned_dirs):
+            entry_stat = entry.stat()
+            previous = left_behind.get(entry.path)
+            # Files that failed to move before are retried only once they change
+            if previous and previous == (entry_stat.st_size, entry_stat.st_mtime_ns):
+                kept_entries[entry.path] = (*previous, 'failed')
+                continue
+            yield entry, entry_stat
+    
+    def find_duplicates(self, candidates: List[tuple], pool: ThreadPoolExecutor) -> Dict[str, str]:
+        """Map each incoming duplicate to the file it duplicates (organized path or incoming source)"""
+        # Size first: only files sharing a size with another file can be duplicates
+        by_size = {}
+        for path, file_stat in self.iter_organized_files():
+            by_size.setdefault(file_stat.st_size, []).append((path, file_stat, False))
+        for entry, file_stat in candidates:
+            by_size.setdefault(file_stat.st_size, []).append((entry.path, file_stat, True))
+        
+        groups = [
+            group for size, group in by_size.items()
+            if size > 0 and len(group) > 1 and any(incoming for _, _, incoming in group)
+        ]
+        # Then a hash of the head and tail, then the full contents, each within surviving groups
+        for kind in ('partial', 'full'):
+            members = [member for group in groups for member in group]
+            digests = dict(zip(
+                (path for path, _, _ in members),
+                pool.map(lambda member: self.cached_hash(member[0], member[1], kind), members)
+            ))
+            regrouped = []
+            for group in groups:
+                by_digest = {}
+                for member in group:
+                    by_digest.setdefault(digests[member[0]], []).append(member)
+                regrouped.extend(
+                    subgroup for digest, subgroup in by_digest.items()
+                    if digest and len(subgroup) > 1 and any(incoming for _, _, incoming in subgroup)
+                )
+            groups = regrouped
+        
+        duplicates = {}
+        for group in groups:
+            # Prefer keeping a file that is already organized
+            group.sort(key=lambda member: member[2])
+            original = group[0][0]
+            for path, _, incoming in group[1:]:
+                if incoming:
+                    duplicates[path] = original
+        return duplicates
+    
+    def iter_organized_files(self):
+        """Yield (path, stat) for every file already in organized_dir"""
+        pending_dirs = [str(self.organized_dir)]
+        while pending_dirs:
+            with os.scandir(pending_dirs.pop()) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        continue  # State and cache databases
+                    if entry.is_dir(follow_symlinks=False):
+                        pending_dirs.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry.path, entry.stat(follow_symlinks=False)
+    
+    def cached_hash(self, path: str, file_stat: os.stat_result, kind: str,
+                    sample_size: int = 64 * 1024) -> Optional[str]:
+        """Return a partial (head + tail) or full content hash, using the hash cache"""
+        key = (file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns)
+        digest = self.hash_cache.get(key, kind)
+        if digest:
+            return digest
+        
+        try:
+            if kind == 'full':
+                digest = file_checksum(path)
+            else:
+                hasher = hashlib.sha256()
+                with open(path, 'rb') as f:
+                    hasher.update(f.read(sample_size))
+                    if file_stat.st_size > 2 * sample_size:
+                        f.seek(-sample_size, os.SEEK_END)
+                    hasher.update(f.read(sample_size))
+                digest = hasher.hexdigest()
+        except OSError:
+            return None
+        self.hash_cache.put(key, kind, digest)
+        return digest
+    
+    def resolve_duplicates(self, duplicates: Dict[str, str], destinations: Dict[str, str], name_index: Dict) -> int:
+        """Hard-link or drop duplicate files, returning the bytes reclaimed"""
+        reclaimed = 0
+        for source, original in duplicates.items():
+            # An incoming original has been moved to its reserved destination by now
+            original = destinations.get(original, original)
+            try:
+                size = os.path.getsize(source)
+                if self.dedup == 'link':
+                    category = self.get_file_category(os.path.splitext(source)[1].lower())
+                    destination = self.reserve_destination(name_index, category, os.path.basename(source))
+                    os.link(original, destination)
+                    logging.info(f"Linked duplicate {os.path.basename(source)} to {original}")
+                else:
+                    logging.info(f"Skipped duplicate {os.path.basename(source)} (same as {original})")
+                os.unlink(source)
+                self.emptied_dirs.add(os.path.dirname(source))
+                reclaimed += size
+            except Exception as e:
+                logging.error(f"Error deduplicating {os.path.basename(source)}: {e}")
+        return reclaimed
+    
+    def iter_source_files(self, known_dirs: Dict[str, tuple], scanned_dirs: Dict[str, list]):
+        """Yield files to organize, descending into subfolders in recursive mode"""
+        organized_root = os.path.abspath(self.organized_dir)
+        pending_dirs = [str(self.source_dir)]
+        
+        while pending_dirs:
+            directory = pending_dirs.pop()
+            known = known_dirs.get(directory)
+            
+            # A directory whose mtime has not moved has the same entries as last run:
+            # nothing new to organize there, and its subfolders are already known
+            if known:
+                try:
+                    if os.stat(directory).st_mtime_ns == known[0]:
+                        scanned_dirs[directory] = known[1]
+                        pending_dirs.extend(known[1])
+                        continue
+                except OSError:
+                    continue  # Removed since last run
+            
+            subdirs = []
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if self.recursive and os.path.abspath(entry.path) != organized_root:
+                            subdirs.append(entry.path)
+                    elif entry.is_file() and not entry.name.endswith(self.partial_suffixes):
+                        yield entry
+            scanned_dirs[directory] = subdirs
+            pending_dirs.extend(subdirs)
+    
+    def save_state(self, known_dirs: Dict[str, tuple], scanned_dirs: Dict[str, list], kept_entries: Dict[str, tuple]):
+        """Record directory mtimes after this run's moves so unchanged subtrees are skipped next time"""
+        directories = {}
+        for directory, subdirs in scanned_dirs.items():
+            try:
+                directories[directory] = (os.stat(directory).st_mtime_ns, subdirs)
+            except OSError:
+                continue
+        self.state.save(directories, kept_entries)
+    
+    def watch(self, stop_event: Optional[threading.Event] = None, settle_time: float = 0.05,
+              initial_scan: bool = True):
+        """Organize files as they arrive in source_dir using inotify events"""
+        watcher = InotifyWatcher()
+        watcher.add_watch(self.source_dir, InotifyWatcher.IN_CLOSE_WRITE | InotifyWatcher.IN_MOVED_TO)
+        stop_event = stop_event or threading.Event()
+        name_index = {}
+        # Deadlines all use the same settle_time, so appending keeps the queue sorted;
+        # a newer close-write on the same name supersedes the queued entry
+        pending = {}
+        arrivals = deque()
+        
+        # Catch up on anything that arrived while nobody was watching
+        if initial_scan:
+            self.organize_files()
+        if self.recursive:
+            logging.warning(f"Watch mode only sees files arriving directly in {self.source_dir}; "
+                            f"subfolders are organized by scheduled runs")
+        # Organized files by size, so each arrival is only hashed against same-size candidates
+        size_index = self.build_size_index() if self.dedup else None
+        logging.info(f"Watching {self.source_dir} for new files")
+        
+        try:
+            while not stop_event.is_set():
+                timeout = arrivals[0][0] - time.monotonic() if arrivals else 1.0
+                for _, mask, name in watcher.read_events(max(min(timeout, 1.0), 0)):
+                    if mask & InotifyWatcher.IN_IGNORED:
+                        logging.error(f"Watched directory {self.source_dir} was removed")
+                        return
+                    if mask & InotifyWatcher.IN_Q_OVERFLOW:
+                        # The kernel dropped events; one rescan recovers them
+                        logging.warning("inotify queue overflowed, rescanning source directory")
+                        self.organize_files()
+                        name_index.clear()
+                        if self.dedup:
+                            size_index = self.build_size_index()
+                        continue
+                    if name and not name.endswith(self.partial_suffixes):
+                        deadline = time.monotonic() + settle_time
+                        pending[name] = deadline
+                        arrivals.append((deadline, name))
+                
+                now = time.monotonic()
+                while arrivals and arrivals[0][0] <= now:
+                    deadline, name = arrivals.popleft()
+                    if pending.get(name) == deadline:
+                        del pending[name]
+                        self.organize_file(self.source_dir / name, name_index, size_index)
+        finally:
+            watcher.close()
+    
+    def organize_file(self, file_path: Path, name_index: Dict, size_index: Optional[Dict] = None) -> bool:
+        """Move a single file into its category folder, deduplicating it first when size_index is given"""
+        if not file_path.is_file():
+            return False
+        if size_index is not None and self.deduplicate_file(file_path, name_index, size_index):
+            return True
+        
+        category = self.get_file_category(file_path.suffix.lower())
+        destination = self.reserve_destination(name_index, category, file_path.name)
+        # The index can go stale if something else writes to organized_dir; one stat catches that
+        while os.path.exists(destination):
+            destination = self.reserve_destination(name_index, category, file_path.name)
+        moved = self.move_batch([(str(file_path), destination, category)])[0] == 1
+        if moved and size_index is not None:
+            size_index.setdefault(os.path.getsize(destination), []).append(destination)
+        return moved
+    
+    def build_size_index(self) -> Dict[int, List[str]]:
+        """Map file size to the organized files of that size"""
+        size_index = {}
+        for path, file_stat in self.iter_organized_files():
+            size_index.setdefault(file_stat.st_size, []).append(path)
+        return size_index
+    
+    def deduplicate_file(self, file_path: Path, name_index: Dict, size_index: Dict[int, List[str]]) -> bool:
+        """Link or drop one arriving file if it duplicates an organized file; True if it was handled"""
+        try:
+            file_stat = file_path.stat()
+        except OSError:
+            return False
+        if not file_stat.st_size:
+            return False
+        
+        source = str(file_path)
+        for original in size_index.get(file_stat.st_size, []):
+            try:
+                original_stat = os.stat(original)
+            except OSError:
+                continue  # Moved or deleted since the index was built
+            # Same funnel as a full run: head and tail first, then the whole contents
+            for kind in ('partial', 'full'):
+                digest = self.cached_hash(source, file_stat, kind)
+                if not digest or digest != self.cached_hash(original, original_stat, kind):
+                    break
+            else:
+                self.resolve_duplicates({source: original}, {}, name_index)
+                self.hash_cache.save()
+                return True
+        return False
+    
+    def reserve_destination(self, name_index: Dict, category: str, name: str) -> str:
+        """Pick a free name in the category folder using an in-memory index of its contents"""
+        folder_index = name_index.get(category)
+        if folder_index is None:
+            # Create category folder if it doesn't exist, then list it once
+            category_folder = self.organized_dir / category
+            category_folder.mkdir(exist_ok=True)
+            folder_index = name_index[category] = {'names': set(os.listdir(category_folder)), 'counters': {}}
+        
+        names = folder_index['names']
+        destination_name = name
+        
+        # Handle duplicate names; counters resume where the last collision left off
+        if destination_name in names:
+            stem, suffix = os.path.splitext(name)
+            counter = folder_index['counters'].get(name, 1)
+            while f"{stem}_{counter}{suffix}" in names:
+                counter += 1
+            destination_name = f"{stem}_{counter}{suffix}"
+            folder_index['counters'][name] = counter + 1
+        
+        names.add(destination_name)
+        return str(self.organized_dir / category / destination_name)
+    
+    def move_batch(self, batch: List[tuple]) -> tuple:
+        """Move a batch of (source, destination, category) files; returns (moved, bytes moved, failed sources)"""
+        moved_count = 0
+        moved_bytes = 0
+        failed = []
+        for source, destination, category in batch:
+            try:
+                size = os.path.getsize(source)
+                shutil.move(source, destination)
+                logging.info(f"Moved {os.path.basename(source)} to {category}", extra={'sample_key': 'file_moved'})
+                moved_count += 1
+                moved_bytes += size
+            except Exception as e:
+                logging.error(f"Error moving {os.path.basename(source)}: {e}")
+                if os.path.exists(source):
+                    failed.append(source)
+        return moved_count, moved_bytes, failed
+    
     def get_file_category(self, extension: str) -> str:
         """Determine file category based on extension"""
-        for category, extensions in self.file_types.items():
-            if extension in extensions:
-                return category
-        return 'Other'
+        return self.extension_map.get(extension, 'Other')
     
-    def clean_empty_folders(self, directory: Path = None):
-        """Remove empty folders from directory"""
+    def clean_empty_folders(self, directory: Path = None, touched: Optional[set] = None):
+        """Remove empty folders from directory, or only from the touched folders and their parents"""
         if directory is None:
             directory = self.organized_dir
+        top = os.path.abspath(directory)
+        
+        if touched is None:
+            # Single bottom-up pass over the whole tree
+            candidates = [root for root, _, _ in os.walk(directory, topdown=False)]
+        else:
+            # Never prune outside directory, whatever the caller passes in
+            candidates = [path for path in touched
+                          if os.path.commonpath([top, os.path.abspath(path)]) == top]
+            candidates.sort(key=lambda path: path.count(os.sep), reverse=True)
         
-        for folder in directory.iterdir():
-            if folder.is_dir():
-                self.clean_empty_folders(folder)
+        roots = {top, os.path.abspath(self.source_dir), os.path.abspath(self.organized_dir)}
+        removed = set()
+        for folder in candidates:
+            # Deepest first; removing a folder may leave its parent empty
+            while folder and os.path.abspath(folder) not in roots and folder not in removed:
                 try:
-                    if not any(folder.iterdir()):
-                        folder.rmdir()
-                        logging.info(f"Removed empty folder: {folder}")
+                    os.rmdir(folder)  # Fails on non-empty folders, so no listing needed
                 except OSError:
-                    pass
+                    break
+                removed.add(folder)
+                logging.info(f"Removed empty folder: {folder}")
+                if touched is None:
+                    break
+                folder = os.path.dirname(folder)
+        return len(removed)
+
+class RenameRule:
+    """Regex rename step: re.sub with replacement, or a format template for the whole name on match"""
+    
+    def __init__(self, pattern: str, replacement: Optional[str] = None, template: Optional[str] = None,
+                 flags: int = 0):
+        if (replacement is None) == (template is None):
+            raise ValueError("A rename rule needs exactly one of replacement or template")
+        self.regex = re.compile(pattern, flags)
+        self.replacement = replacement
+        # Template fields: regex groups ({0}, {1}, {name}), stem, suffix, n, mtime, e.g. "{mtime:%Y%m%d}_{n:04d}{suffix}"
+        self.template = template
+    
+    def apply(self, name: str, context: Dict) -> str:
+        if self.replacement is not None:
+            return self.regex.sub(self.replacement, name)
+        match = self.regex.search(name)
+        if not match:
+            return name
+        dot = name.rfind('.')
+        stem, suffix = (name[:dot], name[dot:]) if dot > 0 else (name, '')
+        fields = {'stem': stem, 'suffix': suffix, **context, **match.groupdict()}
+        return self.template.format(match.group(0), *match.groups(), **fields)
+
+class RenameEngine:
+    """Plan a whole rename set up front, then apply it in parallel batches with an undo journal"""
+    
+    def __init__(self, directory: str, workers: int = 8, batch_size: int = 1024,
+                 journal_dir: str = 'rename_journals', keep_journals: int = 20):
+        self.directory = Path(directory)
+        self.workers = workers
+        self.batch_size = batch_size
+        # Journals live with the other state files, not in the folder being renamed
+        self.journal_dir = Path(journal_dir)
+        self.keep_journals = keep_journals  # Finished journals kept for undo; interrupted ones are never pruned
+    
+    def plan(self, rules: List[RenameRule], match: str = '*', recursive: bool = False) -> Dict:
+        """Compute every (source, target) pair and all conflicts without touching the disk"""
+        names = {}  # directory -> names present, for collision checks
+        candidates = []
+        stack = [str(self.directory)]
+        while stack:
+            current = stack.pop()
+            present = names[current] = set()
+            with os.scandir(current) as it:
+                for entry in it:
+                    present.add(entry.name)
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive:
+                            stack.append(entry.path)
+                    elif fnmatch.fnmatchcase(entry.name, match) and not entry.name.startswith('.rename'):
+                        candidates.append((current, entry.name, entry))
+        candidates.sort()  # Names are unique per directory, so entries themselves are never compared
+        
+        moves = []
+        conflicts = []
+        # Skip the per-file stat unless a template asks for the modification time
+        needs_mtime = any(rule.template and 'mtime' in rule.template for rule in rules)
+        for index, (parent, name, entry) in enumerate(candidates, 1):
+            context = {'n': index}
+            if needs_mtime:
+                context['mtime'] = datetime.fromtimestamp(entry.stat(follow_symlinks=False).st_mtime)
+            new_name = name
+            try:
+                for rule in rules:
+                    new_name = rule.apply(new_name, context)
+            except (IndexError, KeyError, ValueError) as e:
+                conflicts.append((entry.path, None, f"template error: {e}"))
+                continue
+            if new_name == name:
+                continue
+            if not new_name or new_name in ('.', '..') or '/' in new_name or os.sep in new_name:
+                conflicts.append((entry.path, new_name, 'invalid name'))
+                continue
+            moves.append((parent, name, new_name))
+        
+        # A target is free if nothing holds the name after every source has moved away
+        sources = {(parent, name) for parent, name, _ in moves}
+        targets = {}
+        for parent, name, new_name in moves:
+            source = f"{parent}{os.sep}{name}"
+            if (parent, new_name) in targets:
+                conflicts.append((source, new_name, f"same target as {targets[parent, new_name]}"))
+            elif new_name in names[parent] and (parent, new_name) not in sources:
+                conflicts.append((source, new_name, 'target exists'))
+            targets.setdefault((parent, new_name), source)
+        
+        return {
+            'moves': [(f"{parent}{os.sep}{name}", f"{parent}{os.sep}{new_name}") for parent, name, new_name in moves],
+            'conflicts': conflicts
+        }
+    
+    def execute(self, plan: Dict) -> Dict:
+        """Apply a conflict-free plan completely, or roll it back on the first failure"""
+        if plan['conflicts']:
+            logging.error(f"Rename plan has {len(plan['conflicts'])} conflicts, first: {plan['conflicts'][0]}")
+            return {'status': 'CONFLICTS', 'renamed': 0, 'conflicts': plan['conflicts']}
+        if not plan['moves']:
+            return {'status': 'SUCCESS', 'renamed': 0, 'duration': 0.0, 'files_per_sec': 0.0, 'journal': None}
+        
+        start = time.perf_counter()
+        moves = self.with_temporaries(plan['moves'])
+        self.journal_dir.mkdir(parents=True, exist_ok=True)
+        journal_path = self.journal_dir / f".rename_journal_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.jsonl"
+        with open(journal_path, 'w') as journal:
+            journal.write(json.dumps({'directory': str(self.directory), 'moves': moves}) + '\n')
+            journal.flush()
+            os.fsync(journal.fileno())
+        
+        try:
+            self.run_phases(moves, journal_path)
+        except OSError as e:
+            logging.error(f"Rename failed, rolling back: {e}")
+            self.undo(journal_path)
+            return {'status': 'ROLLED_BACK', 'renamed': 0, 'error': str(e), 'journal': str(journal_path)}
+        
+        self.prune_journals()
+        duration = time.perf_counter() - start
+        logging.info(f"Renamed {len(moves)} files in {duration:.2f}s, undo journal {journal_path}")
+        return {
+            'status': 'SUCCESS',
+            'renamed': len(moves),
+            'duration': round(duration, 3),
+            'files_per_sec': round(len(moves) / duration, 1) if duration else 0.0,
+            'journal': str(journal_path)
+        }
+    
+    def prune_journals(self):
+        """Delete the oldest finished journals beyond keep_journals"""
+        finished = []
+        # Names carry a sortable timestamp, so this is oldest first
+        for journal_path in sorted(self.journal_dir.glob('.rename_journal_*.jsonl')):
+            try:
+                # The last state mark is a short line at the end; the move list can be large
+                with open(journal_path, 'rb') as journal:
+                    journal.seek(max(0, journal_path.stat().st_size - 256))
+                    state = json.loads(journal.read().splitlines()[-1]).get('state')
+            except (OSError, ValueError, IndexError):
+                continue
+            if state in ('committed', 'undone'):
+                finished.append(journal_path)
+        for journal_path in finished[:max(0, len(finished) - self.keep_journals)]:
+            journal_path.unlink(missing_ok=True)
+    
+    @staticmethod
+    def with_temporaries(moves: List[tuple]) -> List[list]:
+        """Give a temporary name to every move whose target is another move's source (chains and cycles)"""
+        sources = {source for source, _ in moves}
+        token = uuid.uuid4().hex[:8]
+        return [[source, target, os.path.join(os.path.dirname(source), f".rename-{token}-{index}")
+                 if target in sources else None]
+                for index, (source, target) in enumerate(moves)]
+    
+    def run_phases(self, moves: List[list], journal_path: Path):
+        # Phase 1 vacates every source name: direct moves land on free names, the rest park on temporaries
+        self.rename_parallel([(source, temp or target) for source, target, temp in moves])
+        self.mark(journal_path, 'phase1')
+        self.rename_parallel([(temp, target) for _, target, temp in moves if temp])
+        self.mark(journal_path, 'committed')
+    
+    @staticmethod
+    def mark(journal_path: Path, state: str):
+        with open(journal_path, 'a') as journal:
+            journal.write(json.dumps({'state': state}) + '\n')
+            journal.flush()
+            os.fsync(journal.fileno())
+    
+    def rename_parallel(self, pairs: List[tuple]):
+        """Rename in batches on a thread pool; raise the first error after in-flight batches finish"""
+        batches = [pairs[i:i + self.batch_size] for i in range(0, len(pairs), self.batch_size)]
+        if not batches:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(batches))) as pool:
+            futures = [pool.submit(self.rename_batch, batch) for batch in batches]
+            for future in as_completed(futures):
+                if future.exception():
+                    for pending in futures:
+                        pending.cancel()
+                    raise future.exception()
+    
+    @staticmethod
+    def rename_batch(pairs: List[tuple]):
+        for source, target in pairs:
+            # Guard against files created after planning; os.rename would silently replace them
+            if os.path.lexists(target):
+                raise FileExistsError(errno.EEXIST, "Rename target appeared after planning", target)
+            os.rename(source, target)
+    
+    def undo(self, journal_path: str) -> Dict:
+        """Move every file in a journal back to its original name, wherever the run stopped"""
+        journal_path = Path(journal_path)
+        with open(journal_path) as journal:
+            moves = json.loads(journal.readline())['moves']
+            states = {json.loads(line)['state'] for line in journal if line.strip()}
+        
+        # Work out where each file is now from the last completed phase
+        reverse = []
+        for source, target, temp in moves:
+            if 'committed' in states:
+                current = target
+            elif 'phase1' in states:
+                current = temp if temp and os.path.lexists(temp) else target
+            elif temp:
+                current = temp if os.path.lexists(temp) else source
+            else:
+                current = target if os.path.lexists(target) and not os.path.lexists(source) else source
+            if current != source:
+                reverse.append((current, source))
+        
+        # Reverse moves can form chains and cycles too, so they go through the same two phases
+        undo_moves = self.with_temporaries(reverse)
+        self.rename_parallel([(current, temp or source) for current, source, temp in undo_moves])
+        self.rename_parallel([(temp, source) for _, source, temp in undo_moves if temp])
+        self.mark(journal_path, 'undone')
+        logging.info(f"Undid {len(reverse)} renames from {journal_path}")
+        return {'status': 'UNDONE', 'restored': len(reverse)}
+
+class CopyEngine:
+    """Parallel file copier using kernel-side copies where available"""
+    
+    FICLONE = 0x40049409  # Linux ioctl for reflink (copy-on-write) clones
+    
+    def __init__(self, max_workers: int = 8, max_pending: int = 256):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.use_reflink = fcntl is not None
+        self.use_copy_file_range = hasattr(os, 'copy_file_range')
+        self.use_sendfile = hasattr(os, 'sendfile') and sys.platform.startswith('linux')
+    
+    def copy_file(self, source: str, destination: str) -> int:
+        """Copy one file with its metadata, returning the number of bytes copied"""
+        with open(source, 'rb') as src, open(destination, 'wb') as dst:
+            size = os.fstat(src.fileno()).st_size
+            if not self.kernel_copy(src.fileno(), dst.fileno(), size):
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+        shutil.copystat(source, destination)
+        return size
+    
+    def kernel_copy(self, src_fd: int, dst_fd: int, size: int) -> bool:
+        """Try reflink, copy_file_range and sendfile in turn; False if none applies"""
+        if self.use_reflink:
+            try:
+                fcntl.ioctl(dst_fd, self.FICLONE, src_fd)
+                return True
+            except OSError:
+                pass  # Filesystem without reflink support (or different devices)
+        
+        for method in ('copy_file_range', 'sendfile'):
+            if not getattr(self, f"use_{method}"):
+                continue
+            copied = 0
+            try:
+                while copied < size:
+                    if method == 'copy_file_range':
+                        sent = os.copy_file_range(src_fd, dst_fd, size - copied)
+                    else:
+                        sent = os.sendfile(dst_fd, src_fd, copied, size - copied)
+                    if sent == 0:
+                        break
+                    copied += sent
+                return True
+            except OSError as e:
+                if e.errno in (errno.ENOSYS, errno.EPERM):
+                    setattr(self, f"use_{method}", False)
+                if copied:
+                    os.lseek(src_fd, 0, os.SEEK_SET)
+                    os.lseek(dst_fd, 0, os.SEEK_SET)
+                    os.ftruncate(dst_fd, 0)
+        return False
+    
+    def walk(self, source_dir: str, target_dir: str, directories: List[tuple]):
+        """Yield (source, destination) file pairs, creating directories on the way"""
+        os.makedirs(target_dir, exist_ok=True)
+        with os.scandir(source_dir) as entries:
+            for entry in entries:
+                destination = os.path.join(target_dir, entry.name)
+                if entry.is_symlink():
+                    if os.path.lexists(destination):
+                        os.unlink(destination)
+                    os.symlink(os.readlink(entry.path), destination)
+                elif entry.is_dir():
+                    directories.append((entry.path, destination))
+                    yield from self.walk(entry.path, destination, directories)
+                elif entry.is_file():
+                    yield entry.path, destination
+    
+    def copy_tree(self, source_dir: Path, target_dir: Path, pool: ThreadPoolExecutor) -> Dict:
+        """Copy a directory tree through the shared worker pool"""
+        start = time.perf_counter()
+        stats = {'source': str(source_dir), 'files': 0, 'bytes': 0, 'errors': []}
+        pending = threading.BoundedSemaphore(self.max_pending)
+        lock = threading.Lock()
+        directories = []
+        futures = []
+        
+        def copy_one(source, destination):
+            try:
+                copied = self.copy_file(source, destination)
+                with lock:
+                    stats['files'] += 1
+                    stats['bytes'] += copied
+            except Exception as e:
+                with lock:
+                    stats['errors'].append((source, str(e)))
+            finally:
+                pending.release()
+        
+        try:
+            for source, destination in self.walk(str(source_dir), str(target_dir), directories):
+                # Bound the queue so huge trees are not materialised in memory
+                pending.acquire()
+                futures.append(pool.submit(copy_one, source, destination))
+        except Exception as e:
+            stats['errors'].append((str(source_dir), str(e)))
+        
+        for future in futures:
+            future.result()
+        
+        # Directory timestamps last, since copying into them changes mtime
+        for source, destination in reversed(directories):
+            try:
+                shutil.copystat(source, destination)
+            except OSError:
+                pass
+        
+        stats['duration'] = time.perf_counter() - start
+        return self.add_rates(stats)
+    
+    def copy_trees(self, jobs: List[tuple]) -> Dict:
+        """Copy several (source_dir, target_dir) trees concurrently"""
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool, \
+                ThreadPoolExecutor(max_workers=max(len(jobs), 1)) as walkers:
+            trees = list(walkers.map(lambda job: self.copy_tree(job[0], job[1], pool), jobs))
+        
+        run = {
+            'trees': trees,
+            'files': sum(tree['files'] for tree in trees),
+            'bytes': sum(tree['bytes'] for tree in trees),
+            'duration': time.perf_counter() - start
+        }
+        self.add_rates(run)
+        logging.info(f"Copied {run['files']} files ({run['bytes']} bytes) in {run['duration']}s: "
+                     f"{run['files_per_sec']} files/s, {run['bytes_per_sec']} bytes/s")
+        return run
+    
+    @staticmethod
+    def add_rates(stats: Dict) -> Dict:
+        """Add files/sec and bytes/sec figures to a stats dict"""
+        duration = stats['duration']
+        stats['duration'] = round(duration, 3)
+        stats['files_per_sec'] = round(stats['files'] / duration, 1) if duration else 0.0
+        stats['bytes_per_sec'] = round(stats['bytes'] / duration) if duration else 0
+        return stats
+
+class _BlockCompressor:
+    """File-like sink that compresses fixed-size blocks in parallel, written in order"""
+    
+    def __init__(self, output, compress, block_size: int, pool: ThreadPoolExecutor, max_pending: int):
+        self.output = output
+        self.compress = compress
+        self.block_size = block_size
+        self.pool = pool
+        self.max_pending = max_pending
+        self.buffer = bytearray()
+        self.pending = deque()
+        self.blocks = []  # [uncompressed_offset, compressed_offset, compressed_length]
+        self.uncompressed_offset = 0
+        self.compressed_offset = 0
+    
+    def write(self, data) -> int:
+        self.buffer += data
+        while len(self.buffer) >= self.block_size:
+            self.submit(bytes(self.buffer[:self.block_size]))
+            del self.buffer[:self.block_size]
+        return len(data)
+    
+    def submit(self, block: bytes):
+        self.pending.append((self.uncompressed_offset, self.pool.submit(self.compress, block)))
+        self.uncompressed_offset += len(block)
+        # Keep at most max_pending blocks in memory
+        while len(self.pending) > self.max_pending:
+            self.drain_one()
+    
+    def drain_one(self):
+        offset, future = self.pending.popleft()
+        compressed = future.result()
+        self.output.write(compressed)
+        self.blocks.append([offset, self.compressed_offset, len(compressed)])
+        self.compressed_offset += len(compressed)
+    
+    def close(self):
+        if self.buffer:
+            self.submit(bytes(self.buffer))
+            self.buffer.clear()
+        while self.pending:
+            self.drain_one()
+
+class ArchiveBackup:
+    """Streaming tar archives with parallel block compression and a seekable index"""
+    
+    # Concatenated gzip members, xz streams and bz2 streams are each still one valid archive
+    COMPRESSORS = {
+        'gzip': ('.tar.gz', lambda data, level: gzip.compress(data, compresslevel=level, mtime=0), gzip.decompress),
+        'lzma': ('.tar.xz', lambda data, level: lzma.compress(data, preset=level), lzma.decompress),
+        'bz2': ('.tar.bz2', lambda data, level: bz2.compress(data, compresslevel=max(level, 1)), bz2.decompress)
+    }
+    # tarfile's own stream reader stops after the first gzip member, so decompress outside it
+    OPENERS = {'gzip': gzip.open, 'lzma': lzma.open, 'bz2': bz2.open}
+    
+    def __init__(self, compression: str = 'gzip', level: int = 6, block_size: int = 4 * 1024 * 1024,
+                 workers: Optional[int] = None):
+        if compression not in self.COMPRESSORS:
+            raise ValueError(f"Unsupported compression: {compression}")
+        self.compression = compression
+        self.suffix, compress, self.decompress = self.COMPRESSORS[compression]
+        self.compress = lambda data: compress(data, level)
+        self.block_size = block_size
+        self.workers = workers or os.cpu_count() or 1
+    
+    def create_archive(self, source_dir: Path, archive_path: Path) -> Dict:
+        """Stream a directory into a block-compressed tar and write its index"""
+        start = time.perf_counter()
+        source_dir = Path(source_dir)
+        archive_path = Path(archive_path)
+        temp_path = archive_path.with_name(archive_path.name + '.tmp')
+        members = {}
+        
+        with open(temp_path, 'wb') as output, ThreadPoolExecutor(max_workers=self.workers) as pool:
+            sink = _BlockCompressor(output, self.compress, self.block_size, pool, self.workers * 2)
+            with tarfile.open(fileobj=sink, mode='w|', format=tarfile.PAX_FORMAT) as tar:
+                for root, dirs, files in os.walk(source_dir):
+                    dirs.sort()
+                    for name in dirs + sorted(files):
+                        path = Path(root) / name
+                        arcname = path.relative_to(source_dir).as_posix()
+                        tarinfo = tar.gettarinfo(str(path), arcname)
+                        if tarinfo is None:
+                            continue  # Sockets, devices and other unsupported types
+                        if tarinfo.islnk():
+                            # Every name gets its own data so the index can find and extract it
+                            tarinfo.type = tarfile.REGTYPE
+                            tarinfo.linkname = ''
+                            tarinfo.size = path.stat().st_size
+                        if tarinfo.isreg():
+                            with open(path, 'rb') as f:
+                                tar.addfile(tarinfo, f)
+                            # File data ends at the 512-byte padded boundary before tar.offset
+                            padded_size = -(-tarinfo.size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+                            members[arcname] = {
+                                'offset': tar.offset - padded_size,
+                                'size': tarinfo.size,
+                                'mode': tarinfo.mode,
+                                'mtime': tarinfo.mtime
+                            }
+                        else:
+                            tar.addfile(tarinfo)
+            sink.close()
+        
+        index = {'compression': self.compression, 'blocks': sink.blocks, 'members': members}
+        index_path = self.index_path(archive_path)
+        with open(index_path.with_name(index_path.name + '.tmp'), 'w') as f:
+            json.dump(index, f)
+        os.replace(index_path.with_name(index_path.name + '.tmp'), index_path)
+        os.replace(temp_path, archive_path)
+        
+        duration = time.perf_counter() - start
+        stats = {
+            'files': len(members),
+            'bytes': sum(member['size'] for member in members.values()),
+            'archive_bytes': sink.compressed_offset,
+            'blocks': len(sink.blocks),
+            'duration': round(duration, 3)
+        }
+        stats['bytes_per_sec'] = round(stats['bytes'] / duration) if duration else 0
+        return stats
+    
+    @staticmethod
+    def index_path(archive_path: Path) -> Path:
+        """Return the location of an archive's seek index"""
+        archive_path = Path(archive_path)
+        return archive_path.with_name(archive_path.name + '.index')
+    
+    def load_index(self, archive_path: Path) -> Dict:
+        """Load the seek index written alongside an archive"""
+        with open(self.index_path(archive_path), 'r') as f:
+            return json.load(f)
+    
+    def extract_file(self, archive_path: Path, member: str, destination: Path) -> Path:
+        """Extract one file by decompressing only the blocks that hold it"""
+        index = self.load_index(archive_path)
+        if member not in index['members']:
+            raise KeyError(f"{member} is not in {archive_path}")
+        
+        decompress = self.COMPRESSORS[index['compression']][2]
+        entry = index['members'][member]
+        blocks = index['blocks']
+        start, end = entry['offset'], entry['offset'] + entry['size']
+        first = bisect.bisect_right([block[0] for block in blocks], start) - 1
+        
+        destination = Path(destination)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        with open(archive_path, 'rb') as archive, open(destination, 'wb') as out:
+            for block_offset, compressed_offset, compressed_length in blocks[max(first, 0):]:
+                if block_offset >= end:
+                    break
+                archive.seek(compressed_offset)
+                data = decompress(archive.read(compressed_length))
+                out.write(data[max(start - block_offset, 0):end - block_offset])
+        
+        os.chmod(destination, entry['mode'])
+        os.utime(destination, (entry['mtime'], entry['mtime']))
+        return destination
+
+class BackupManifest:
+    """SQLite index of every file recorded in every backup snapshot"""
+    
+    def __init__(self, db_path: str):
+        self.db_path = str(db_path)
+        with closing(self.connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS snapshots (
+                    id INTEGER PRIMARY KEY,
+                    source TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    location TEXT NOT NULL,
+                    mode TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    verified INTEGER
+                );
+                CREATE TABLE IF NOT EXISTS files (
+                    snapshot_id INTEGER NOT NULL REFERENCES snapshots(id) ON DELETE CASCADE,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    inode INTEGER NOT NULL,
+                    hash TEXT,
+                    PRIMARY KEY (snapshot_id, path)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_snapshots_source ON snapshots(source, created);
+                CREATE INDEX IF NOT EXISTS idx_files_path ON files(path, snapshot_id);
+            """)
+            # Manifests created before verification results were recorded
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(snapshots)")}
+            if 'verified' not in columns:
+                conn.execute("ALTER TABLE snapshots ADD COLUMN verified INTEGER")
+    
+    def connect(self) -> sqlite3.Connection:
+        """Open a connection to the manifest database"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+    
+    def record_snapshot(self, source_dir: Path, name: str, location: Path, mode: str,
+                        entries: Dict[str, tuple]) -> int:
+        """Record a snapshot and its (size, mtime_ns, inode, hash) file entries"""
+        with closing(self.connect()) as conn, conn:
+            cursor = conn.execute(
+                "INSERT INTO snapshots (source, name, location, mode, created) VALUES (?, ?, ?, ?, ?)",
+                (str(Path(source_dir).resolve()), name, str(Path(location).absolute()), mode, time.time())
+            )
+            snapshot_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO files (snapshot_id, path, size, mtime_ns, inode, hash) VALUES (?, ?, ?, ?, ?, ?)",
+                ((snapshot_id, path, *entry) for path, entry in entries.items())
+            )
+        return snapshot_id
+    
+    def mark_verified(self, snapshot_id: int, passed: bool):
+        """Record whether a snapshot's verification found no mismatches"""
+        with closing(self.connect()) as conn, conn:
+            conn.execute("UPDATE snapshots SET verified = ? WHERE id = ?", (int(passed), snapshot_id))
+    
+    def latest_snapshot(self, source_dir: Path) -> Optional[sqlite3.Row]:
+        """Return the newest snapshot recorded for a source directory"""
+        with closing(self.connect()) as conn:
+            return conn.execute(
+                "SELECT * FROM snapshots WHERE source = ? ORDER BY created DESC LIMIT 1",
+                (str(Path(source_dir).resolve()),)
+            ).fetchone()
+    
+    def snapshot_files(self, snapshot_id: int) -> Dict[str, tuple]:
+        """Load a snapshot's file entries keyed by relative path"""
+        with closing(self.connect()) as conn:
+            rows = conn.execute(
+                "SELECT path, size, mtime_ns, inode, hash FROM files WHERE snapshot_id = ?",
+                (snapshot_id,)
+            )
+            return {row[0]: tuple(row[1:]) for row in rows}
+    
+    def find_file(self, source_dir: Path, path: str, as_of: Optional[datetime] = None) -> Optional[sqlite3.Row]:
+        """Find the newest snapshot at or before as_of that contains path"""
+        created_before = (as_of or datetime.now()).timestamp()
+        with closing(self.connect()) as conn:
+            return conn.execute("""
+                SELECT s.name, s.location, s.mode, s.created, f.*
+                FROM files f JOIN snapshots s ON s.id = f.snapshot_id
+                WHERE f.path = ? AND s.source = ? AND s.created <= ?
+                ORDER BY s.created DESC LIMIT 1
+            """, (path, str(Path(source_dir).resolve()), created_before)).fetchone()
+    
+    def forget_missing(self) -> int:
+        """Drop snapshots whose backup location no longer exists"""
+        with closing(self.connect()) as conn, conn:
+            stale = [row['id'] for row in conn.execute("SELECT id, location FROM snapshots")
+                     if not os.path.exists(row['location'])]
+            conn.executemany("DELETE FROM snapshots WHERE id = ?", ((snapshot_id,) for snapshot_id in stale))
+        return len(stale)
 
 class BackupManager:
     """Automated backup system"""
     
-    def __init__(self, source_dirs: List[str], backup_dir: str):
+    # Repository files kept in backup_dir that are not dated backups
+    RESERVED_NAMES = {'repository', 'manifest.db', 'manifest.db-wal', 'manifest.db-shm'}
+    
+    def __init__(self, source_dirs: List[str], backup_dir: str, mode: str = 'full',
+                 use_checksums: bool = False, copy_workers: int = 8, compression: str = 'gzip',
+                 verify_backups: bool = True, verify_workers: Optional[int] = None):
         self.source_dirs = [Path(d) for d in source_dirs]
         self.backup_dir = Path(backup_dir)
         self.backup_dir.mkdir(exist_ok=True)
+        self.mode = mode  # 'full', 'incremental', 'dedup' or 'archive'
+        self.use_checksums = use_checksums
+        self.verify_backups = verify_backups
+        self.verify_workers = verify_workers or os.cpu_count() or 1
+        self.last_stats = {}
+        self.last_verification = []
+        self.copy_engine = CopyEngine(max_workers=copy_workers)
+        self.chunk_store = ChunkStore(self.backup_dir / 'repository') if mode == 'dedup' else None
+        self.archiver = ArchiveBackup(compression) if mode == 'archive' else None
+        self.manifest = BackupManifest(self.backup_dir / 'manifest.db')
     
     def create_backup(self, include_timestamp: bool = True):
         """Create backup of specified directories"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S") if include_timestamp else ""
         backup_success = []
+        full_copies = []
+        self.last_stats = {}
+        self.last_verification = []
         
         for source_dir in self.source_dirs:
             if not source_dir.exists():
@@ -126,76 +1457,1092 @@ class BackupManager:
             backup_name = f"{source_dir.name}_{timestamp}" if timestamp else source_dir.name
             backup_path = self.backup_dir / backup_name
             
+            already_verified = set()
             try:
-                shutil.copytree(source_dir, backup_path, dirs_exist_ok=True)
-                logging.info(f"Backup created: {backup_path}")
+                # Change detection is a diff of the source against the last manifest
+                previous = self.manifest.latest_snapshot(source_dir)
+                previous_files = self.manifest.snapshot_files(previous['id']) if previous else {}
+                entries, changes = self.scan_source(source_dir, previous_files)
+                logging.info(f"{source_dir}: {len(changes['changed'])} new or modified, "
+                             f"{len(changes['deleted'])} deleted since last backup")
+                
+                if self.chunk_store:
+                    stats = self.chunk_store.store_snapshot(source_dir, backup_name)
+                    backup_path = self.chunk_store.snapshots_dir / f"{backup_name}.json"
+                    logging.info(f"Snapshot stored: {backup_name} ({stats['files']} files, "
+                                 f"{stats['new_chunks']} new chunks, {stats['stored_bytes']} bytes written)")
+                elif self.archiver:
+                    backup_path = self.backup_dir / f"{backup_name}{self.archiver.suffix}"
+                    stats = self.archiver.create_archive(source_dir, backup_path)
+                    logging.info(f"Archive created: {backup_path} ({stats['files']} files, "
+                                 f"{stats['bytes']} -> {stats['archive_bytes']} bytes)")
+                elif (self.mode == 'incremental' and timestamp and previous
+                      and previous['mode'] in ('full', 'incremental') and os.path.isdir(previous['location'])):
+                    stats, linked = self.create_snapshot(source_dir, backup_path, Path(previous['location']),
+                                                         changes['changed'])
+                    logging.info(f"Snapshot created: {backup_path} ({stats['copied']} copied, "
+                                 f"{stats['linked']} linked, {stats['bytes_copied']} bytes)")
+                    # A hard link shares its contents with the previous snapshot, so it only needs
+                    # checking again if that snapshot was never verified clean
+                    if previous['verified']:
+                        already_verified = linked
+                else:
+                    full_copies.append((source_dir, backup_path, entries))
+                    continue
+                
+                self.last_stats[str(backup_path)] = stats
+                snapshot_id = self.manifest.record_snapshot(source_dir, backup_name, backup_path, self.mode, entries)
                 backup_success.append(str(backup_path))
+                self.run_verification(backup_path, entries, snapshot_id, already_verified)
             except Exception as e:
                 logging.error(f"Backup failed for {source_dir}: {e}")
         
+        # Full copies of all source directories run concurrently on one worker pool
+        if full_copies:
+            run = self.copy_engine.copy_trees([(job[0], job[1]) for job in full_copies])
+            for (source_dir, backup_path, entries), stats in zip(full_copies, run['trees']):
+                self.last_stats[str(backup_path)] = stats
+                if stats['errors']:
+                    logging.error(f"Backup failed for {source_dir}: {len(stats['errors'])} errors, "
+                                  f"first: {stats['errors'][0]}")
+                else:
+                    logging.info(f"Backup created: {backup_path}")
+                    snapshot_id = self.manifest.record_snapshot(source_dir, backup_path.name, backup_path,
+                                                                'full', entries)
+                    backup_success.append(str(backup_path))
+                    self.run_verification(backup_path, entries, snapshot_id)
+        
         return backup_success
     
+    def run_verification(self, backup_path: Path, entries: Dict[str, tuple],
+                         snapshot_id: int, already_verified: Optional[set] = None):
+        """Verify a new backup if enabled and keep the summary for the report"""
+        if not self.verify_backups:
+            return
+        try:
+            summary = self.verify_snapshot(backup_path, entries, already_verified or set())
+        except Exception as e:
+            logging.error(f"Verification failed for {backup_path}: {e}")
+            summary = {'backup': str(backup_path), 'files': 0, 'bytes': 0, 'mismatches': [str(e)], 'mb_per_sec': 0.0}
+        self.manifest.mark_verified(snapshot_id, not summary['mismatches'])
+        self.last_stats[str(backup_path)]['verification'] = summary
+        self.last_verification.append(summary)
+    
+    def scan_source(self, source_dir: Path, previous_files: Dict[str, tuple]) -> tuple:
+        """Stat every file under source_dir and diff it against the previous manifest"""
+        entries = {}
+        changed = set()
+        pending_dirs = [(str(source_dir), '')]
+        
+        while pending_dirs:
+            directory, prefix = pending_dirs.pop()
+            with os.scandir(directory) as scan:
+                for entry in scan:
+                    relative_path = prefix + entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        pending_dirs.append((entry.path, relative_path + '/'))
+                        continue
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    
+                    file_stat = entry.stat(follow_symlinks=False)
+                    old = previous_files.get(relative_path)
+                    digest = None
+                    if old and old[0] == file_stat.st_size and old[3]:
+                        if self.use_checksums:
+                            digest = file_checksum(entry.path)
+                            unchanged = digest == old[3]
+                        else:
+                            unchanged = old[1] == file_stat.st_mtime_ns and old[2] == file_stat.st_ino
+                        if unchanged:
+                            digest = old[3]
+                        else:
+                            changed.add(relative_path)
+                    else:
+                        changed.add(relative_path)
+                    
+                    if digest is None:
+                        digest = file_checksum(entry.path)
+                    entries[relative_path] = (file_stat.st_size, file_stat.st_mtime_ns, file_stat.st_ino, digest)
+        
+        deleted = previous_files.keys() - entries.keys()
+        return entries, {'changed': changed, 'deleted': deleted}
+    
+    def create_snapshot(self, source_dir: Path, backup_path: Path, previous: Path, changed: set) -> tuple:
+        """Create a complete snapshot that hard-links unchanged files; return stats and the linked paths"""
+        stats = {'copied': 0, 'linked': 0, 'bytes_copied': 0, 'bytes_linked': 0}
+        linked = set()
+        
+        for root, dirs, files in os.walk(source_dir):
+            relative = Path(root).relative_to(source_dir)
+            target_dir = backup_path / relative
+            target_dir.mkdir(parents=True, exist_ok=True)
+            
+            # os.walk does not descend into directory symlinks; keep them as links
+            for name in dirs:
+                if (Path(root) / name).is_symlink():
+                    os.symlink(os.readlink(Path(root) / name), target_dir / name)
+            
+            for name in files:
+                source_file = Path(root) / name
+                target_file = target_dir / name
+                relative_path = (relative / name).as_posix()
+                
+                if source_file.is_symlink():
+                    os.symlink(os.readlink(source_file), target_file)
+                    continue
+                
+                if relative_path not in changed:
+                    try:
+                        os.link(previous / relative_path, target_file)
+                        linked.add(relative_path)
+                        stats['linked'] += 1
+                        stats['bytes_linked'] += target_file.stat().st_size
+                        continue
+                    except OSError:
+                        pass  # Missing from previous snapshot, link limit or other filesystem; copy instead
+                
+                stats['bytes_copied'] += self.copy_engine.copy_file(source_file, target_file)
+                stats['copied'] += 1
+        
+        return stats, linked
+    
+    def verify_snapshot(self, backup_path: Path, entries: Dict[str, tuple],
+                        already_verified: set) -> Dict:
+        """Hash backup files concurrently and compare them to the scan digests, skipping already_verified paths"""
+        # In every mode 'files' counts the source files checked and 'bytes' their total source size
+        start = time.perf_counter()
+        summary = {'backup': str(backup_path), 'files': 0, 'skipped': 0, 'bytes': 0, 'mismatches': []}
+        
+        if self.chunk_store:
+            result = self.chunk_store.verify(backup_path.stem)
+            files = self.chunk_store.load_manifest(backup_path.stem)['files']
+            summary['files'] = len(files)
+            summary['bytes'] = sum(entry['size'] for entry in files)
+            summary['chunks'] = result['chunks']
+            summary['mismatches'] = result['missing'] + result['corrupt']
+            return self.finish_verification(summary, start)
+        
+        paths = sorted(entries.keys() - already_verified)
+        summary['skipped'] = len(entries) - len(paths)
+        
+        # scan_source already hashed every source file, so only the backup side is read here;
+        # hashlib releases the GIL on large buffers, so threads hash in parallel without forking
+        if self.archiver:
+            backup_hashes = self.archive_checksums(backup_path, set(paths))
+            backup_hashes = [backup_hashes.get(path) for path in paths]
+        else:
+            with ThreadPoolExecutor(max_workers=self.verify_workers) as pool:
+                backup_hashes = list(pool.map(_checksum_or_none, [str(backup_path / path) for path in paths]))
+        
+        for path, backup_hash in zip(paths, backup_hashes):
+            summary['files'] += 1
+            summary['bytes'] += entries[path][0]
+            if backup_hash is None or backup_hash != entries[path][3]:
+                summary['mismatches'].append(path)
+        
+        return self.finish_verification(summary, start)
+    
+    def archive_checksums(self, archive_path: Path, paths: set) -> Dict[str, str]:
+        """Hash the wanted members of an archive in one streaming pass"""
+        hashes = {}
+        compression = self.archiver.load_index(archive_path)['compression']
+        with ArchiveBackup.OPENERS[compression](archive_path, 'rb') as stream, \
+                tarfile.open(fileobj=stream, mode='r|') as tar:
+            for member in tar:
+                if member.isreg() and member.name in paths:
+                    digest = hashlib.sha256()
+                    data = tar.extractfile(member)
+                    for chunk in iter(lambda: data.read(1024 * 1024), b''):
+                        digest.update(chunk)
+                    hashes[member.name] = digest.hexdigest()
+        return hashes
+    
+    def finish_verification(self, summary: Dict, start: float) -> Dict:
+        """Add timing and throughput to a verification summary and log it"""
+        duration = time.perf_counter() - start
+        summary['duration'] = round(duration, 3)
+        summary['mb_per_sec'] = round(summary['bytes'] / duration / 1024 / 1024, 2) if duration else 0.0
+        if summary['mismatches']:
+            logging.error(f"Verification of {summary['backup']} found {len(summary['mismatches'])} "
+                          f"mismatches, first: {summary['mismatches'][0]}")
+        else:
+            logging.info(f"Verified {summary['backup']}: {summary['files']} files, "
+                         f"{summary['bytes']} bytes at {summary['mb_per_sec']} MB/s")
+        return summary
+    
+    def restore(self, path: str, as_of: Optional[datetime] = None, destination: Optional[str] = None) -> Optional[Path]:
+        """Restore the version of a source file that was current at as_of"""
+        path = Path(path).absolute()
+        for source_dir in self.source_dirs:
+            try:
+                relative_path = path.relative_to(source_dir.absolute()).as_posix()
+                break
+            except ValueError:
+                continue
+        else:
+            logging.error(f"{path} is not inside any backed-up directory")
+            return None
+        
+        found = self.manifest.find_file(source_dir, relative_path, as_of)
+        if not found:
+            logging.warning(f"No backup of {path} found as of {as_of or 'now'}")
+            return None
+        
+        destination = Path(destination) if destination else path
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            if found['mode'] == 'archive':
+                ArchiveBackup().extract_file(found['location'], relative_path, destination)
+            elif found['mode'] == 'dedup':
+                store = self.chunk_store or ChunkStore(self.backup_dir / 'repository')
+                store.restore_file(found['name'], relative_path, destination)
+            else:
+                self.copy_engine.copy_file(Path(found['location']) / relative_path, destination)
+        except (KeyError, ValueError, OSError) as e:
+            logging.error(f"Error restoring {path} from {found['name']}: {e}")
+            return None
+        
+        logging.info(f"Restored {path} from {found['name']} to {destination}")
+        return destination
+    
     def cleanup_old_backups(self, days_to_keep: int = 30):
         """Remove backups older than specified days"""
         cutoff_date = datetime.now() - timedelta(days=days_to_keep)
         removed_count = 0
         
+        if self.chunk_store:
+            removed_count += self.chunk_store.prune(cutoff_date)
+            self.chunk_store.garbage_collect()
+        
         for backup_folder in self.backup_dir.iterdir():
-            if backup_folder.is_dir():
+            if backup_folder.name in self.RESERVED_NAMES:
+                continue
+            is_archive = (backup_folder.is_file() and '.tar' in backup_folder.suffixes
+                          and backup_folder.suffix != '.index')
+            if backup_folder.is_dir() or is_archive:
                 folder_time = datetime.fromtimestamp(backup_folder.stat().st_mtime)
                 if folder_time < cutoff_date:
                     try:
-                        shutil.rmtree(backup_folder)
+                        if is_archive:
+                            backup_folder.unlink()
+                            ArchiveBackup.index_path(backup_folder).unlink(missing_ok=True)
+                        else:
+                            shutil.rmtree(backup_folder)
                         logging.info(f"Removed old backup: {backup_folder}")
                         removed_count += 1
                     except Exception as e:
                         logging.error(f"Error removing {backup_folder}: {e}")
         
-        logging.info(f"Removed {removed_count} old backups")
-        return removed_count
+        self.manifest.forget_missing()
+        logging.info(f"Removed {removed_count} old backups")
+        return removed_count
+
+class ChunkStore:
+    """Content-addressed, deduplicating backup repository"""
+    
+    # Gear table for content-defined chunking; derived from SHA-256 so it never changes
+    GEAR = [int.from_bytes(hashlib.sha256(bytes([i])).digest()[:4], 'big') for i in range(256)]
+    GEAR_LOW_BYTES = bytes(value & 0xFF for value in GEAR)
+    
+    def __init__(self, repository_dir: str, min_chunk: int = 16 * 1024,
+                 avg_chunk: int = 64 * 1024, max_chunk: int = 256 * 1024,
+                 compress_level: int = 6):
+        self.repository_dir = Path(repository_dir)
+        self.chunks_dir = self.repository_dir / 'chunks'
+        self.snapshots_dir = self.repository_dir / 'snapshots'
+        self.chunks_dir.mkdir(parents=True, exist_ok=True)
+        self.snapshots_dir.mkdir(exist_ok=True)
+        self.min_chunk = min_chunk
+        self.max_chunk = max_chunk
+        self.boundary_mask = (1 << (avg_chunk.bit_length() - 1)) - 1
+        self.compress_level = compress_level
+    
+    def split_chunks(self, data: bytes):
+        """Yield content-defined chunks of data using a gear rolling hash"""
+        gear = self.GEAR
+        mask = self.boundary_mask
+        length = len(data)
+        # The hash restarts at every chunk's min_chunk point; until it has taken in as many
+        # bytes as the mask has bits it differs from the windowed hash, so those are hashed here
+        warmup = mask.bit_length() - 1
+        boundaries = self.find_boundaries(data) if np is not None and length > self.min_chunk else None
+        start = 0
+        
+        while start < length:
+            if length - start <= self.min_chunk:
+                yield data[start:]
+                return
+            
+            # Bytes before min_chunk can never end a chunk, so skip hashing them
+            end = min(start + self.max_chunk, length)
+            position = start + self.min_chunk
+            scan_end = end if boundaries is None else min(position + warmup, end)
+            h = 0
+            for byte in data[position:scan_end]:
+                h = ((h << 1) + gear[byte]) & 0xFFFFFFFF
+                position += 1
+                if not h & mask:
+                    break
+            else:
+                if boundaries is not None and position < end:
+                    index = bisect.bisect_left(boundaries, position)
+                    position = boundaries[index] + 1 if index < len(boundaries) and boundaries[index] < end else end
+            yield data[start:position]
+            start = position
+    
+    def find_boundaries(self, data: bytes) -> List[int]:
+        """Indexes of every byte where the gear hash, taken over a full window, hits the boundary mask"""
+        # Only the low mask bits are tested and byte k back is shifted left k times, so bytes further
+        # back than the mask is wide never reach those bits: the hash is a fixed-width window sum
+        bits = self.boundary_mask.bit_length()
+        # Prefilter on the low byte alone: its window is only 8 bytes wide and stays in uint8
+        width = min(bits, 8)
+        low = np.frombuffer(data.translate(self.GEAR_LOW_BYTES), dtype=np.uint8)
+        window = low.copy()
+        covered = 1
+        while covered * 2 <= width:
+            window[covered:] += window[:-covered] << np.uint8(covered)
+            covered *= 2
+        for shift in range(covered, width):
+            window[shift:] += low[:-shift] << np.uint8(shift)
+        candidates = np.flatnonzero((window & np.uint8((1 << width) - 1)) == 0)
+        candidates = candidates[candidates >= bits - 1]
+        
+        if bits > width and len(candidates):
+            # About one position in 256 survives; hash those over the full window
+            raw = np.frombuffer(data, dtype=np.uint8)
+            gear = np.array(self.GEAR, dtype=np.uint64)
+            h = np.zeros(len(candidates), dtype=np.uint64)
+            for shift in range(bits):
+                h += gear[raw[candidates - shift]] << np.uint64(shift)
+            candidates = candidates[(h & np.uint64(self.boundary_mask)) == 0]
+        return candidates.tolist()
+    
+    def chunk_path(self, chunk_id: str) -> Path:
+        """Return the on-disk location of a chunk"""
+        return self.chunks_dir / chunk_id[:2] / chunk_id
+    
+    def put_chunk(self, data: bytes) -> tuple:
+        """Store a chunk once and return its id and stored size (0 if already present)"""
+        chunk_id = hashlib.sha256(data).hexdigest()
+        path = self.chunk_path(chunk_id)
+        if path.exists():
+            return chunk_id, 0
+        
+        path.parent.mkdir(exist_ok=True)
+        compressed = zlib.compress(data, self.compress_level)
+        temp_path = path.with_suffix('.tmp')
+        with open(temp_path, 'wb') as f:
+            f.write(compressed)
+        os.replace(temp_path, path)
+        return chunk_id, len(compressed)
+    
+    def get_chunk(self, chunk_id: str) -> bytes:
+        """Read and decompress a chunk, checking it against its id"""
+        with open(self.chunk_path(chunk_id), 'rb') as f:
+            data = zlib.decompress(f.read())
+        if hashlib.sha256(data).hexdigest() != chunk_id:
+            raise ValueError(f"Chunk {chunk_id} is corrupt")
+        return data
+    
+    def store_snapshot(self, source_dir: Path, snapshot_name: str) -> Dict:
+        """Chunk a source directory into the store and record a snapshot manifest"""
+        source_dir = Path(source_dir)
+        previous = self.latest_snapshot(source_dir)
+        previous_files = {entry['path']: entry for entry in previous['files']} if previous else {}
+        stats = {'files': 0, 'bytes': 0, 'new_chunks': 0, 'stored_bytes': 0, 'reused_files': 0}
+        manifest = {
+            'name': snapshot_name,
+            'source': str(source_dir.resolve()),
+            'created': datetime.now().isoformat(),
+            'dirs': [],
+            'files': []
+        }
+        
+        for root, dirs, files in os.walk(source_dir):
+            relative = Path(root).relative_to(source_dir)
+            if relative != Path('.'):
+                manifest['dirs'].append(relative.as_posix())
+            
+            for name in files:
+                file_path = Path(root) / name
+                if file_path.is_symlink():
+                    continue
+                relative_path = (relative / name).as_posix()
+                file_stat = file_path.stat()
+                entry = {
+                    'path': relative_path,
+                    'size': file_stat.st_size,
+                    'mtime_ns': file_stat.st_mtime_ns,
+                    'mode': file_stat.st_mode & 0o7777
+                }
+                
+                # Unchanged files reuse the previous chunk list without being re-read
+                old_entry = previous_files.get(relative_path)
+                if old_entry and old_entry['size'] == entry['size'] and old_entry['mtime_ns'] == entry['mtime_ns']:
+                    entry['chunks'] = old_entry['chunks']
+                    stats['reused_files'] += 1
+                else:
+                    entry['chunks'] = self.store_file(file_path, stats)
+                
+                manifest['files'].append(entry)
+                stats['files'] += 1
+                stats['bytes'] += entry['size']
+        
+        self.write_manifest(manifest)
+        return stats
+    
+    def store_file(self, file_path: Path, stats: Dict) -> List[str]:
+        """Store one file's chunks and return the chunk ids in order"""
+        chunk_ids = []
+        carry = b''
+        with open(file_path, 'rb') as f:
+            # Read in large blocks; the unfinished tail chunk carries into the next block
+            while True:
+                block = f.read(4 * self.max_chunk)
+                data = carry + block
+                if not data:
+                    break
+                pieces = list(self.split_chunks(data))
+                carry = pieces.pop() if block else b''
+                for piece in pieces:
+                    chunk_id, stored = self.put_chunk(piece)
+                    chunk_ids.append(chunk_id)
+                    if stored:
+                        stats['new_chunks'] += 1
+                        stats['stored_bytes'] += stored
+                if not block:
+                    break
+        if carry:
+            chunk_id, stored = self.put_chunk(carry)
+            chunk_ids.append(chunk_id)
+            if stored:
+                stats['new_chunks'] += 1
+                stats['stored_bytes'] += stored
+        return chunk_ids
+    
+    def write_manifest(self, manifest: Dict):
+        """Atomically write a snapshot manifest"""
+        manifest_path = self.snapshots_dir / f"{manifest['name']}.json"
+        temp_path = manifest_path.with_suffix('.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, manifest_path)
+    
+    def load_manifest(self, snapshot_name: str) -> Dict:
+        """Load a snapshot manifest by name"""
+        with open(self.snapshots_dir / f"{snapshot_name}.json", 'r') as f:
+            return json.load(f)
+    
+    def list_snapshots(self) -> List[str]:
+        """List snapshot names, oldest first"""
+        # Names end in a sortable _YYYYmmdd_HHMMSS timestamp
+        return sorted((path.stem for path in self.snapshots_dir.glob('*.json')), key=lambda name: name[-15:])
+    
+    def latest_snapshot(self, source_dir: Path) -> Optional[Dict]:
+        """Load the newest manifest recorded for a source directory"""
+        source = str(Path(source_dir).resolve())
+        name_pattern = re.compile(rf"{re.escape(Path(source_dir).name)}_\d{{8}}_\d{{6}}")
+        for snapshot_name in reversed(self.list_snapshots()):
+            if name_pattern.fullmatch(snapshot_name):
+                manifest = self.load_manifest(snapshot_name)
+                if manifest['source'] == source:
+                    return manifest
+        return None
+    
+    def restore(self, snapshot_name: str, target_dir: str, paths: Optional[List[str]] = None) -> int:
+        """Restore a snapshot (or selected paths from it) into target_dir"""
+        manifest = self.load_manifest(snapshot_name)
+        target_dir = Path(target_dir)
+        wanted = set(paths) if paths else None
+        restored_count = 0
+        
+        if wanted is None:
+            for relative_dir in manifest['dirs']:
+                (target_dir / relative_dir).mkdir(parents=True, exist_ok=True)
+        
+        for entry in manifest['files']:
+            if wanted is not None and entry['path'] not in wanted:
+                continue
+            self.write_file(entry, target_dir / entry['path'])
+            restored_count += 1
+        
+        logging.info(f"Restored {restored_count} files from {snapshot_name} to {target_dir}")
+        return restored_count
+    
+    def restore_file(self, snapshot_name: str, path: str, destination: Path) -> Path:
+        """Restore a single file from a snapshot to destination"""
+        for entry in self.load_manifest(snapshot_name)['files']:
+            if entry['path'] == path:
+                self.write_file(entry, Path(destination))
+                return Path(destination)
+        raise KeyError(f"{path} is not in snapshot {snapshot_name}")
+    
+    def write_file(self, entry: Dict, destination: Path):
+        """Reassemble a manifest entry's chunks into destination"""
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        with open(destination, 'wb') as f:
+            for chunk_id in entry['chunks']:
+                f.write(self.get_chunk(chunk_id))
+        os.chmod(destination, entry['mode'])
+        os.utime(destination, ns=(entry['mtime_ns'], entry['mtime_ns']))
+    
+    def verify(self, snapshot_name: Optional[str] = None) -> Dict:
+        """Check that every chunk referenced by the snapshot(s) exists and is intact"""
+        names = [snapshot_name] if snapshot_name else self.list_snapshots()
+        referenced = set()
+        for name in names:
+            for entry in self.load_manifest(name)['files']:
+                referenced.update(entry['chunks'])
+        
+        missing, corrupt = [], []
+        for chunk_id in referenced:
+            try:
+                self.get_chunk(chunk_id)
+            except FileNotFoundError:
+                missing.append(chunk_id)
+            except Exception:
+                corrupt.append(chunk_id)
+        
+        if missing or corrupt:
+            logging.error(f"Repository verify found {len(missing)} missing and {len(corrupt)} corrupt chunks")
+        return {'snapshots': len(names), 'chunks': len(referenced), 'missing': missing, 'corrupt': corrupt}
+    
+    def prune(self, cutoff_date: datetime) -> int:
+        """Remove snapshot manifests created before cutoff_date"""
+        removed_count = 0
+        for name in self.list_snapshots():
+            manifest_path = self.snapshots_dir / f"{name}.json"
+            if datetime.fromtimestamp(manifest_path.stat().st_mtime) < cutoff_date:
+                manifest_path.unlink()
+                logging.info(f"Removed old snapshot: {name}")
+                removed_count += 1
+        return removed_count
+    
+    def garbage_collect(self) -> Dict:
+        """Delete chunks no longer referenced by any snapshot"""
+        referenced = set()
+        for name in self.list_snapshots():
+            for entry in self.load_manifest(name)['files']:
+                referenced.update(entry['chunks'])
+        
+        removed_count = 0
+        freed_bytes = 0
+        for chunk_path in self.chunks_dir.glob('*/*'):
+            if chunk_path.name not in referenced:
+                freed_bytes += chunk_path.stat().st_size
+                chunk_path.unlink()
+                removed_count += 1
+        
+        logging.info(f"Garbage collection removed {removed_count} chunks ({freed_bytes} bytes)")
+        return {'removed_chunks': removed_count, 'freed_bytes': freed_bytes}
+
+class _BackupRestartLimit(Exception):
+    """Raised from the backup progress callback to abandon stepped copying"""
+
+class DatabaseBackup:
+    """Online SQLite database backup system"""
+    
+    def __init__(self, db_path: str, backup_dir: str, pages_per_step: int = 256,
+                 step_sleep: float = 0.05, compress: bool = True, max_restarts: int = 5):
+        self.db_path = Path(db_path)
+        self.backup_dir = Path(backup_dir)
+        self.backup_dir.mkdir(exist_ok=True)
+        self.pages_per_step = pages_per_step
+        self.step_sleep = step_sleep
+        self.compress = compress
+        self.max_restarts = max_restarts
+    
+    def backup_database(self, verify: bool = True) -> Dict:
+        """Copy a live database page by page without stalling writers"""
+        if not self.db_path.exists():
+            logging.error(f"Database {self.db_path} does not exist")
+            return {'status': 'FAILED', 'error': 'database not found'}
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        backup_path = self.backup_dir / f"{self.db_path.stem}_{timestamp}.db"
+        start = time.perf_counter()
+        state = {'remaining': None, 'restarts': 0, 'total': 0}
+        
+        def progress(status, remaining, total):
+            # A write from another connection restarts the copy; remaining jumps back up
+            if state['remaining'] is not None and remaining > state['remaining']:
+                state['restarts'] += 1
+                if state['restarts'] > self.max_restarts:
+                    raise _BackupRestartLimit()
+            state['remaining'] = remaining
+            state['total'] = total
+            # Release the source between steps so writers from the blog app get through
+            if remaining:
+                time.sleep(self.step_sleep)
+        
+        try:
+            source = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            target = sqlite3.connect(str(backup_path))
+            try:
+                try:
+                    source.backup(target, pages=self.pages_per_step, progress=progress)
+                except _BackupRestartLimit:
+                    # Too busy to finish in small steps; take the rest in one pass
+                    logging.warning(f"Database busy, finishing backup of {self.db_path} in one step")
+                    source.backup(target, pages=-1)
+                
+                integrity = None
+                if verify:
+                    integrity = target.execute("PRAGMA integrity_check").fetchone()[0]
+            finally:
+                target.close()
+                source.close()
+        except Exception as e:
+            logging.error(f"Database backup failed for {self.db_path}: {e}")
+            backup_path.unlink(missing_ok=True)
+            return {'status': 'FAILED', 'error': str(e)}
+        
+        db_bytes = backup_path.stat().st_size
+        if integrity not in (None, 'ok'):
+            logging.error(f"Integrity check failed for {backup_path}: {integrity}")
+        
+        final_path = backup_path
+        if self.compress:
+            final_path = self.compress_backup(backup_path)
+        
+        duration = time.perf_counter() - start
+        report = {
+            'status': 'SUCCESS' if integrity in (None, 'ok') else 'CORRUPT',
+            'path': str(final_path),
+            'pages': state['total'],
+            'bytes': db_bytes,
+            'stored_bytes': final_path.stat().st_size,
+            'restarts': state['restarts'],
+            'integrity': integrity,
+            'duration': round(duration, 3),
+            'throughput_mb_s': round(db_bytes / duration / 1024 / 1024, 2) if duration else 0.0
+        }
+        logging.info(f"Database backup created: {final_path} ({db_bytes} bytes in "
+                     f"{report['duration']}s, {report['throughput_mb_s']} MB/s)")
+        return report
+    
+    def compress_backup(self, backup_path: Path) -> Path:
+        """Gzip a finished backup file and remove the uncompressed copy"""
+        compressed_path = backup_path.with_name(backup_path.name + '.gz')
+        with open(backup_path, 'rb') as src, gzip.open(compressed_path, 'wb', compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        backup_path.unlink()
+        return compressed_path
+    
+    def cleanup_old_backups(self, days_to_keep: int = 30):
+        """Remove database backups older than specified days"""
+        cutoff = (datetime.now() - timedelta(days=days_to_keep)).timestamp()
+        removed_count = 0
+        
+        for backup_file in self.backup_dir.glob(f"{self.db_path.stem}_*.db*"):
+            if backup_file.stat().st_mtime < cutoff:
+                try:
+                    backup_file.unlink()
+                    logging.info(f"Removed old database backup: {backup_file}")
+                    removed_count += 1
+                except Exception as e:
+                    logging.error(f"Error removing {backup_file}: {e}")
+        
+        return removed_count
+
+class StreamingMessage:
+    """MIME message that base64-encodes attachments chunk by chunk as it is sent"""
+    
+    LINE_BYTES = 57  # Raw bytes per 76-character base64 line
+    
+    def __init__(self, from_email: str, to_email: str, subject: str, body: str,
+                 attachments: Optional[List[str]] = None, compress: bool = False,
+                 max_attachment_size: Optional[int] = None, chunk_lines: int = 16384):
+        self.from_email = from_email
+        self.to_email = to_email
+        self.subject = subject
+        self.compress = compress
+        self.read_size = self.LINE_BYTES * chunk_lines
+        self.attachments = []
+        skipped = []
+        for file_path in attachments or []:
+            if not os.path.isfile(file_path):
+                continue
+            size = os.path.getsize(file_path)
+            # The cap applies to the file on disk, before any compression
+            if max_attachment_size is not None and size > max_attachment_size:
+                skipped.append((file_path, size))
+            else:
+                self.attachments.append(file_path)
+        
+        if skipped:
+            body += "\n\nThe following attachments exceeded the size limit and were not attached:\n"
+            body += "\n".join(f"• {file_path} ({size} bytes)" for file_path, size in skipped)
+        self.body = body
+        self.boundary = f"=={uuid.uuid4().hex}=="
+        self.message_id = make_msgid()
+        self.date = formatdate(localtime=True)
+    
+    def iter_chunks(self):
+        """Yield the SMTP-ready (CRLF, dot-stuffed) message in bounded chunks"""
+        headers = [
+            f"From: {self.from_email}",
+            f"To: {self.to_email}",
+            f"Subject: {Header(self.subject, 'utf-8').encode()}",
+            f"Date: {self.date}",
+            f"Message-ID: {self.message_id}",
+            "MIME-Version: 1.0",
+            f'Content-Type: multipart/mixed; boundary="{self.boundary}"',
+            "",
+            ""
+        ]
+        yield "\r\n".join(headers).encode()
+        
+        text_part = MIMEText(self.body, 'plain', 'utf-8').as_string()
+        lines = text_part.replace('\r\n', '\n').split('\n')
+        # Lines starting with '.' must be doubled inside SMTP DATA
+        lines = ['.' + line if line.startswith('.') else line for line in lines]
+        yield f"--{self.boundary}\r\n".encode() + "\r\n".join(lines).encode() + b"\r\n"
+        
+        for file_path in self.attachments:
+            yield from self.iter_attachment(file_path)
+        
+        yield f"--{self.boundary}--\r\n".encode()
+    
+    def iter_attachment(self, file_path: str):
+        """Yield one base64 attachment part, optionally gzip-compressed on the fly"""
+        filename = os.path.basename(file_path)
+        content_type = 'application/octet-stream'
+        if self.compress:
+            filename += '.gz'
+            content_type = 'application/gzip'
+        yield (f"--{self.boundary}\r\n"
+               f"Content-Type: {content_type}\r\n"
+               f"Content-Transfer-Encoding: base64\r\n"
+               f'Content-Disposition: attachment; filename="{filename}"\r\n\r\n').encode()
+        
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if self.compress else None  # wbits 31 = gzip
+        pending = b''
+        with open(file_path, 'rb') as f:
+            while True:
+                data = f.read(self.read_size)
+                end_of_file = not data
+                if compressor:
+                    data = compressor.flush() if end_of_file else compressor.compress(data)
+                pending += data
+                # Encode only whole 57-byte groups so every line is a full 76 characters
+                usable = len(pending) - len(pending) % self.LINE_BYTES
+                if usable:
+                    yield self.encode_lines(pending[:usable])
+                    pending = pending[usable:]
+                if end_of_file:
+                    break
+        if pending:
+            yield self.encode_lines(pending)
+    
+    def encode_lines(self, data: bytes) -> bytes:
+        """Base64-encode data as CRLF-terminated 76-character lines"""
+        return b"".join(
+            binascii.b2a_base64(data[i:i + self.LINE_BYTES], newline=False) + b"\r\n"
+            for i in range(0, len(data), self.LINE_BYTES)
+        )
+
+class SMTPConnectionPool:
+    """Pool of reusable, authenticated SMTP sessions"""
+    
+    def __init__(self, smtp_server: str, smtp_port: int, email: str, password: Optional[str],
+                 max_connections: int = 4, use_tls: bool = True, timeout: float = 30,
+                 idle_timeout: float = 60, max_messages_per_connection: int = 100):
+        self.smtp_server = smtp_server
+        self.smtp_port = smtp_port
+        self.email = email
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.max_messages_per_connection = max_messages_per_connection
+        self.max_connections = max_connections
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.idle = deque()  # (server, last_used, messages_sent)
+        self.lock = threading.Lock()
+    
+    def connect(self) -> smtplib.SMTP:
+        """Open and authenticate a new SMTP session"""
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.timeout)
+        if self.use_tls:
+            server.starttls()
+        if self.password:
+            server.login(self.email, self.password)
+        return server
+    
+    def acquire(self) -> tuple:
+        """Take an idle session (checking it is still alive) or open a new one"""
+        self.slots.acquire()
+        try:
+            while True:
+                with self.lock:
+                    if not self.idle:
+                        break
+                    server, last_used, sent = self.idle.pop()
+                if time.monotonic() - last_used < self.idle_timeout:
+                    return server, sent
+                # Servers drop idle sessions; probe before trusting an old one
+                try:
+                    if server.noop()[0] == 250:
+                        return server, sent
+                except (smtplib.SMTPException, OSError):
+                    pass
+                self.discard(server)
+            return self.connect(), 0
+        except Exception:
+            self.slots.release()
+            raise
+    
+    def release(self, server: smtplib.SMTP, sent: int, broken: bool = False):
+        """Return a session to the pool, closing it if broken or worn out"""
+        if broken or sent >= self.max_messages_per_connection:
+            self.discard(server)
+        else:
+            with self.lock:
+                self.idle.append((server, time.monotonic(), sent))
+        self.slots.release()
+    
+    @staticmethod
+    def discard(server: smtplib.SMTP):
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+    
+    @staticmethod
+    def transmit(server: smtplib.SMTP, from_email: str, to_email: str, message):
+        """Send a string with sendmail(), or stream a StreamingMessage straight into DATA"""
+        if isinstance(message, str):
+            server.sendmail(from_email, to_email, message)
+            return
+        
+        server.ehlo_or_helo_if_needed()
+        code, response = server.mail(from_email)
+        if code != 250:
+            server.rset()
+            raise smtplib.SMTPSenderRefused(code, response, from_email)
+        code, response = server.rcpt(to_email)
+        if code not in (250, 251):
+            server.rset()
+            raise smtplib.SMTPRecipientsRefused({to_email: (code, response)})
+        code, response = server.docmd('data')
+        if code != 354:
+            server.rset()
+            raise smtplib.SMTPDataError(code, response)
+        for chunk in message.iter_chunks():
+            server.send(chunk)
+        server.send(b".\r\n")
+        code, response = server.getreply()
+        if code != 250:
+            raise smtplib.SMTPDataError(code, response)
+    
+    def send(self, from_email: str, to_email: str, message, retries: int = 1):
+        """Send one message on a pooled session, reconnecting on failure"""
+        for attempt in range(retries + 1):
+            server, sent = self.acquire()
+            try:
+                self.transmit(server, from_email, to_email, message)
+            except (smtplib.SMTPException, OSError) as e:
+                # Refusals are answers from a working session; only a lost session is worth a retry
+                transport = self.is_transport_error(e)
+                self.release(server, sent if transport else sent + 1, broken=self.is_broken(e))
+                if transport and attempt < retries:
+                    continue
+                raise
+            except Exception:
+                self.release(server, sent, broken=True)
+                raise
+            self.release(server, sent + 1)
+            return
+    
+    @staticmethod
+    def is_transport_error(error: Exception) -> bool:
+        """True for a dropped or failed connection, False for a reply from the server"""
+        # SMTPException subclasses OSError, so refusals must be ruled out explicitly
+        if isinstance(error, smtplib.SMTPServerDisconnected):
+            return True
+        return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+    
+    @classmethod
+    def is_broken(cls, error: Exception) -> bool:
+        """Whether the session must be discarded after this error (421 means the server is closing it)"""
+        return cls.is_transport_error(error) or getattr(error, 'smtp_code', None) == 421
+    
+    def close(self):
+        """Close all idle sessions"""
+        with self.lock:
+            idle, self.idle = self.idle, deque()
+        for server, _, _ in idle:
+            self.discard(server)
+
+class MailQueue:
+    """Durable on-disk outbound mail spool with retrying sender workers"""
+    
+    def __init__(self, spool_dir: str, email_automation: 'EmailAutomation', workers: int = 4,
+                 max_attempts: int = 8, base_delay: float = 30, max_delay: float = 3600):
+        self.spool_dir = Path(spool_dir)
+        self.new_dir = self.spool_dir / 'new'
+        self.cur_dir = self.spool_dir / 'cur'
+        self.tmp_dir = self.spool_dir / 'tmp'
+        self.dead_dir = self.spool_dir / 'dead'
+        for directory in (self.new_dir, self.cur_dir, self.tmp_dir, self.dead_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+        self.email_automation = email_automation
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.ready = []  # heap of (next_attempt, message_id)
+        self.condition = threading.Condition()
+        self.stopping = False
+        self.recover()
+        self.workers = [
+            threading.Thread(target=self.worker, name=f"mail-sender-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+    
+    def recover(self):
+        """Reload the spool after a restart, returning in-flight messages to the queue"""
+        for message_file in self.cur_dir.glob('*.json'):
+            os.replace(message_file, self.new_dir / message_file.name)
+        for message_file in self.new_dir.glob('*.json'):
+            try:
+                with open(message_file, 'r') as f:
+                    message = json.load(f)
+                heapq.heappush(self.ready, (message['next_attempt'], message['id']))
+            except Exception as e:
+                logging.error(f"Unreadable spool file {message_file}: {e}")
+                os.replace(message_file, self.dead_dir / message_file.name)
+        if self.ready:
+            logging.info(f"Recovered {len(self.ready)} queued emails from {self.spool_dir}")
+    
+    def enqueue(self, to_email: str, subject: str, body: str,
+                attachments: Optional[List[str]] = None) -> str:
+        """Durably queue a message and return its id without waiting for delivery"""
+        message = {
+            'id': f"{time.time_ns()}-{os.getpid()}-{threading.get_ident()}",
+            'to_email': to_email,
+            'subject': subject,
+            'body': body,
+            'attachments': attachments or [],
+            'attempts': 0,
+            'next_attempt': time.time(),
+            'created': datetime.now().isoformat(),
+            'last_error': None
+        }
+        self.write(message, self.new_dir)
+        with self.condition:
+            heapq.heappush(self.ready, (message['next_attempt'], message['id']))
+            self.condition.notify()
+        return message['id']
+    
+    def write(self, message: Dict, directory: Path):
+        """Write a message file atomically and durably into a spool directory"""
+        temp_path = self.tmp_dir / f"{message['id']}.json"
+        with open(temp_path, 'w') as f:
+            json.dump(message, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, directory / temp_path.name)
+    
+    def worker(self):
+        """Send due messages until stopped"""
+        while True:
+            with self.condition:
+                while not self.stopping and (not self.ready or self.ready[0][0] > time.time()):
+                    self.condition.wait(timeout=self.ready[0][0] - time.time() if self.ready else None)
+                if self.stopping:
+                    return
+                _, message_id = heapq.heappop(self.ready)
+            self.process(message_id)
+    
+    def process(self, message_id: str):
+        """Claim, send and retire (or reschedule) one message"""
+        claimed = self.cur_dir / f"{message_id}.json"
+        try:
+            # Renaming into cur/ claims the message; a restart puts it back in new/
+            os.replace(self.new_dir / claimed.name, claimed)
+            with open(claimed, 'r') as f:
+                message = json.load(f)
+        except FileNotFoundError:
+            return
+        
+        try:
+            self.email_automation.deliver(message['to_email'], message['subject'], message['body'],
+                                          message['attachments'])
+            claimed.unlink()
+            logging.info(f"Queued email {message_id} sent to {message['to_email']}")
+            return
+        except Exception as e:
+            message['attempts'] += 1
+            message['last_error'] = str(e)
+            permanent = isinstance(e, smtplib.SMTPResponseException) and e.smtp_code >= 500
+            # RCPT refusals carry a code per recipient; 4xx (greylisting, full mailbox) are worth retrying
+            if isinstance(e, smtplib.SMTPRecipientsRefused):
+                permanent = all(code >= 500 for code, _ in e.recipients.values())
+        
+        if permanent or message['attempts'] >= self.max_attempts:
+            self.write(message, self.dead_dir)
+            claimed.unlink()
+            logging.error(f"Email {message_id} to {message['to_email']} dead-lettered after "
+                          f"{message['attempts']} attempts: {message['last_error']}")
+            return
+        
+        # Exponential backoff with jitter so retries from many messages spread out
+        delay = min(self.base_delay * 2 ** (message['attempts'] - 1), self.max_delay)
+        message['next_attempt'] = time.time() + delay * random.uniform(0.8, 1.2)
+        self.write(message, self.new_dir)
+        claimed.unlink()
+        with self.condition:
+            heapq.heappush(self.ready, (message['next_attempt'], message_id))
+            self.condition.notify()
+        logging.warning(f"Email {message_id} failed (attempt {message['attempts']}), "
+                        f"retrying in {delay:.0f}s: {message['last_error']}")
+    
+    def pending_count(self) -> int:
+        """Number of messages waiting to be sent"""
+        return sum(1 for _ in self.new_dir.glob('*.json')) + sum(1 for _ in self.cur_dir.glob('*.json'))
+    
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the workers; unsent messages stay in the spool"""
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+        for worker in self.workers:
+            worker.join(timeout)
 
 class EmailAutomation:
     """Automated email sending system"""
     
-    def __init__(self, smtp_server: str, smtp_port: int, email: str, password: str):
+    def __init__(self, smtp_server: str, smtp_port: int, email: str, password: str,
+                 use_tls: bool = True, pool_size: int = 4, spool_dir: Optional[str] = None,
+                 queue_workers: int = 4, compress_attachments: bool = False,
+                 max_attachment_size: Optional[int] = None):
         self.smtp_server = smtp_server
         self.smtp_port = smtp_port
         self.email = email
         self.password = password
+        self.pool = SMTPConnectionPool(smtp_server, smtp_port, email, password,
+                                       max_connections=pool_size, use_tls=use_tls)
+        self.compress_attachments = compress_attachments
+        self.max_attachment_size = max_attachment_size
+        self.queue = MailQueue(spool_dir, self, workers=queue_workers) if spool_dir else None
+    
+    def build_message(self, to_email: str, subject: str, body: str,
+                      attachments: Optional[List[str]] = None) -> StreamingMessage:
+        """Build a message whose attachments are encoded while it is sent"""
+        return StreamingMessage(self.email, to_email, subject, body, attachments,
+                                compress=self.compress_attachments,
+                                max_attachment_size=self.max_attachment_size)
     
     def send_email(self, to_email: str, subject: str, body: str, 
                    attachments: Optional[List[str]] = None):
         """Send email with optional attachments"""
         try:
-            msg = MIMEMultipart()
-            msg['From'] = self.email
-            msg['To'] = to_email
-            msg['Subject'] = subject
-            
-            msg.attach(MIMEText(body, 'plain'))
-            
-            # Add attachments
-            if attachments:
-                for file_path in attachments:
-                    if os.path.isfile(file_path):
-                        with open(file_path, "rb") as attachment:
-                            part = MIMEBase('application', 'octet-stream')
-                            part.set_payload(attachment.read())
-                        
-                        encoders.encode_base64(part)
-                        part.add_header(
-                            'Content-Disposition',
-                            f'attachment; filename= {os.path.basename(file_path)}'
-                        )
-                        msg.attach(part)
-            
-            # Send email
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.email, self.password)
-            text = msg.as_string()
-            server.sendmail(self.email, to_email, text)
-            server.quit()
+            self.deliver(to_email, subject, body, attachments)
             
             logging.info(f"Email sent successfully to {to_email}")
             return True
@@ -204,9 +2551,91 @@ class EmailAutomation:
             logging.error(f"Failed to send email: {e}")
             return False
     
-    def send_backup_report(self, to_email: str, backup_paths: List[str]):
+    def deliver(self, to_email: str, subject: str, body: str,
+                attachments: Optional[List[str]] = None):
+        """Build and send a message over a pooled connection, raising on failure"""
+        msg = self.build_message(to_email, subject, body, attachments)
+        self.pool.send(self.email, to_email, msg)
+    
+    def queue_email(self, to_email: str, subject: str, body: str,
+                    attachments: Optional[List[str]] = None) -> bool:
+        """Queue email for background delivery, falling back to sending now without a spool"""
+        if not self.queue:
+            return self.send_email(to_email, subject, body, attachments)
+        try:
+            message_id = self.queue.enqueue(to_email, subject, body, attachments)
+            logging.info(f"Email to {to_email} queued as {message_id}")
+            return True
+        except Exception as e:
+            logging.error(f"Failed to queue email: {e}")
+            return False
+    
+    def send_batch(self, messages: List[Dict], connections: Optional[int] = None) -> List[bool]:
+        """Send many messages, each worker streaming its share over one reused session"""
+        if not messages:
+            return []
+        connections = min(connections or self.pool.max_connections, len(messages))
+        results = [False] * len(messages)
+        
+        def send_share(indexes):
+            server, sent = None, 0
+            try:
+                for index in indexes:
+                    message = messages[index]
+                    try:
+                        msg = self.build_message(
+                            message['to_email'], message['subject'], message['body'],
+                            message.get('attachments')
+                        )
+                    except Exception as e:
+                        logging.error(f"Failed to build email to {message['to_email']}: {e}")
+                        continue
+                    
+                    for attempt in range(2):
+                        try:
+                            if server is None:
+                                server, sent = self.pool.acquire()
+                            self.pool.transmit(server, self.email, message['to_email'], msg)
+                            sent += 1
+                            results[index] = True
+                            break
+                        except (smtplib.SMTPException, OSError) as e:
+                            # Reconnect once after a lost session; a refusal fails this message only
+                            transport = self.pool.is_transport_error(e)
+                            if server is not None and self.pool.is_broken(e):
+                                self.pool.release(server, sent, broken=True)
+                                server = None
+                            if transport and not attempt:
+                                continue
+                            logging.error(f"Failed to send email to {message['to_email']}: {e}")
+                            break
+                    
+                    if server is not None and sent >= self.pool.max_messages_per_connection:
+                        self.pool.release(server, sent)
+                        server = None
+            finally:
+                if server is not None:
+                    self.pool.release(server, sent)
+        
+        with ThreadPoolExecutor(max_workers=connections) as workers:
+            list(workers.map(send_share, [range(i, len(messages), connections) for i in range(connections)]))
+        
+        logging.info(f"Batch sent {sum(results)}/{len(messages)} emails over {connections} connections")
+        return results
+    
+    def send_backup_report(self, to_email: str, backup_paths: List[str],
+                           verification: Optional[List[Dict]] = None):
         """Send backup completion report"""
         subject = f"Backup Report - {datetime.now().strftime('%Y-%m-%d')}"
+        verification_lines = ''
+        if verification:
+            mismatches = sum(len(summary['mismatches']) for summary in verification)
+            verification_lines = chr(10).join(
+                f"• {summary['backup']}: {summary['files']} files, {summary['bytes']} bytes, "
+                f"{len(summary['mismatches'])} mismatches, {summary.get('mb_per_sec', 0)} MB/s"
+                for summary in verification
+            )
+            verification_lines = f"Verification: {'PASSED' if not mismatches else 'FAILED'}{chr(10)}{verification_lines}"
         body = f"""
         Backup Report
         =============
@@ -219,63 +2648,433 @@ class EmailAutomation:
         Backup Locations:
         {chr(10).join(f'• {path}' for path in backup_paths)}
         
+        {verification_lines}
+        
         This is an automated message from your backup system.
         """
         
-        return self.send_email(to_email, subject, body)
+        return self.queue_email(to_email, subject, body)
+
+# Fixed-width binary record files whose first field is a timestamp, kept in time order
+def record_count(path: Path, record: struct.Struct) -> int:
+    try:
+        return path.stat().st_size // record.size
+    except FileNotFoundError:
+        return 0
+
+def read_last_record(path: Path, record: struct.Struct) -> Optional[tuple]:
+    count = record_count(path, record)
+    if not count:
+        return None
+    with open(path, 'rb') as f:
+        f.seek((count - 1) * record.size)
+        return record.unpack(f.read(record.size))
+
+def find_record(path: Path, record: struct.Struct, value: float) -> int:
+    """Binary search for the first record whose leading timestamp is >= value"""
+    low, high = 0, record_count(path, record)
+    if not high:
+        return 0
+    with open(path, 'rb') as f:
+        while low < high:
+            middle = (low + high) // 2
+            f.seek(middle * record.size)
+            if record.unpack(f.read(record.size))[0] < value:
+                low = middle + 1
+            else:
+                high = middle
+    return low
+
+def read_records(path: Path, record: struct.Struct, first: int, last: Optional[int] = None):
+    """Yield unpacked records first..last-1 straight from the file"""
+    count = record_count(path, record)
+    last = count if last is None else min(last, count)
+    if first >= last:
+        return
+    with open(path, 'rb') as f:
+        f.seek(first * record.size)
+        remaining = last - first
+        while remaining:
+            batch = min(remaining, 4096)
+            yield from record.iter_unpack(f.read(batch * record.size))
+            remaining -= batch
+
+def trim_records(path: Path, record: struct.Struct, oldest: float):
+    """Drop records older than oldest; time order makes this a single tail copy"""
+    keep_from = find_record(path, record, oldest)
+    if not keep_from:
+        return
+    temp_path = path.with_suffix('.tmp')
+    with open(path, 'rb') as src, open(temp_path, 'wb') as dst:
+        src.seek(keep_from * record.size)
+        shutil.copyfileobj(src, dst)
+    os.replace(temp_path, path)
+
+class LatencyStore:
+    """Append-only binary check history per site with minute/hour/day rollups"""
+    
+    RAW = struct.Struct('<dfHB')  # timestamp, response_time, status_code, up
+    HISTOGRAM_BUCKETS = 64
+    # Rollup: bucket start, checks, up checks, latency sum/min/max, log-scale latency histogram
+    ROLLUP = struct.Struct(f'<qIIfff{HISTOGRAM_BUCKETS}I')
+    RESOLUTIONS = {'minute': 60, 'hour': 3600, 'day': 86400}
+    HISTOGRAM_BASE = 0.001  # Bucket 0 holds latencies under 1 ms
+    HISTOGRAM_GROWTH = 1.25  # Each bucket is 25% wider than the previous one
+    
+    def __init__(self, history_dir: str, retention_days: Optional[Dict[str, float]] = None):
+        self.history_dir = Path(history_dir)
+        self.history_dir.mkdir(exist_ok=True)
+        self.retention_days = {'raw': 7, 'minute': 2, 'hour': 90, 'day': 3650}
+        self.retention_days.update(retention_days or {})
+        self.open_buckets = {}  # site -> {resolution: [start, checks, up, sum, min, max, histogram]}
+        self.lock = threading.Lock()
+    
+    def site_dir(self, site: str) -> Path:
+        return self.history_dir / re.sub(r'[^A-Za-z0-9_.-]', '_', site)
+    
+    def append(self, site: str, result: Dict):
+        """Record one check result"""
+        timestamp = datetime.fromisoformat(result['timestamp']).timestamp()
+        up = result.get('status') == 'UP'
+        latency = float(result.get('response_time') or 0.0) if up else 0.0
+        record = self.RAW.pack(timestamp, latency, int(result.get('status_code') or 0), int(up))
+        
+        with self.lock:
+            directory = self.site_dir(site)
+            directory.mkdir(exist_ok=True)
+            # Recover before writing, or the replay would count this record a second time
+            buckets = self.site_buckets(site)
+            with open(directory / 'raw.bin', 'ab') as f:
+                f.write(record)
+            for resolution in self.RESOLUTIONS:
+                self.add_to_bucket(site, buckets, resolution, timestamp, latency, up)
+    
+    def add_to_bucket(self, site: str, buckets: Dict, resolution: str, timestamp: float,
+                      latency: float, up: bool):
+        """Fold a check into the open rollup bucket, closing it once time moves past it"""
+        size = self.RESOLUTIONS[resolution]
+        start = int(timestamp // size * size)
+        bucket = buckets.get(resolution)
+        if bucket and bucket[0] != start:
+            with open(self.site_dir(site) / f'{resolution}.bin', 'ab') as f:
+                f.write(self.ROLLUP.pack(*bucket[:6], *bucket[6]))
+            bucket = None
+        if bucket is None:
+            bucket = buckets[resolution] = [start, 0, 0, 0.0, 0.0, 0.0, [0] * self.HISTOGRAM_BUCKETS]
+        
+        bucket[1] += 1
+        if up:
+            bucket[2] += 1
+            bucket[3] += latency
+            bucket[4] = latency if bucket[2] == 1 else min(bucket[4], latency)
+            bucket[5] = max(bucket[5], latency)
+            bucket[6][self.histogram_index(latency)] += 1
+    
+    def site_buckets(self, site: str) -> Dict:
+        """Open buckets for a site, recovered from disk on first use (caller holds the lock)"""
+        buckets = self.open_buckets.get(site)
+        if buckets is None:
+            buckets = self.open_buckets[site] = self.recover_open_buckets(site)
+        return buckets
+    
+    def recover_open_buckets(self, site: str) -> Dict:
+        """Rebuild in-progress buckets after a restart by replaying raw records not yet rolled up"""
+        buckets = {}
+        directory = self.site_dir(site)
+        for resolution, size in self.RESOLUTIONS.items():
+            last = read_last_record(directory / f'{resolution}.bin', self.ROLLUP)
+            replay_from = last[0] + size if last else 0
+            raw_path = directory / 'raw.bin'
+            first = find_record(raw_path, self.RAW, replay_from)
+            for timestamp, latency, _, up in read_records(raw_path, self.RAW, first):
+                self.add_to_bucket(site, buckets, resolution, timestamp, latency, bool(up))
+        return buckets
+    
+    @classmethod
+    def histogram_index(cls, latency: float) -> int:
+        if latency < cls.HISTOGRAM_BASE:
+            return 0
+        index = int(math.log(latency / cls.HISTOGRAM_BASE, cls.HISTOGRAM_GROWTH)) + 1
+        return min(index, cls.HISTOGRAM_BUCKETS - 1)
+    
+    def query(self, site: str, start: datetime, end: Optional[datetime] = None) -> Dict:
+        """Return uptime and p50/p95/p99 latency over a window, read from rollups only"""
+        end = end or datetime.now()
+        start_ts, end_ts = start.timestamp(), end.timestamp()
+        span = end_ts - start_ts
+        
+        # Finest resolution that keeps the read small and still covers the window's start
+        resolution = 'minute' if span <= 6 * 3600 else 'hour' if span <= 14 * 86400 else 'day'
+        for candidate in ('minute', 'hour', 'day')[('minute', 'hour', 'day').index(resolution):]:
+            resolution = candidate
+            if time.time() - start_ts <= self.retention_days[candidate] * 86400:
+                break
+        
+        size = self.RESOLUTIONS[resolution]
+        path = self.site_dir(site) / f'{resolution}.bin'
+        # Buckets overlapping the window are included whole
+        first = find_record(path, self.ROLLUP, start_ts // size * size)
+        last = find_record(path, self.ROLLUP, end_ts)
+        buckets = [(*row[:6], row[6:]) for row in read_records(path, self.ROLLUP, first, last)]
+        with self.lock:
+            open_bucket = self.site_buckets(site).get(resolution) if self.site_dir(site).exists() else None
+            if open_bucket and open_bucket[0] + size > start_ts and open_bucket[0] < end_ts:
+                buckets.append((*open_bucket[:6], list(open_bucket[6])))
+        
+        checks = sum(bucket[1] for bucket in buckets)
+        up_checks = sum(bucket[2] for bucket in buckets)
+        histogram = [sum(counts) for counts in zip(*(bucket[6] for bucket in buckets))] if buckets else []
+        latencies = [bucket for bucket in buckets if bucket[2]]
+        low = min(bucket[4] for bucket in latencies) if latencies else None
+        high = max(bucket[5] for bucket in latencies) if latencies else None
+        return {
+            'site': site,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'resolution': resolution,
+            'checks': checks,
+            'uptime_percent': round(100.0 * up_checks / checks, 3) if checks else None,
+            'avg': round(sum(bucket[3] for bucket in latencies) / up_checks, 6) if up_checks else None,
+            'min': round(low, 6) if latencies else None,
+            'max': round(high, 6) if latencies else None,
+            'p50': self.percentile(histogram, 0.50, low, high),
+            'p95': self.percentile(histogram, 0.95, low, high),
+            'p99': self.percentile(histogram, 0.99, low, high)
+        }
+    
+    @classmethod
+    def percentile(cls, histogram: List[int], fraction: float, low: Optional[float] = None,
+                   high: Optional[float] = None) -> Optional[float]:
+        """Estimate a percentile as the geometric middle of its histogram bucket, clamped to [low, high]"""
+        total = sum(histogram)
+        if not total:
+            return None
+        target = fraction * total
+        cumulative = 0
+        for index, count in enumerate(histogram):
+            cumulative += count
+            if cumulative >= target:
+                if index == 0:
+                    estimate = cls.HISTOGRAM_BASE / 2
+                else:
+                    estimate = cls.HISTOGRAM_BASE * cls.HISTOGRAM_GROWTH ** (index - 1) * math.sqrt(cls.HISTOGRAM_GROWTH)
+                # The observed extremes bound every percentile; the bucket middle can fall outside them
+                if low is not None:
+                    estimate = max(estimate, low)
+                if high is not None:
+                    estimate = min(estimate, high)
+                return round(estimate, 6)
+        return None
+    
+    def apply_retention(self):
+        """Drop raw records and rollups older than their retention period"""
+        now = time.time()
+        files = {'raw': self.RAW, **{resolution: self.ROLLUP for resolution in self.RESOLUTIONS}}
+        with self.lock:
+            for directory in self.history_dir.iterdir():
+                for name, record in files.items():
+                    trim_records(directory / f'{name}.bin', record, now - self.retention_days[name] * 86400)
+
+# Connection setup time (DNS + TCP + TLS) of the last new connection made by this thread
+_connect_timing = threading.local()
+
+class TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _connect_timing.seconds = time.perf_counter() - start
+
+class TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _connect_timing.seconds = time.perf_counter() - start
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """Keep-alive adapter whose connections record how long they took to establish"""
+    
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool
+        }
 
 class WebMonitor:
     """Website monitoring and alerting system"""
     
-    def __init__(self, websites: List[Dict[str, str]]):
-        self.websites = websites  # [{'name': 'Site Name', 'url': 'https://...'}]
+    PROBES = ('get', 'head', 'range', 'stream')
+    
+    def __init__(self, websites: List[Dict[str, str]], max_workers: int = 32,
+                 per_host_limit: int = 4, sweep_timeout: float = 300, timeout: float = 10,
+                 probe: str = 'stream', stream_bytes: int = 1024, drain_limit: int = 64 * 1024,
+                 history_dir: Optional[str] = 'website_history'):
+        # [{'name': 'Site Name', 'url': 'https://...', 'probe': 'head'}]; 'probe' is optional
+        self.websites = websites
         self.status_file = 'website_status.json'
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.sweep_timeout = sweep_timeout  # Global deadline for one monitor_websites() sweep
+        self.timeout = timeout
+        self.host_slots = {}
+        self.host_slots_lock = threading.Lock()
+        self.probe = probe
+        self.stream_bytes = stream_bytes
+        self.drain_limit = drain_limit
+        
+        # One keep-alive session: repeat checks skip DNS, TCP and TLS setup
+        self.session = requests.Session()
+        adapter = TimedHTTPAdapter(pool_connections=max_workers, pool_maxsize=per_host_limit)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
+        self.history = LatencyStore(history_dir) if history_dir else None
+        self.last_retention = 0.0
     
-    def check_website(self, url: str, timeout: int = 10) -> Dict:
+    def check_website(self, url: str, timeout: int = 10, probe: Optional[str] = None) -> Dict:
         """Check if website is accessible"""
+        probe = probe or self.probe
+        _connect_timing.seconds = 0.0
+        start = time.perf_counter()
         try:
-            response = requests.get(url, timeout=timeout)
+            response = self.send_probe(url, timeout, probe)
+            # HEAD is not allowed everywhere; a one-byte ranged GET is the next cheapest thing
+            if probe == 'head' and response.status_code in (405, 501):
+                response.close()
+                probe = 'range'
+                _connect_timing.seconds = 0.0
+                start = time.perf_counter()
+                response = self.send_probe(url, timeout, probe)
+            
+            header_time = response.elapsed.total_seconds()
+            with response:
+                if probe in ('range', 'stream'):
+                    self.read_probe_body(response)
+            connect_time = _connect_timing.seconds
             return {
                 'status': 'UP',
                 'status_code': response.status_code,
-                'response_time': response.elapsed.total_seconds(),
+                'response_time': round(time.perf_counter() - start, 6),
+                'connect_time': round(connect_time, 6),
+                'ttfb': round(max(header_time - connect_time, 0.0), 6),
+                'reused_connection': connect_time == 0.0,
+                'probe': probe,
                 'timestamp': datetime.now().isoformat()
             }
         except requests.RequestException as e:
             return {
                 'status': 'DOWN',
                 'error': str(e),
+                'probe': probe,
                 'timestamp': datetime.now().isoformat()
             }
     
-    def monitor_websites(self) -> Dict[str, Dict]:
-        """Monitor all configured websites"""
-        results = {}
+    def send_probe(self, url: str, timeout: float, probe: str) -> requests.Response:
+        """Issue the request for a probe method on the pooled session"""
+        if probe not in self.PROBES:
+            raise ValueError(f"Unknown probe method: {probe}")
+        if probe == 'head':
+            return self.session.head(url, timeout=timeout, allow_redirects=True)
+        if probe == 'range':
+            return self.session.get(url, timeout=timeout, stream=True, headers={'Range': 'bytes=0-0'})
+        return self.session.get(url, timeout=timeout, stream=(probe == 'stream'))
+    
+    def read_probe_body(self, response: requests.Response):
+        """Read the first bytes of a streamed body, draining small bodies to keep the connection alive"""
+        length = response.headers.get('Content-Length')
+        if length is not None and length.isdigit() and int(length) <= self.drain_limit:
+            response.content
+        else:
+            # Closing mid-body drops this connection; a new one will be made next time
+            next(response.iter_content(self.stream_bytes), b'')
+    
+    def monitor_websites(self, websites: Optional[List[Dict[str, str]]] = None) -> Dict[str, Dict]:
+        """Monitor configured websites (or a shard of them) concurrently within one sweep deadline"""
+        websites = self.websites if websites is None else websites
+        start = time.monotonic()
+        deadline = start + self.sweep_timeout
+        checked = {}
         
-        for site in self.websites:
-            name = site['name']
-            url = site['url']
-            
-            logging.info(f"Checking {name} ({url})")
-            result = self.check_website(url)
-            results[name] = result
-            
-            if result['status'] == 'UP':
-                logging.info(f"{name} is UP (Response time: {result.get('response_time', 'N/A')}s)")
-            else:
-                logging.warning(f"{name} is DOWN - {result.get('error', 'Unknown error')}")
+        pool = ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(websites))))
+        futures = {pool.submit(self.check_site, site, deadline): site for site in websites}
+        try:
+            for future in as_completed(futures, timeout=self.sweep_timeout):
+                site = futures[future]
+                checked[site['name']] = result = future.result()
+                
+                if result['status'] == 'UP':
+                    logging.info(f"{site['name']} is UP (Response time: {result.get('response_time', 'N/A')}s)",
+                                 extra={'sample_key': 'site_up'})
+                else:
+                    logging.warning(f"{site['name']} is DOWN - {result.get('error', 'Unknown error')}",
+                                    extra={'sample_key': 'site_down'})
+        except FuturesTimeout:
+            logging.warning(f"Sweep deadline of {self.sweep_timeout}s reached with "
+                            f"{len(websites) - len(checked)} sites unchecked")
+        finally:
+            # Don't wait for stragglers; their own timeouts end at the deadline
+            pool.shutdown(wait=False, cancel_futures=True)
+        
+        results = {}
+        for site in websites:
+            results[site['name']] = checked.get(site['name']) or {
+                'status': 'DOWN',
+                'error': 'Sweep deadline exceeded',
+                'timestamp': datetime.now().isoformat()
+            }
         
+        logging.info(f"Checked {len(checked)} sites in {time.monotonic() - start:.2f}s")
         # Save status to file
         self.save_status(results)
         return results
     
+    def check_site(self, site: Dict[str, str], deadline: float) -> Dict:
+        """Check one site, respecting the per-host concurrency limit and the sweep deadline"""
+        url = site['url']
+        logging.info(f"Checking {site['name']} ({url})", extra={'sample_key': 'site_check'})
+        host = urlsplit(url).netloc
+        with self.host_slots_lock:
+            slots = self.host_slots.setdefault(host, threading.BoundedSemaphore(self.per_host_limit))
+        
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not slots.acquire(timeout=remaining):
+            return {'status': 'DOWN', 'error': 'Sweep deadline exceeded', 'timestamp': datetime.now().isoformat()}
+        try:
+            return self.check_website(url, timeout=max(min(self.timeout, deadline - time.monotonic()), 0.001),
+                                      probe=site.get('probe'))
+        finally:
+            slots.release()
+    
     def save_status(self, status: Dict):
-        """Save website status to file"""
+        """Save website status to file and append it to the latency history"""
         try:
             with open(self.status_file, 'w') as f:
                 json.dump(status, f, indent=2)
         except Exception as e:
             logging.error(f"Error saving status: {e}")
+        
+        if self.history:
+            try:
+                for name, result in status.items():
+                    self.history.append(name, result)
+                # Retention rewrites files, so run it at most hourly
+                if time.time() - self.last_retention > 3600:
+                    self.history.apply_retention()
+                    self.last_retention = time.time()
+            except Exception as e:
+                logging.error(f"Error recording status history: {e}")
+    
+    def latency_report(self, name: str, start: datetime, end: Optional[datetime] = None) -> Dict:
+        """Uptime and p50/p95/p99 latency for a site over a time window"""
+        if not self.history:
+            return {}
+        return self.history.query(name, start, end)
     
     def load_previous_status(self) -> Dict:
         """Load previous website status"""
@@ -288,75 +3087,1018 @@ class WebMonitor:
             logging.error(f"Error loading status: {e}")
             return {}
 
+class ResourceSampler:
+    """Background system sampler with in-memory ring buffers and per-metric binary column files"""
+    
+    RAW = struct.Struct('<df')  # timestamp, value
+    ROLLUP = struct.Struct('<dfffI')  # bucket start, min, max, avg, samples
+    RESOLUTIONS = {'minute': 60, 'hour': 3600}
+    
+    def __init__(self, history_dir: Optional[str] = 'resource_history', interval: float = 5.0,
+                 ring_size: int = 720, flush_interval: float = 60.0, processes: Optional[List[int]] = None,
+                 retention_days: Optional[Dict[str, float]] = None):
+        if psutil is None:
+            raise RuntimeError("psutil is required for resource sampling")
+        self.history_dir = Path(history_dir) if history_dir else None
+        if self.history_dir:
+            for name in ('raw', *self.RESOLUTIONS):
+                (self.history_dir / name).mkdir(parents=True, exist_ok=True)
+        self.interval = interval
+        self.ring_size = ring_size  # Samples kept in memory per metric
+        self.flush_interval = flush_interval
+        self.retention_days = {'raw': 2, 'minute': 30, 'hour': 730}
+        self.retention_days.update(retention_days or {})
+        
+        # This process plus any extra PIDs to follow
+        self.processes = {'self': psutil.Process()}
+        for pid in processes or []:
+            try:
+                process = psutil.Process(pid)
+                self.processes[f"{process.name()}_{pid}"] = process
+            except psutil.Error as e:
+                logging.warning(f"Cannot sample process {pid}: {e}")
+        self.mounts = []
+        self.samples_taken = 0
+        
+        self.rings = {}  # metric -> deque of (timestamp, value)
+        self.pending = {}  # metric -> list of raw values awaiting flush
+        self.open_buckets = {}  # (metric, resolution) -> [start, min, max, sum, count]
+        self.pending_rollups = {}  # (metric, resolution) -> list of closed buckets awaiting flush
+        self.latest = {}
+        self.totals = {}  # 'memory' and 'disk.<mount>' capacities; static, so kept out of the history
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.last_flush = time.monotonic()
+        self.last_retention = 0.0
+        
+        # The first cpu_percent() call only sets psutil's baseline
+        psutil.cpu_percent(percpu=True)
+        for process in self.processes.values():
+            process.cpu_percent()
+    
+    @staticmethod
+    def mount_label(mountpoint: str) -> str:
+        return re.sub(r'[^A-Za-z0-9_.-]', '_', mountpoint.strip('/\\:')) or 'root'
+    
+    def collect(self) -> Dict[str, float]:
+        """Take one sample of every metric; cheap enough to call every second"""
+        metrics = {}
+        cores = psutil.cpu_percent(percpu=True)
+        metrics['cpu.total'] = sum(cores) / len(cores) if cores else 0.0
+        for index, value in enumerate(cores):
+            metrics[f'cpu.core{index}'] = value
+        
+        memory = psutil.virtual_memory()
+        metrics['memory.percent'] = memory.percent
+        metrics['memory.available'] = memory.available
+        self.totals['memory'] = memory.total
+        
+        # Mount tables rarely change, so re-read them every 60 samples
+        if self.samples_taken % 60 == 0:
+            self.mounts = [partition.mountpoint for partition in psutil.disk_partitions(all=False)]
+            # The system report always covers the root filesystem, listed or not
+            root = os.path.abspath(os.sep)
+            if root not in self.mounts:
+                self.mounts.insert(0, root)
+        for mountpoint in self.mounts:
+            try:
+                usage = psutil.disk_usage(mountpoint)
+            except OSError:
+                continue
+            label = self.mount_label(mountpoint)
+            metrics[f'disk.{label}.percent'] = usage.percent
+            metrics[f'disk.{label}.free'] = usage.free
+            self.totals[f'disk.{label}'] = usage.total
+        
+        for name, process in list(self.processes.items()):
+            try:
+                with process.oneshot():
+                    metrics[f'process.{name}.cpu'] = process.cpu_percent()
+                    metrics[f'process.{name}.rss'] = process.memory_info().rss
+                    metrics[f'process.{name}.threads'] = process.num_threads()
+            except psutil.Error:
+                logging.warning(f"Process {name} is gone, no longer sampling it")
+                del self.processes[name]
+        
+        self.samples_taken += 1
+        return metrics
+    
+    def record(self, timestamp: float, metrics: Dict[str, float]):
+        with self.lock:
+            self.latest = {'timestamp': timestamp, **metrics}
+            for metric, value in metrics.items():
+                ring = self.rings.get(metric)
+                if ring is None:
+                    ring = self.rings[metric] = deque(maxlen=self.ring_size)
+                ring.append((timestamp, value))
+                if not self.history_dir:
+                    continue
+                self.pending.setdefault(metric, []).append(self.RAW.pack(timestamp, value))
+                for resolution, size in self.RESOLUTIONS.items():
+                    self.add_to_bucket(metric, resolution, int(timestamp // size * size), value)
+    
+    def add_to_bucket(self, metric: str, resolution: str, start: int, value: float):
+        key = (metric, resolution)
+        bucket = self.open_buckets.get(key)
+        if bucket and bucket[0] != start:
+            self.pending_rollups.setdefault(key, []).append(self.pack_bucket(bucket))
+            bucket = None
+        if bucket is None:
+            self.open_buckets[key] = [start, value, value, value, 1]
+            return
+        bucket[1] = min(bucket[1], value)
+        bucket[2] = max(bucket[2], value)
+        bucket[3] += value
+        bucket[4] += 1
+    
+    def pack_bucket(self, bucket: list) -> bytes:
+        start, low, high, total, count = bucket
+        return self.ROLLUP.pack(start, low, high, total / count, count)
+    
+    def metric_path(self, resolution: str, metric: str) -> Path:
+        return self.history_dir / resolution / f'{metric}.bin'
+    
+    def flush(self):
+        """Append buffered samples and closed rollup buckets, one write per metric file"""
+        if not self.history_dir:
+            return
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            rollups, self.pending_rollups = self.pending_rollups, {}
+        for metric, records in pending.items():
+            with open(self.metric_path('raw', metric), 'ab') as f:
+                f.write(b''.join(records))
+        for (metric, resolution), records in rollups.items():
+            with open(self.metric_path(resolution, metric), 'ab') as f:
+                f.write(b''.join(records))
+        self.last_flush = time.monotonic()
+        
+        # Retention rewrites files, so run it at most hourly
+        if time.time() - self.last_retention > 3600:
+            now = time.time()
+            for name in ('raw', *self.RESOLUTIONS):
+                record = self.RAW if name == 'raw' else self.ROLLUP
+                for path in (self.history_dir / name).glob('*.bin'):
+                    trim_records(path, record, now - self.retention_days[name] * 86400)
+            self.last_retention = now
+    
+    def run(self):
+        next_sample = time.monotonic()
+        while not self.stop_event.is_set():
+            try:
+                self.record(time.time(), self.collect())
+                if time.monotonic() - self.last_flush >= self.flush_interval:
+                    self.flush()
+            except Exception as e:
+                logging.error(f"Resource sampling failed: {e}")
+            # Fixed-rate schedule; skip ahead rather than burst after a stall
+            next_sample += self.interval
+            now = time.monotonic()
+            if next_sample < now:
+                next_sample = now + self.interval
+            self.stop_event.wait(next_sample - now)
+        self.flush()
+    
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='resource-sampler', daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+    
+    def metrics(self) -> List[str]:
+        with self.lock:
+            names = set(self.rings)
+        if self.history_dir:
+            names.update(path.stem for path in (self.history_dir / 'raw').glob('*.bin'))
+        return sorted(names)
+    
+    def recent(self, metric: str, seconds: Optional[float] = None) -> List[tuple]:
+        """(timestamp, value) samples from the in-memory ring buffer"""
+        with self.lock:
+            samples = list(self.rings.get(metric, ()))
+        if seconds is not None:
+            cutoff = time.time() - seconds
+            samples = samples[bisect.bisect_left(samples, (cutoff,)):]
+        return samples
+    
+    def query(self, metric: str, start: datetime, end: Optional[datetime] = None,
+              resolution: Optional[str] = None) -> List[tuple]:
+        """(timestamp, min, max, avg) points for a metric, from the coarsest file that fits the range"""
+        end = end or datetime.now()
+        start_ts, end_ts = start.timestamp(), end.timestamp()
+        if resolution is None:
+            span = end_ts - start_ts
+            resolution = 'raw' if span <= 2 * 3600 else 'minute' if span <= 3 * 86400 else 'hour'
+            if resolution == 'raw' and time.time() - start_ts > self.retention_days['raw'] * 86400:
+                resolution = 'minute'
+        self.flush()
+        
+        if resolution == 'raw':
+            path = self.metric_path('raw', metric)
+            first, last = find_record(path, self.RAW, start_ts), find_record(path, self.RAW, end_ts)
+            return [(timestamp, value, value, value)
+                    for timestamp, value in read_records(path, self.RAW, first, last)]
+        
+        size = self.RESOLUTIONS[resolution]
+        path = self.metric_path(resolution, metric)
+        first = find_record(path, self.ROLLUP, start_ts // size * size)
+        last = find_record(path, self.ROLLUP, end_ts)
+        points = [row[:4] for row in read_records(path, self.ROLLUP, first, last)]
+        with self.lock:
+            bucket = self.open_buckets.get((metric, resolution))
+            if bucket and bucket[0] + size > start_ts and bucket[0] < end_ts:
+                points.append((bucket[0], bucket[1], bucket[2], bucket[3] / bucket[4]))
+        return points
+
+class TaskRun:
+    """Measurements for one task run; the task fills in items, bytes and success"""
+    
+    def __init__(self, task: str):
+        self.task = task
+        self.started = time.time()
+        self.duration = 0.0
+        self.items = 0
+        self.bytes = 0
+        self.success = True
+        self.error = None
+        self.peak_rss = 0
+
+class TaskMetrics:
+    """Per-run task metrics in SQLite, exported as Prometheus text and percentile summaries"""
+    
+    def __init__(self, db_path: str = 'task_metrics.db', prometheus_file: Optional[str] = 'task_metrics.prom',
+                 sample_interval: float = 0.5, retention_days: int = 365):
+        self.db_path = str(db_path)
+        self.prometheus_file = Path(prometheus_file) if prometheus_file else None
+        self.sample_interval = sample_interval
+        self.retention_days = retention_days
+        self.active = set()
+        self.lock = threading.Lock()
+        self.sampler = None
+        self.server = None
+        with closing(self.connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    id INTEGER PRIMARY KEY,
+                    task TEXT NOT NULL,
+                    started REAL NOT NULL,
+                    duration REAL NOT NULL,
+                    items INTEGER NOT NULL,
+                    bytes INTEGER NOT NULL,
+                    success INTEGER NOT NULL,
+                    peak_rss INTEGER NOT NULL,
+                    error TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_runs_task ON runs(task, started);
+                -- Lifetime counts for the Prometheus counters; unlike runs, never pruned
+                CREATE TABLE IF NOT EXISTS totals (
+                    task TEXT PRIMARY KEY,
+                    runs INTEGER NOT NULL,
+                    failures INTEGER NOT NULL
+                );
+            """)
+            # Databases from before the totals table start from the runs they still hold
+            conn.execute("INSERT OR IGNORE INTO totals (task, runs, failures) "
+                         "SELECT task, COUNT(*), SUM(success = 0) FROM runs GROUP BY task")
+    
+    def connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+    
+    @staticmethod
+    def current_rss() -> int:
+        return psutil.Process().memory_info().rss if psutil else 0
+    
+    @contextmanager
+    def track(self, task: str):
+        """Time a task run, sample its peak RSS and record the outcome"""
+        run = TaskRun(task)
+        run.peak_rss = self.current_rss()
+        with self.lock:
+            self.active.add(run)
+            if psutil and not (self.sampler and self.sampler.is_alive()):
+                self.sampler = threading.Thread(target=self.sample_rss, daemon=True)
+                self.sampler.start()
+        start = time.perf_counter()
+        try:
+            yield run
+        except Exception as e:
+            run.success = False
+            run.error = str(e)
+            raise
+        finally:
+            run.duration = time.perf_counter() - start
+            with self.lock:
+                self.active.discard(run)
+            run.peak_rss = max(run.peak_rss, self.current_rss())
+            self.record(run)
+    
+    def sample_rss(self):
+        # RSS is process-wide, so concurrent runs share samples
+        while True:
+            with self.lock:
+                if not self.active:
+                    self.sampler = None
+                    return
+                runs = list(self.active)
+            rss = self.current_rss()
+            for run in runs:
+                run.peak_rss = max(run.peak_rss, rss)
+            time.sleep(self.sample_interval)
+    
+    def record(self, run: TaskRun):
+        try:
+            with closing(self.connect()) as conn, conn:
+                conn.execute(
+                    "INSERT INTO runs (task, started, duration, items, bytes, success, peak_rss, error) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (run.task, run.started, run.duration, run.items, run.bytes,
+                     int(run.success), run.peak_rss, run.error)
+                )
+                conn.execute(
+                    "INSERT INTO totals (task, runs, failures) VALUES (?, 1, ?) "
+                    "ON CONFLICT(task) DO UPDATE SET runs = runs + 1, failures = failures + excluded.failures",
+                    (run.task, int(not run.success))
+                )
+                conn.execute("DELETE FROM runs WHERE started < ?",
+                             (time.time() - self.retention_days * 86400,))
+            logging.info(f"{run.task}: {run.duration:.2f}s, {run.items} items, {run.bytes} bytes, "
+                         f"peak RSS {run.peak_rss / 1024 / 1024:.1f} MB, "
+                         f"{'success' if run.success else 'failed'}")
+            if self.prometheus_file:
+                self.write_prometheus()
+        except Exception as e:
+            logging.error(f"Error recording metrics for {run.task}: {e}")
+    
+    @staticmethod
+    def percentile(values: List[float], fraction: float) -> float:
+        """Nearest-rank percentile of sorted values"""
+        return values[min(len(values) - 1, max(0, math.ceil(fraction * len(values)) - 1))]
+    
+    def summary(self, days: Optional[float] = None) -> Dict[str, Dict]:
+        """Per-task run counts, success rate and duration/items/bytes/RSS percentiles"""
+        since = time.time() - days * 86400 if days else 0
+        with closing(self.connect()) as conn:
+            rows = conn.execute(
+                "SELECT task, duration, items, bytes, success, peak_rss, started FROM runs "
+                "WHERE started >= ? ORDER BY task, started", (since,)
+            ).fetchall()
+        
+        tasks = {}
+        for task, duration, items, size, success, peak_rss, started in rows:
+            tasks.setdefault(task, []).append((duration, items, size, success, peak_rss, started))
+        
+        summary = {}
+        for task, runs in tasks.items():
+            durations = sorted(run[0] for run in runs)
+            last = runs[-1]
+            summary[task] = {
+                'runs': len(runs),
+                'failures': sum(1 for run in runs if not run[3]),
+                'success_rate': round(100.0 * sum(run[3] for run in runs) / len(runs), 1),
+                'duration_p50': round(self.percentile(durations, 0.50), 3),
+                'duration_p95': round(self.percentile(durations, 0.95), 3),
+                'duration_p99': round(self.percentile(durations, 0.99), 3),
+                'duration_max': round(durations[-1], 3),
+                'items_p50': self.percentile(sorted(run[1] for run in runs), 0.50),
+                'bytes_p50': self.percentile(sorted(run[2] for run in runs), 0.50),
+                'peak_rss_max': max(run[4] for run in runs),
+                'last_run': datetime.fromtimestamp(last[5]).isoformat(timespec='seconds'),
+                'last_duration': round(last[0], 3),
+                'last_items': last[1],
+                'last_bytes': last[2],
+                'last_success': bool(last[3]),
+                'last_peak_rss': last[4]
+            }
+        return summary
+    
+    def totals(self) -> Dict[str, tuple]:
+        """Lifetime (runs, failures) per task, including runs pruned from history"""
+        with closing(self.connect()) as conn:
+            return {task: (runs, failures)
+                    for task, runs, failures in conn.execute("SELECT task, runs, failures FROM totals")}
+    
+    def prometheus_text(self) -> str:
+        """Render the latest run and historical duration quantiles in Prometheus text format"""
+        summary = self.summary()
+        for task, (runs, failures) in self.totals().items():
+            if task in summary:
+                summary[task]['runs_total'] = runs
+                summary[task]['failures_total'] = failures
+        metrics = [
+            ('automation_task_last_duration_seconds', 'gauge', 'Duration of the last run', 'last_duration'),
+            ('automation_task_last_items', 'gauge', 'Items processed by the last run', 'last_items'),
+            ('automation_task_last_bytes', 'gauge', 'Bytes processed by the last run', 'last_bytes'),
+            ('automation_task_last_success', 'gauge', 'Whether the last run succeeded', 'last_success'),
+            ('automation_task_last_peak_rss_bytes', 'gauge', 'Peak process RSS during the last run',
+             'last_peak_rss'),
+            ('automation_task_runs_total', 'counter', 'Runs since metrics began', 'runs_total'),
+            ('automation_task_failures_total', 'counter', 'Failed runs since metrics began', 'failures_total')
+        ]
+        lines = []
+        for name, kind, help_text, key in metrics:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for task, stats in summary.items():
+                lines.append(f'{name}{{task="{task}"}} {int(stats[key]) if key == "last_success" else stats[key]}')
+        
+        lines.append("# HELP automation_task_duration_seconds Run duration quantiles over recorded history")
+        lines.append("# TYPE automation_task_duration_seconds summary")
+        for task, stats in summary.items():
+            for quantile, key in (('0.5', 'duration_p50'), ('0.95', 'duration_p95'), ('0.99', 'duration_p99')):
+                lines.append(f'automation_task_duration_seconds{{task="{task}",quantile="{quantile}"}} {stats[key]}')
+        return '\n'.join(lines) + '\n'
+    
+    def write_prometheus(self):
+        """Write metrics for the node_exporter textfile collector (atomic replace)"""
+        temp_path = self.prometheus_file.with_suffix('.tmp')
+        temp_path.write_text(self.prometheus_text())
+        os.replace(temp_path, self.prometheus_file)
+    
+    def serve_prometheus(self, port: int = 9108, host: str = '127.0.0.1'):
+        """Serve /metrics over HTTP from a background thread"""
+        metrics = self
+        
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        logging.info(f"Serving task metrics on http://{host}:{port}/metrics")
+    
+    def print_summary(self, days: Optional[float] = None):
+        """Print a table of historical task percentiles"""
+        summary = self.summary(days)
+        if not summary:
+            print("No task runs recorded")
+            return
+        print(f"{'Task':<22}{'Runs':>6}{'OK %':>7}{'p50 s':>10}{'p95 s':>10}{'p99 s':>10}"
+              f"{'Items p50':>11}{'MB p50':>10}{'Peak RSS MB':>13}  Last run")
+        for task, stats in sorted(summary.items()):
+            print(f"{task:<22}{stats['runs']:>6}{stats['success_rate']:>7}{stats['duration_p50']:>10}"
+                  f"{stats['duration_p95']:>10}{stats['duration_p99']:>10}{stats['items_p50']:>11}"
+                  f"{stats['bytes_p50'] / 1024 / 1024:>10.1f}{stats['peak_rss_max'] / 1024 / 1024:>13.1f}"
+                  f"  {stats['last_run']}")
+
+class LeaseCoordinator:
+    """Job leases and instance membership in a SQLite file on storage shared by all instances"""
+    
+    def __init__(self, db_path: str, instance_id: Optional[str] = None, lease_ttl: float = 60):
+        self.db_path = str(db_path)
+        self.instance_id = instance_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        # Must comfortably exceed clock skew between hosts
+        self.lease_ttl = lease_ttl
+        self.held = {}  # job name -> run key of leases this instance holds
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        with closing(self.connect()) as conn:
+            # Rollback journal rather than WAL: WAL needs shared memory, which network filesystems lack
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS leases (
+                    name TEXT PRIMARY KEY,
+                    holder TEXT NOT NULL,
+                    run_key TEXT NOT NULL,
+                    expires REAL NOT NULL,
+                    completed INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS instances (
+                    instance_id TEXT PRIMARY KEY,
+                    heartbeat REAL NOT NULL
+                );
+            """)
+        self.heartbeat()
+        self.heartbeat_thread = threading.Thread(target=self.heartbeat_loop, daemon=True)
+        self.heartbeat_thread.start()
+    
+    def connect(self) -> sqlite3.Connection:
+        # Autocommit mode so transactions can be opened explicitly with BEGIN IMMEDIATE
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+    
+    def acquire(self, name: str, run_key: str) -> tuple:
+        """Try to take the lease for one run of a job; returns (acquired, retry_at)"""
+        now = time.time()
+        with closing(self.connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT holder, run_key, expires, completed FROM leases WHERE name = ?",
+                                   (name,)).fetchone()
+                if row:
+                    holder, current_key, expires, completed = row
+                    if current_key == run_key and completed:
+                        conn.execute("COMMIT")
+                        return False, None  # Another instance already ran this interval
+                    if holder != self.instance_id and not completed and expires > now:
+                        conn.execute("COMMIT")
+                        return False, expires  # Running elsewhere; retry once the lease could lapse
+                conn.execute("INSERT OR REPLACE INTO leases (name, holder, run_key, expires, completed) "
+                             "VALUES (?, ?, ?, ?, 0)", (name, self.instance_id, run_key, now + self.lease_ttl))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        with self.lock:
+            self.held[name] = run_key
+        if row and row[0] != self.instance_id and not row[3]:
+            logging.warning(f"Took over lease for {name} from {row[0]}")
+        return True, None
+    
+    def release(self, name: str):
+        """Mark the held run complete so no other instance repeats it"""
+        with self.lock:
+            run_key = self.held.pop(name, None)
+        if run_key is None:
+            return
+        with closing(self.connect()) as conn:
+            conn.execute("UPDATE leases SET completed = 1, expires = ? WHERE name = ? AND holder = ? AND run_key = ?",
+                         (time.time(), name, self.instance_id, run_key))
+    
+    def heartbeat(self):
+        """Record this instance as alive and extend every lease it holds"""
+        now = time.time()
+        with self.lock:
+            held = dict(self.held)
+        with closing(self.connect()) as conn:
+            conn.execute("INSERT OR REPLACE INTO instances (instance_id, heartbeat) VALUES (?, ?)",
+                         (self.instance_id, now))
+            conn.execute("DELETE FROM instances WHERE heartbeat < ?", (now - 10 * self.lease_ttl,))
+            for name, run_key in held.items():
+                cursor = conn.execute(
+                    "UPDATE leases SET expires = ? WHERE name = ? AND holder = ? AND run_key = ?",
+                    (now + self.lease_ttl, name, self.instance_id, run_key)
+                )
+                if not cursor.rowcount:
+                    logging.error(f"Lost lease for {name}; another instance may be running it")
+                    with self.lock:
+                        self.held.pop(name, None)
+    
+    def heartbeat_loop(self):
+        while not self.stop_event.wait(self.lease_ttl / 3):
+            try:
+                self.heartbeat()
+            except Exception as e:
+                logging.error(f"Lease heartbeat failed: {e}")
+    
+    def live_instances(self) -> List[str]:
+        with closing(self.connect()) as conn:
+            rows = conn.execute("SELECT instance_id FROM instances WHERE heartbeat >= ?",
+                                (time.time() - self.lease_ttl,)).fetchall()
+        return sorted({row[0] for row in rows} | {self.instance_id})
+    
+    def shard(self, items: List, key) -> List:
+        """Items this instance owns, by rendezvous hashing over live instances"""
+        try:
+            instances = self.live_instances()
+        except Exception as e:
+            logging.error(f"Error reading instances, handling all items: {e}")
+            return list(items)
+        
+        def owner(item):
+            item_key = key(item)
+            return max(instances, key=lambda instance: hashlib.blake2b(
+                f"{instance}|{item_key}".encode(), digest_size=8).digest())
+        
+        return [item for item in items if owner(item) == self.instance_id]
+    
+    def close(self):
+        """Leave the cluster and let others take over unfinished leases immediately"""
+        self.stop_event.set()
+        with self.lock:
+            held, self.held = self.held, {}
+        with closing(self.connect()) as conn:
+            conn.execute("DELETE FROM instances WHERE instance_id = ?", (self.instance_id,))
+            for name, run_key in held.items():
+                conn.execute("UPDATE leases SET expires = 0 WHERE name = ? AND holder = ? AND run_key = ?",
+                             (name, self.instance_id, run_key))
+
+class ScheduledJob:
+    """A recurring job with its own timing, timeout, jitter and catch-up policy"""
+    
+    CATCH_UP_POLICIES = ('skip', 'once', 'all')
+    WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+    
+    def __init__(self, name: str, func, interval: Optional[float] = None, at: Optional[str] = None,
+                 weekday: Optional[str] = None, timeout: Optional[float] = None, jitter: float = 0,
+                 catch_up: str = 'once', grace: float = 300, exclusive: bool = True):
+        if (interval is None) == (at is None):
+            raise ValueError(f"Job {name} needs exactly one of interval or at")
+        if catch_up not in self.CATCH_UP_POLICIES:
+            raise ValueError(f"Unknown catch-up policy: {catch_up}")
+        self.name = name
+        self.func = func
+        self.interval = timedelta(seconds=interval) if interval is not None else None
+        self.at = datetime.strptime(at, '%H:%M').time() if at else None
+        self.weekday = self.WEEKDAYS.index(weekday.lower()) if weekday else None
+        self.timeout = timeout
+        self.jitter = jitter
+        self.catch_up = catch_up
+        self.grace = grace  # Runs later than this are treated as missed
+        self.exclusive = exclusive  # With a coordinator, run on one instance per interval
+        
+        self.due = None  # Nominal time of the next run, before jitter
+        self.running = False
+        self.run_id = 0
+        self.started = None
+        self.backlog = 0  # Runs owed to the catch-up policy
+        self.last_result = None
+        self.last_error = None
+        self.last_duration = None
+        self.timeouts = 0
+        self.pending_key = None  # Run key waiting for another instance's lease to lapse
+    
+    def run_key(self, due: datetime) -> str:
+        """Identify a run the same way on every instance, whatever their local anchors"""
+        if self.interval:
+            return str(int(due.timestamp() // self.interval.total_seconds()))
+        return due.isoformat(timespec='minutes')
+    
+    def next_run_after(self, moment: datetime) -> datetime:
+        """Next nominal run time strictly after moment"""
+        if self.interval:
+            # Aligned to multiples of the interval so every instance agrees on run boundaries
+            seconds = self.interval.total_seconds()
+            boundary = moment.timestamp() // seconds + 1
+            candidate = datetime.fromtimestamp(boundary * seconds)
+            if candidate <= moment:  # Microsecond rounding on sub-second intervals
+                candidate = datetime.fromtimestamp((boundary + 1) * seconds)
+            return candidate
+        candidate = datetime.combine(moment.date(), self.at)
+        if candidate <= moment:
+            candidate += timedelta(days=1)
+        if self.weekday is not None:
+            candidate += timedelta(days=(self.weekday - candidate.weekday()) % 7)
+        return candidate
+
+class DeadlineScheduler:
+    """Heap-based scheduler that sleeps until the next deadline and runs jobs on a worker pool"""
+    
+    def __init__(self, max_workers: int = 4, state_file: Optional[str] = None, max_sleep: float = 3600,
+                 coordinator: Optional[LeaseCoordinator] = None):
+        self.jobs = {}
+        self.coordinator = coordinator
+        self.heap = []  # (run_at timestamp, sequence, kind, job name, run id)
+        self.sequence = 0
+        self.state_file = Path(state_file) if state_file else None
+        self.state = self.load_state()
+        # Bound each sleep so wall-clock changes (DST, NTP steps) are noticed
+        self.max_sleep = max_sleep
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self.lock = threading.Lock()
+        self.ready = []  # (job, run id) started under the lock, submitted once it is released
+        self.wakeup = threading.Event()
+        self.stop_event = threading.Event()
+    
+    def load_state(self) -> Dict[str, str]:
+        if not self.state_file:
+            return {}
+        try:
+            with open(self.state_file) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logging.error(f"Error loading scheduler state: {e}")
+            return {}
+    
+    def save_state(self):
+        if not self.state_file:
+            return
+        try:
+            temp_path = self.state_file.with_suffix('.tmp')
+            with open(temp_path, 'w') as f:
+                json.dump(self.state, f, indent=2)
+            os.replace(temp_path, self.state_file)
+        except Exception as e:
+            logging.error(f"Error saving scheduler state: {e}")
+    
+    def add_job(self, name: str, func, **options) -> ScheduledJob:
+        """Register a recurring job; runs missed while the process was down follow its catch-up policy"""
+        job = ScheduledJob(name, func, **options)
+        now = datetime.now()
+        last_due = self.state.get(name)
+        # Resume the cadence from the last recorded run so missed runs are detected
+        job.due = job.next_run_after(datetime.fromisoformat(last_due) if last_due else now)
+        with self.lock:
+            self.jobs[name] = job
+            self.push(job.due, 'run', job, job.jitter)
+        self.wakeup.set()
+        return job
+    
+    def push(self, due: datetime, kind: str, job: ScheduledJob, jitter: float = 0):
+        run_at = due.timestamp() + (random.uniform(0, jitter) if jitter else 0)
+        self.sequence += 1
+        heapq.heappush(self.heap, (run_at, self.sequence, kind, job.name, job.run_id))
+    
+    def run(self):
+        """Dispatch jobs until stop() is called"""
+        logging.info(f"Scheduler running {len(self.jobs)} jobs")
+        while not self.stop_event.is_set():
+            with self.lock:
+                now = time.time()
+                while self.heap and self.heap[0][0] <= now and not self.stop_event.is_set():
+                    _, _, kind, name, run_id = heapq.heappop(self.heap)
+                    job = self.jobs.get(name)
+                    if not job:
+                        continue
+                    if kind == 'run':
+                        self.dispatch(job)
+                    elif kind == 'claim':
+                        if job.pending_key and not job.running and self.claim(job, job.pending_key):
+                            self.start(job)
+                    elif job.running and job.run_id == run_id:
+                        self.expire(job)
+                delay = self.heap[0][0] - now if self.heap else self.max_sleep
+                self.wakeup.clear()
+            self.launch()
+            self.wakeup.wait(min(max(delay, 0), self.max_sleep))
+    
+    def dispatch(self, job: ScheduledJob):
+        """Start a due job (or record it as owed) and schedule its next occurrence"""
+        now = datetime.now()
+        due = job.due
+        
+        # Count occurrences that passed while this one waited, and move to the next future one
+        missed = 0
+        next_due = job.next_run_after(due)
+        while next_due <= now:
+            missed += 1
+            next_due = job.next_run_after(next_due)
+        job.due = next_due
+        self.push(next_due, 'run', job, job.jitter)
+        self.state[job.name] = due.isoformat()
+        self.save_state()
+        
+        late = (now - due).total_seconds() > job.grace
+        if late and job.catch_up == 'skip':
+            logging.warning(f"Skipping missed run of {job.name} due at {due:%Y-%m-%d %H:%M}")
+            return
+        if missed:
+            logging.warning(f"{job.name} missed {missed} runs, catch-up policy {job.catch_up}")
+        owed = missed if job.catch_up == 'all' else 0
+        
+        if job.running:
+            # Never overlap a job with itself; 'once' and 'all' remember the owed run
+            if job.catch_up == 'skip':
+                logging.warning(f"{job.name} still running, skipping this run")
+            else:
+                job.backlog = job.backlog + 1 + owed if job.catch_up == 'all' else 1
+                logging.warning(f"{job.name} still running, deferring run")
+            return
+        if not self.claim(job, job.run_key(due)):
+            return
+        job.backlog += owed
+        self.start(job)
+    
+    def claim(self, job: ScheduledJob, run_key: str) -> bool:
+        """Take the cross-instance lease for a run, or arrange to retry if its holder dies"""
+        job.pending_key = None
+        if not (self.coordinator and job.exclusive):
+            return True
+        try:
+            acquired, retry_at = self.coordinator.acquire(job.name, run_key)
+        except Exception as e:
+            # Prefer a duplicate run over a missed backup
+            logging.warning(f"Lease check failed for {job.name}, running locally: {e}")
+            return True
+        if not acquired and retry_at:
+            job.pending_key = run_key
+            self.push(datetime.fromtimestamp(retry_at + 1), 'claim', job)
+            logging.info(f"{job.name} is running on another instance")
+        return acquired
+    
+    def start(self, job: ScheduledJob):
+        job.running = True
+        job.run_id += 1
+        job.started = time.time()
+        if job.timeout:
+            self.push(datetime.now() + timedelta(seconds=job.timeout), 'timeout', job)
+        self.ready.append((job, job.run_id))
+    
+    def launch(self):
+        """Submit jobs started under the lock"""
+        # Called without the lock: a job that finishes before its callback is attached
+        # runs finished() on this thread, and finished() takes the lock
+        with self.lock:
+            ready, self.ready = self.ready, []
+        for job, run_id in ready:
+            try:
+                future = self.executor.submit(job.func)
+            except RuntimeError:  # Executor shut down by stop()
+                with self.lock:
+                    job.running = False
+                continue
+            future.add_done_callback(lambda f, job=job, run_id=run_id: self.finished(job, run_id, f))
+    
+    def expire(self, job: ScheduledJob):
+        # Threads cannot be killed; the job stays marked running so it is not started twice
+        job.timeouts += 1
+        logging.error(f"{job.name} exceeded its {job.timeout}s timeout and is still running")
+    
+    def finished(self, job: ScheduledJob, run_id: int, future):
+        with self.lock:
+            job.last_duration = time.time() - job.started
+            try:
+                job.last_result = future.result()
+                job.last_error = None
+                logging.info(f"{job.name} finished in {job.last_duration:.1f}s")
+            except Exception as e:
+                job.last_error = str(e)
+                logging.error(f"{job.name} failed after {job.last_duration:.1f}s: {e}")
+            job.running = False
+            if job.backlog and not self.stop_event.is_set():
+                job.backlog -= 1
+                self.start(job)
+        self.launch()
+        if self.coordinator and not job.running:
+            try:
+                self.coordinator.release(job.name)
+            except Exception as e:
+                logging.error(f"Error releasing lease for {job.name}: {e}")
+        self.wakeup.set()
+    
+    def stop(self, wait: bool = True):
+        with self.lock:
+            self.stop_event.set()
+        self.wakeup.set()
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+
 class AutomationScheduler:
     """Main automation scheduler"""
     
     def __init__(self):
         self.file_organizer = None
+        self.watch_files = False
+        self.file_watch_thread = None
         self.backup_manager = None
+        self.database_backup = None
         self.email_automation = None
         self.web_monitor = None
+        self.scheduler = DeadlineScheduler(max_workers=4, state_file='scheduler_state.json')
+        # Created by setup_task_metrics, or with defaults by the first tracked run
+        self.metrics = None
+        self.coordinator = None
+        self.resource_sampler = None
+    
+    def setup_task_metrics(self, db_path: str = 'task_metrics.db', **options):
+        """Record per-run task metrics in db_path"""
+        self.metrics = TaskMetrics(db_path, **options)
     
-    def setup_file_organizer(self, source_dir: str, organized_dir: str):
+    def track(self, task: str):
+        """Track one task run, setting up the default metrics database on first use"""
+        if not self.metrics:
+            self.setup_task_metrics()
+        return self.metrics.track(task)
+    
+    def setup_coordination(self, db_path: str, **options):
+        """Share jobs with other instances through a lease database on shared storage"""
+        self.coordinator = LeaseCoordinator(db_path, **options)
+        self.scheduler.coordinator = self.coordinator
+    
+    def setup_resource_sampler(self, history_dir: str = 'resource_history', **options):
+        """Start sampling CPU, memory, disk and process usage in the background"""
+        self.resource_sampler = ResourceSampler(history_dir, **options)
+        self.resource_sampler.start()
+    
+    def setup_file_organizer(self, source_dir: str, organized_dir: str, watch: bool = False, **options):
         """Setup file organization automation"""
-        self.file_organizer = FileOrganizer(source_dir, organized_dir)
+        self.file_organizer = FileOrganizer(source_dir, organized_dir, **options)
+        self.watch_files = watch
     
-    def setup_backup_manager(self, source_dirs: List[str], backup_dir: str):
+    def setup_backup_manager(self, source_dirs: List[str], backup_dir: str, **options):
         """Setup backup automation"""
-        self.backup_manager = BackupManager(source_dirs, backup_dir)
+        self.backup_manager = BackupManager(source_dirs, backup_dir, **options)
+    
+    def setup_database_backup(self, db_path: str, backup_dir: str, **options):
+        """Setup online database backup"""
+        self.database_backup = DatabaseBackup(db_path, backup_dir, **options)
     
     def setup_email_automation(self, smtp_server: str, smtp_port: int, 
-                             email: str, password: str):
+                             email: str, password: str, **options):
         """Setup email automation"""
-        self.email_automation = EmailAutomation(smtp_server, smtp_port, email, password)
+        self.email_automation = EmailAutomation(smtp_server, smtp_port, email, password, **options)
     
-    def setup_web_monitor(self, websites: List[Dict[str, str]]):
+    def setup_web_monitor(self, websites: List[Dict[str, str]], **options):
         """Setup website monitoring"""
-        self.web_monitor = WebMonitor(websites)
+        self.web_monitor = WebMonitor(websites, **options)
     
     def run_file_organization(self):
         """Run file organization task"""
         if self.file_organizer:
             logging.info("Starting file organization...")
-            count = self.file_organizer.organize_files()
-            self.file_organizer.clean_empty_folders()
+            with self.track('file_organization') as run:
+                count = self.file_organizer.organize_files()
+                self.file_organizer.clean_empty_folders()
+                if self.file_organizer.prune_source:
+                    # Only folders this run emptied, deepest first; source_dir itself always stays
+                    self.file_organizer.clean_empty_folders(self.file_organizer.source_dir,
+                                                            touched=self.file_organizer.emptied_dirs)
+                # organize_files() returns None when the source directory is missing
+                run.items = count or 0
+                run.bytes = self.file_organizer.last_stats.get('bytes', 0)
             return count
         return 0
     
+    def start_file_watch(self) -> bool:
+        """Start organizing files on arrival in a background thread"""
+        if not self.file_organizer:
+            return False
+        try:
+            # Fail fast here rather than inside the thread if inotify is unavailable
+            InotifyWatcher().close()
+        except OSError as e:
+            logging.error(f"File watch unavailable, using scheduled organization: {e}")
+            return False
+        
+        self.file_watch_thread = threading.Thread(target=self.file_organizer.watch, daemon=True)
+        self.file_watch_thread.start()
+        return True
+    
     def run_backup_task(self):
         """Run backup task"""
         if self.backup_manager:
             logging.info("Starting backup task...")
-            backup_paths = self.backup_manager.create_backup()
-            self.backup_manager.cleanup_old_backups()
+            with self.track('backup') as run:
+                backup_paths = self.backup_manager.create_backup()
+                self.backup_manager.cleanup_old_backups()
+                for stats in self.backup_manager.last_stats.values():
+                    run.items += stats.get('files', stats.get('copied', 0) + stats.get('linked', 0))
+                    run.bytes += stats.get('bytes', stats.get('bytes_copied', 0))
+                run.success = len(backup_paths) == len(self.backup_manager.source_dirs)
             
             # Send email report if email is configured
             if self.email_automation and backup_paths:
                 self.email_automation.send_backup_report(
                     "admin@example.com",  # Configure recipient
-                    backup_paths
+                    backup_paths,
+                    self.backup_manager.last_verification
                 )
             
             return backup_paths
         return []
     
+    def run_database_backup(self):
+        """Run online database backup task"""
+        if self.database_backup:
+            logging.info("Starting database backup...")
+            with self.track('database_backup') as run:
+                report = self.database_backup.backup_database()
+                self.database_backup.cleanup_old_backups()
+                run.items = report.get('pages', 0)
+                run.bytes = report.get('bytes', 0)
+                run.success = report.get('status') == 'SUCCESS'
+                run.error = report.get('error')
+            return report
+        return {}
+    
     def run_website_monitoring(self):
         """Run website monitoring task"""
         if self.web_monitor:
             logging.info("Starting website monitoring...")
-            return self.web_monitor.monitor_websites()
+            with self.track('website_monitoring') as run:
+                # With several instances, each checks its own shard of the sites
+                sites = (self.coordinator.shard(self.web_monitor.websites, key=lambda site: site['url'])
+                         if self.coordinator else None)
+                status = self.web_monitor.monitor_websites(sites)
+                run.items = len(status)
+            return status
         return {}
     
     def schedule_tasks(self):
         """Schedule all automation tasks"""
-        # Schedule file organization every day at 2 AM
-        schedule.every().day.at("02:00").do(self.run_file_organization)
+        # Organize files as they arrive, or every day at 2 AM without watch mode;
+        # inotify only sees the top level, so recursive organizers keep the daily run too
+        watching = self.watch_files and self.start_file_watch()
+        if not watching or self.file_organizer.recursive:
+            self.scheduler.add_job('file_organization', self.run_file_organization,
+                                   at="02:00", timeout=3600)
+        
+        # Schedule backup every Sunday at 3 AM; a missed backup runs once on startup
+        self.scheduler.add_job('backup', self.run_backup_task,
+                               at="03:00", weekday="sunday", timeout=6 * 3600)
         
-        # Schedule backup every Sunday at 3 AM
-        schedule.every().sunday.at("03:00").do(self.run_backup_task)
+        # Schedule database backup every day at 1 AM
+        self.scheduler.add_job('database_backup', self.run_database_backup,
+                               at="01:00", timeout=3600)
         
-        # Schedule website monitoring every 30 minutes
-        schedule.every(30).minutes.do(self.run_website_monitoring)
+        # Schedule website monitoring every 30 minutes; stale sweeps are not worth catching up
+        self.scheduler.add_job('website_monitoring', self.run_website_monitoring,
+                               interval=30 * 60, timeout=600, jitter=30, catch_up='skip', exclusive=False)
         
         logging.info("Automation tasks scheduled successfully")
     
@@ -364,9 +4106,14 @@ class AutomationScheduler:
         """Run the scheduler continuously"""
         logging.info("Starting automation scheduler...")
         
-        while True:
-            schedule.run_pending()
-            time.sleep(60)  # Check every minute
+        try:
+            self.scheduler.run()
+        finally:
+            self.scheduler.stop(wait=False)
+            if self.coordinator:
+                self.coordinator.close()
+            if self.resource_sampler:
+                self.resource_sampler.stop()
 
 # Example usage and configuration
 def main():
@@ -375,6 +4122,12 @@ def main():
     # Initialize automation scheduler
     scheduler = AutomationScheduler()
     
+    # Keep task metrics next to the other automation state (defaults to ./task_metrics.db)
+    # scheduler.setup_task_metrics("/Users/username/.automation/task_metrics.db")
+    
+    # Share jobs with other instances using the same storage (optional)
+    # scheduler.setup_coordination("/mnt/shared/automation/leases.db")
+    
     # Configure file organization
     scheduler.setup_file_organizer(
         source_dir="/Users/username/Downloads",  # Customize path
@@ -384,7 +4137,14 @@ def main():
     # Configure backup system
     scheduler.setup_backup_manager(
         source_dirs=["/Users/username/Documents", "/Users/username/Projects"],
-        backup_dir="/Users/username/Backups"
+        backup_dir="/Users/username/Backups",
+        mode="incremental"
+    )
+    
+    # Configure online backup of the blog database
+    scheduler.setup_database_backup(
+        db_path="instance/blog.db",
+        backup_dir="/Users/username/Backups/database"
     )
     
     # Configure email automation (use app passwords for Gmail)
@@ -392,7 +4152,8 @@ def main():
         smtp_server="smtp.gmail.com",
         smtp_port=587,
         email="your-email@gmail.com",
-        password="your-app-password"
+        password="your-app-password",
+        spool_dir="/Users/username/.automation/mail_spool"
     )
     
     # Configure website monitoring
@@ -403,6 +4164,9 @@ def main():
     ]
     scheduler.setup_web_monitor(websites_to_monitor)
     
+    # Sample system resources every 5 seconds
+    scheduler.setup_resource_sampler("resource_history", interval=5)
+    
     # Schedule tasks
     scheduler.schedule_tasks()
     
@@ -415,70 +4179,55 @@ def main():
     # scheduler.run_scheduler()
 
 if __name__ == "__main__":
-    main()
+    if sys.argv[1:2] == ['metrics']:
+        # python automation_system.py metrics [days]
+        TaskMetrics(prometheus_file=None).print_summary(float(sys.argv[2]) if len(sys.argv) > 2 else None)
+    else:
+        main()
 
 # Additional standalone automation functions
 
 def bulk_file_rename(directory: str, pattern: str, replacement: str):
     """Bulk rename files matching a pattern"""
-    path = Path(directory)
-    renamed_count = 0
-    
-    for file_path in path.glob(pattern):
-        if file_path.is_file():
-            new_name = file_path.name.replace(pattern.replace('*', ''), replacement)
-            new_path = file_path.parent / new_name
-            
-            try:
-                file_path.rename(new_path)
-                logging.info(f"Renamed {file_path.name} to {new_name}")
-                renamed_count += 1
-            except Exception as e:
-                logging.error(f"Error renaming {file_path.name}: {e}")
-    
-    return renamed_count
+    # The literal part of the glob is replaced, as before, but planned and applied as one set
+    literal = pattern.replace('*', '')
+    engine = RenameEngine(directory)
+    plan = engine.plan([RenameRule(re.escape(literal), replacement.replace('\\', '\\\\'))], match=pattern)
+    for source, target, reason in plan['conflicts']:
+        logging.error(f"Error renaming {os.path.basename(source)}: {reason}")
+    return engine.execute(plan)['renamed']
 
-def generate_system_report():
-    """Generate system resource usage report"""
-    import psutil
+def generate_system_report(sampler: Optional[ResourceSampler] = None):
+    """Generate system resource usage report from the sampler's latest readings"""
+    if sampler is None or not sampler.latest:
+        # One-off report: sample CPU over a short window instead of blocking for a second
+        sampler = sampler or ResourceSampler(history_dir=None)
+        time.sleep(0.1)
+        sampler.record(time.time(), sampler.collect())
+    latest = sampler.latest
+    root = ResourceSampler.mount_label(os.path.abspath(os.sep))
     
-    report = {
-        'timestamp': datetime.now().isoformat(),
-        'cpu_percent': psutil.cpu_percent(interval=1),
+    return {
+        'timestamp': datetime.fromtimestamp(latest['timestamp']).isoformat(),
+        'cpu_percent': latest['cpu.total'],
+        'cpu_per_core': [latest[key] for key in sorted(
+            (key for key in latest if key.startswith('cpu.core')), key=lambda key: int(key[8:]))],
         'memory': {
-            'total': psutil.virtual_memory().total,
-            'available': psutil.virtual_memory().available,
-            'percent': psutil.virtual_memory().percent
+            'total': sampler.totals.get('memory'),
+            'available': latest['memory.available'],
+            'percent': latest['memory.percent']
         },
         'disk': {
-            'total': psutil.disk_usage('/').total,
-            'free': psutil.disk_usage('/').free,
-            'percent': psutil.disk_usage('/').percent
-        }
+            'total': sampler.totals.get(f'disk.{root}'),
+            'free': latest.get(f'disk.{root}.free'),
+            'percent': latest.get(f'disk.{root}.percent')
+        },
+        'process_rss': latest.get('process.self.rss')
     }
-    
-    # Save to CSV for historical tracking
-    csv_file = 'system_report.csv'
-    file_exists = os.path.isfile(csv_file)
-    
-    with open(csv_file, 'a', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=['timestamp', 'cpu_percent', 'memory_percent', 'disk_percent'])
-        
-        if not file_exists:
-            writer.writeheader()
-        
-        writer.writerow({
-            'timestamp': report['timestamp'],
-            'cpu_percent': report['cpu_percent'],
-            'memory_percent': report['memory']['percent'],
-            'disk_percent': report['disk']['percent']
-        })
-    
-    return report
 
 # Installation requirements:
 """
-pip install schedule requests psutil
+pip install requests psutil
 
 For email functionality, you may need to:
 1. Enable 2-factor authentication on Gmail
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the automation subsystems on synthetic file trees and local HTTP stand-ins.
+
+    python benchmark_automation.py run --files 20000 --duplicate-ratio 0.1 --output results.json
+    python benchmark_automation.py compare baseline.json results.json --threshold 10
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import platform
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List, Dict, Optional
+from urllib.parse import urlsplit, parse_qs
+
+from automation_system import FileOrganizer, BackupManager, RenameEngine, RenameRule, WebMonitor, psutil
+
+# Extensions spread across every FileOrganizer category plus unknown types
+EXTENSIONS = ['.jpg', '.png', '.pdf', '.txt', '.docx', '.csv', '.xlsx', '.pptx', '.mp4', '.mp3',
+              '.zip', '.py', '.html', '.json', '.bin']
+
+class PeakMemory:
+    """Track peak RSS while a benchmark runs by sampling in a background thread"""
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.process = psutil.Process() if psutil else None
+        self.peak = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def rss(self) -> int:
+        return self.process.memory_info().rss if self.process else 0
+
+    def __enter__(self):
+        self.start_rss = self.peak = self.rss()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def sample(self):
+        while not self.stop_event.wait(self.interval):
+            self.peak = max(self.peak, self.rss())
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        self.thread.join()
+        self.peak = max(self.peak, self.rss())
+
+    @property
+    def growth(self) -> int:
+        return self.peak - self.start_rss
+
+def generate_tree(root: Path, files: int, size_median: int, size_sigma: float, max_size: int,
+                  duplicate_ratio: float, depth: int = 0, seed: int = 42) -> Dict:
+    """Create files with log-normal sizes; duplicate_ratio of them repeat an earlier file's content"""
+    rng = random.Random(seed)
+    root.mkdir(parents=True, exist_ok=True)
+    directories = [root]
+    for level in range(depth):
+        directories += [directory / f'dir{level}_{index}' for directory in list(directories) for index in range(4)]
+    for directory in directories:
+        directory.mkdir(parents=True, exist_ok=True)
+
+    originals = []
+    total_bytes = 0
+    for index in range(files):
+        path = directories[index % len(directories)] / f'file{index}{EXTENSIONS[index % len(EXTENSIONS)]}'
+        if originals and rng.random() < duplicate_ratio:
+            content = rng.choice(originals)
+        else:
+            size = min(max_size, int(rng.lognormvariate(0, size_sigma) * size_median))
+            content = rng.randbytes(size)
+            # Keep a bounded pool of contents to duplicate from
+            if len(originals) < 256:
+                originals.append(content)
+            else:
+                originals[rng.randrange(256)] = content
+        path.write_bytes(content)
+        total_bytes += len(content)
+    return {'files': files, 'bytes': total_bytes, 'directories': len(directories)}
+
+def modify_tree(root: Path, fraction: float, seed: int = 7) -> int:
+    """Rewrite a fraction of the files so incremental runs have changes to pick up"""
+    rng = random.Random(seed)
+    files = sorted(path for path in root.rglob('*') if path.is_file())
+    changed = rng.sample(files, int(len(files) * fraction))
+    for path in changed:
+        path.write_bytes(rng.randbytes(max(1, path.stat().st_size)))
+    return len(changed)
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Local website stand-in with configurable latency, jitter and failure rate"""
+
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+    jitter = 0.0
+    failure_rate = 0.0
+    failure_mode = 'drop'
+    body_size = 16 * 1024
+    rng = random.Random(1)
+
+    def respond(self, send_body: bool):
+        query = parse_qs(urlsplit(self.path).query)
+        latency = float(query.get('latency', [self.latency])[0])
+        time.sleep(max(0.0, latency + self.rng.uniform(-self.jitter, self.jitter)))
+
+        if self.rng.random() < self.failure_rate:
+            if self.failure_mode == 'drop':
+                # Any HTTP response counts as reachable, so an outage means no response at all
+                self.close_connection = True
+                return
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = b'x' * self.body_size
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self.respond(send_body=True)
+
+    def do_HEAD(self):
+        self.respond(send_body=False)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stand_in(latency: float, jitter: float, failure_rate: float,
+                   failure_mode: str = 'drop') -> ThreadingHTTPServer:
+    handler = type('ConfiguredStandIn', (StandInHandler,), {
+        'latency': latency, 'jitter': jitter, 'failure_rate': failure_rate,
+        'failure_mode': failure_mode, 'rng': random.Random(1)
+    })
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def timed(function, *args, **kwargs) -> tuple:
+    """Run a function and return (result, seconds, peak RSS, RSS growth)"""
+    with PeakMemory() as memory:
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        duration = time.perf_counter() - start
+    return result, duration, memory.peak, memory.growth
+
+def rates(items: int, size: int, duration: float) -> Dict:
+    result = {'items_per_sec': round(items / duration, 1) if duration else 0.0}
+    if size:
+        result['mb_per_sec'] = round(size / duration / 1024 / 1024, 2) if duration else 0.0
+    return result
+
+def bench_organize(work: Path, args) -> Dict:
+    tree = generate_tree(work / 'downloads', args.files, args.size_median, args.size_sigma,
+                         args.max_size, args.duplicate_ratio)
+    organizer = FileOrganizer(work / 'downloads', work / 'organized', dedup='link' if args.dedup else None)
+    count, duration, peak, growth = timed(organizer.organize_files)
+    return {'duration': round(duration, 3), 'items': count, 'bytes': tree['bytes'],
+            **rates(count, tree['bytes'], duration), 'peak_rss': peak, 'rss_growth': growth,
+            'duplicates': organizer.last_stats.get('duplicates', 0)}
+
+def bench_backup(work: Path, args) -> Dict:
+    source = work / 'source'
+    tree = generate_tree(source, args.files, args.size_median, args.size_sigma, args.max_size,
+                         args.duplicate_ratio, depth=2)
+    results = {}
+    for mode in args.backup_modes:
+        backup_dir = work / f'backup_{mode}'
+        manager = BackupManager([str(source)], str(backup_dir), mode=mode, verify_backups=False)
+        _, duration, peak, growth = timed(manager.create_backup)
+        results[f'{mode}_initial'] = {'duration': round(duration, 3), 'items': tree['files'],
+                                      'bytes': tree['bytes'], **rates(tree['files'], tree['bytes'], duration),
+                                      'peak_rss': peak, 'rss_growth': growth}
+        if mode in ('incremental', 'dedup'):
+            changed = modify_tree(source, args.change_ratio)
+            time.sleep(1)  # Distinct snapshot timestamp
+            _, duration, peak, growth = timed(manager.create_backup)
+            results[f'{mode}_rerun'] = {'duration': round(duration, 3), 'items': tree['files'], 'changed': changed,
+                                        **rates(tree['files'], tree['bytes'], duration),
+                                        'peak_rss': peak, 'rss_growth': growth}
+        shutil.rmtree(backup_dir, ignore_errors=True)
+    return results
+
+def bench_rename(work: Path, args) -> Dict:
+    directory = work / 'rename'
+    directory.mkdir(parents=True)
+    for index in range(args.rename_files):
+        (directory / f'IMG_{index}.jpeg').touch()
+    engine = RenameEngine(directory, workers=args.workers, journal_dir=str(work / 'rename_journals'))
+    rules = [RenameRule(r'^IMG_(\d+)\.jpeg$', template='photo_{1:0>7}.jpg')]
+    plan, plan_duration, plan_peak, _ = timed(engine.plan, rules)
+    report, duration, peak, growth = timed(engine.execute, plan)
+    _, undo_duration, _, _ = timed(engine.undo, report['journal'])
+    return {'plan_duration': round(plan_duration, 3), 'duration': round(duration, 3),
+            'undo_duration': round(undo_duration, 3), 'items': report['renamed'],
+            **rates(report['renamed'], 0, duration), 'peak_rss': max(plan_peak, peak), 'rss_growth': growth}
+
+def bench_web(work: Path, args) -> Dict:
+    server = start_stand_in(args.latency, args.jitter, args.failure_rate, args.failure_mode)
+    port = server.server_address[1]
+    sites = [{'name': f'site{index}', 'url': f'http://127.0.0.1:{port}/site{index}'} for index in range(args.sites)]
+    monitor = WebMonitor(sites, per_host_limit=args.per_host_limit, probe=args.probe,
+                         history_dir=str(work / 'web_history'))
+    monitor.status_file = str(work / 'website_status.json')
+    try:
+        results = {}
+        for sweep in range(args.sweeps):
+            status, duration, peak, growth = timed(monitor.monitor_websites)
+            latencies = sorted(result['response_time'] for result in status.values() if 'response_time' in result)
+            up = sum(1 for result in status.values() if result['status'] == 'UP')
+            results[f'sweep{sweep + 1}'] = {
+                'duration': round(duration, 3), 'items': len(status), **rates(len(status), 0, duration),
+                'uptime_percent': round(100.0 * up / len(status), 1) if status else 0.0,
+                'error_responses': sum(1 for result in status.values() if result.get('status_code', 0) >= 500),
+                'latency_p50': percentile(latencies, 0.50), 'latency_p95': percentile(latencies, 0.95),
+                'latency_p99': percentile(latencies, 0.99),
+                'reused_connections': sum(1 for result in status.values() if result.get('reused_connection')),
+                'peak_rss': peak, 'rss_growth': growth
+            }
+        return results
+    finally:
+        server.shutdown()
+        server.server_close()
+        monitor.session.close()
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    return round(values[min(len(values) - 1, int(fraction * len(values)))], 4)
+
+BENCHMARKS = {'organize': bench_organize, 'backup': bench_backup, 'rename': bench_rename, 'web': bench_web}
+
+def flatten(results: Dict, prefix: str = '') -> Dict[str, float]:
+    """Flatten nested results into dotted metric names"""
+    flat = {}
+    for key, value in results.items():
+        name = f'{prefix}.{key}' if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+def higher_is_better(metric: str) -> Optional[bool]:
+    name = metric.rsplit('.', 1)[-1]
+    if name.endswith('_per_sec') or name in ('uptime_percent', 'reused_connections'):
+        return True
+    if 'duration' in name or 'latency' in name or 'rss' in name:
+        return False
+    return None  # Counts and sizes describe the workload rather than its speed
+
+def run(args) -> Dict:
+    logging.getLogger().setLevel(logging.WARNING)
+    selected = args.only.split(',') if args.only else list(BENCHMARKS)
+    work = Path(tempfile.mkdtemp(prefix='automation_bench_', dir=args.workdir))
+    cwd = os.getcwd()
+    # Task metrics, status files and the like land in the scratch directory
+    os.chdir(work)
+    results = {}
+    try:
+        for name in selected:
+            print(f"Running {name} benchmark...")
+            (work / name).mkdir()
+            results[name] = BENCHMARKS[name](work / name, args)
+            print(json.dumps(results[name], indent=2))
+    finally:
+        os.chdir(cwd)
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'parameters': {key: value for key, value in vars(args).items() if key not in ('func', 'output')}
+        },
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    return report
+
+def compare(args) -> int:
+    """Print per-metric changes between two result files; exit 1 if any regress past the threshold"""
+    with open(args.baseline) as f:
+        baseline_report = json.load(f)
+    with open(args.current) as f:
+        current_report = json.load(f)
+    baseline = flatten(baseline_report['results'])
+    current = flatten(current_report['results'])
+
+    # Differences in workload make the numbers incomparable, so call them out first
+    before_parameters = baseline_report['meta']['parameters']
+    after_parameters = current_report['meta']['parameters']
+    for key in sorted(before_parameters.keys() & after_parameters.keys()):
+        if key != 'only' and before_parameters[key] != after_parameters[key]:
+            print(f"Warning: {key} differs ({before_parameters[key]} vs {after_parameters[key]})")
+
+    regressions = 0
+    print(f"{'Metric':<48}{'Baseline':>14}{'Current':>14}{'Change':>10}")
+    for metric in sorted(baseline.keys() & current.keys()):
+        direction = higher_is_better(metric)
+        if direction is None:
+            continue
+        before, after = baseline[metric], current[metric]
+        change = (after - before) / before * 100 if before else 0.0
+        worse = change < -args.threshold if direction else change > args.threshold
+        regressions += worse
+        print(f"{metric:<48}{before:>14}{after:>14}{change:>9.1f}%{'  REGRESSION' if worse else ''}")
+    for label, names in (('baseline', baseline.keys() - current.keys()), ('current', current.keys() - baseline.keys())):
+        groups = {}
+        for name in names:
+            group = name.split('.', 1)[0]
+            groups[group] = groups.get(group, 0) + 1
+        if groups:
+            print(f"Only in {label}: " + ', '.join(f"{group} ({count} metrics)" for group, count in sorted(groups.items())))
+    print(f"{regressions} regressions beyond {args.threshold}%")
+    return 1 if regressions else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the automation subsystems")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="run benchmarks and report results")
+    run_parser.add_argument('--only', help=f"comma-separated subset of {','.join(BENCHMARKS)}")
+    run_parser.add_argument('--files', type=int, default=10000, help="files per synthetic tree")
+    run_parser.add_argument('--size-median', type=int, default=16 * 1024, help="median file size in bytes")
+    run_parser.add_argument('--size-sigma', type=float, default=1.5, help="log-normal spread of file sizes")
+    run_parser.add_argument('--max-size', type=int, default=64 * 1024 * 1024, help="largest file in bytes")
+    run_parser.add_argument('--duplicate-ratio', type=float, default=0.1, help="fraction of duplicate files")
+    run_parser.add_argument('--change-ratio', type=float, default=0.05, help="files changed before reruns")
+    run_parser.add_argument('--dedup', action='store_true', help="hard-link duplicates while organizing")
+    run_parser.add_argument('--backup-modes', type=lambda value: value.split(','),
+                            default=['full', 'incremental', 'dedup', 'archive'])
+    run_parser.add_argument('--rename-files', type=int, default=100000)
+    run_parser.add_argument('--workers', type=int, default=8)
+    run_parser.add_argument('--sites', type=int, default=100, help="websites served by the stand-in")
+    run_parser.add_argument('--sweeps', type=int, default=2, help="monitoring sweeps (later ones reuse connections)")
+    run_parser.add_argument('--latency', type=float, default=0.05, help="stand-in response latency in seconds")
+    run_parser.add_argument('--jitter', type=float, default=0.02, help="uniform latency jitter in seconds")
+    run_parser.add_argument('--failure-rate', type=float, default=0.05, help="fraction of requests that fail")
+    run_parser.add_argument('--failure-mode', default='drop', choices=['drop', 'error'],
+                            help="drop (default): close the connection without a response, "
+                                 "so the check is DOWN; error: answer 503, which the monitor counts as UP")
+    run_parser.add_argument('--per-host-limit', type=int, default=4,
+                            help="concurrent checks per host; every stand-in site shares one host")
+    run_parser.add_argument('--probe', default='stream', choices=WebMonitor.PROBES)
+    run_parser.add_argument('--workdir', help="parent directory for scratch trees (default: system temp)")
+    run_parser.add_argument('--keep', action='store_true', help="keep the scratch trees")
+    run_parser.add_argument('--output', help="write JSON results to this file")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser('compare', help="compare two result files")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=10.0, help="regression threshold in percent")
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    result = args.func(args)
+    if args.command == 'compare':
+        sys.exit(result)
+
+if __name__ == "__main__":
+    main()
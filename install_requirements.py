@@ -6,16 +6,192 @@ from sklearn.model_selection import train_test_split
 from sklearn.linear_model import LinearRegression
 from sklearn.metrics import mean_squared_error, r2_score
 
+class ChunkedSalesAggregates:
+    """Report aggregates accumulated one CSV chunk at a time, for files larger than memory"""
+    
+    def __init__(self, features=('marketing_spend', 'temperature'), target='sales', test_size=0.2, seed=42):
+        self.features = list(features)
+        self.target = target
+        self.test_size = test_size
+        self.rng = np.random.default_rng(seed)
+        self.rows = 0
+        self.missing = None
+        self.columns = None  # Per numeric column: n, mean, m2, min, max
+        self.products = None  # Per product: sales n, mean, m2 and marketing spend sum, count
+        self.monthly = None
+        self.corr_n = 0
+        self.corr_mean = None
+        self.corr_comoment = None
+        self.corr_columns = None  # Set by the first chunk with complete numeric rows
+        # X'X, X'y, y'y, n and sum(y) for the train and test splits of the regression
+        size = len(self.features) + 1
+        self.regression = {split: [np.zeros((size, size)), np.zeros(size), 0.0, 0, 0.0]
+                           for split in ('train', 'test')}
+    
+    @staticmethod
+    def merge_moments(a, b):
+        """Combine count/mean/m2 frames (Chan et al. parallel variance), aligned on the index"""
+        if a is None:
+            return b
+        index = a.index.union(b.index)
+        a = a.reindex(index).fillna({'n': 0, 'mean': 0.0, 'm2': 0.0})
+        b = b.reindex(index).fillna({'n': 0, 'mean': 0.0, 'm2': 0.0})
+        n = a['n'] + b['n']
+        delta = b['mean'] - a['mean']
+        weight = (b['n'] / n).fillna(0.0)
+        merged = pd.DataFrame({
+            'n': n,
+            'mean': a['mean'] + delta * weight,
+            'm2': a['m2'] + b['m2'] + delta ** 2 * a['n'] * weight
+        })
+        for column in ('min', 'max'):
+            if column in a:
+                merged[column] = getattr(pd.concat([a[column], b[column]], axis=1), column)(axis=1)
+        return merged
+    
+    def update(self, chunk):
+        """Fold one chunk of sales rows into the running aggregates"""
+        self.rows += len(chunk)
+        missing = chunk.isnull().sum()
+        self.missing = missing if self.missing is None else self.missing.add(missing, fill_value=0)
+        
+        numeric = chunk.select_dtypes(include=[np.number])
+        columns = pd.DataFrame({
+            'n': numeric.count(),
+            'mean': numeric.mean(),
+            'm2': (numeric.var() * (numeric.count() - 1)).fillna(0.0),
+            'min': numeric.min(),
+            'max': numeric.max()
+        })
+        self.columns = self.merge_moments(self.columns, columns)
+        
+        grouped = chunk.groupby('product', observed=True)
+        sales = grouped[self.target].agg(['count', 'mean', 'var'])
+        products = pd.DataFrame({
+            'n': sales['count'],
+            'mean': sales['mean'],
+            'm2': (sales['var'] * (sales['count'] - 1)).fillna(0.0)
+        })
+        spend = grouped['marketing_spend'].agg(['sum', 'count']).rename(columns={'sum': 'spend_sum', 'count': 'spend_n'})
+        if self.products is None:
+            self.products = products.join(spend)
+        else:
+            merged = self.merge_moments(self.products[['n', 'mean', 'm2']], products)
+            totals = self.products[['spend_sum', 'spend_n']].add(spend, fill_value=0)
+            self.products = merged.join(totals)
+        
+        monthly = chunk.groupby(chunk['date'].dt.to_period('M'))[self.target].sum()
+        self.monthly = monthly if self.monthly is None else self.monthly.add(monthly, fill_value=0)
+        
+        # Correlations use rows complete in every numeric column
+        values = numeric.dropna().to_numpy(dtype=np.float64)
+        if len(values):
+            mean = values.mean(axis=0)
+            centered = values - mean
+            comoment = centered.T @ centered
+            if self.corr_mean is None:
+                self.corr_n, self.corr_mean, self.corr_comoment = len(values), mean, comoment
+                self.corr_columns = list(numeric.columns)
+            else:
+                n = self.corr_n + len(values)
+                delta = mean - self.corr_mean
+                self.corr_comoment = (self.corr_comoment + comoment
+                                      + np.outer(delta, delta) * self.corr_n * len(values) / n)
+                self.corr_mean = self.corr_mean + delta * len(values) / n
+                self.corr_n = n
+        
+        # Normal equations for the regression; rows are split into train/test as they stream past
+        rows = chunk[self.features + [self.target]].dropna()
+        X = np.column_stack([np.ones(len(rows)), rows[self.features].to_numpy(dtype=np.float64)])
+        y = rows[self.target].to_numpy(dtype=np.float64)
+        test = self.rng.random(len(rows)) < self.test_size
+        for split, mask in (('train', ~test), ('test', test)):
+            stats = self.regression[split]
+            stats[0] += X[mask].T @ X[mask]
+            stats[1] += X[mask].T @ y[mask]
+            stats[2] += y[mask] @ y[mask]
+            stats[3] += int(mask.sum())
+            stats[4] += y[mask].sum()
+    
+    def describe(self):
+        stats = self.columns
+        return pd.DataFrame({
+            'count': stats['n'],
+            'mean': stats['mean'],
+            'std': np.sqrt(stats['m2'] / (stats['n'] - 1)),
+            'min': stats['min'],
+            'max': stats['max']
+        }).T
+    
+    def product_stats(self):
+        stats = self.products
+        return pd.DataFrame({
+            ('sales', 'mean'): stats['mean'],
+            ('sales', 'sum'): stats['mean'] * stats['n'],
+            ('sales', 'std'): np.sqrt(stats['m2'] / (stats['n'] - 1)),
+            ('sales', 'count'): stats['n'].astype('int64'),
+            ('marketing_spend', 'mean'): stats['spend_sum'] / stats['spend_n']
+        }).rename_axis('product').round(2)
+    
+    def monthly_sales(self):
+        return self.monthly.sort_index().rename(self.target)
+    
+    def correlation(self):
+        if self.corr_comoment is None:
+            return pd.DataFrame()  # No chunk had a row complete in every numeric column
+        scale = np.sqrt(np.diag(self.corr_comoment))
+        return pd.DataFrame(self.corr_comoment / np.outer(scale, scale),
+                            index=self.corr_columns, columns=self.corr_columns)
+    
+    def fit(self):
+        """Solve the train normal equations and score on the test split's sufficient statistics"""
+        XtX, Xty = self.regression['train'][:2]
+        beta = np.linalg.solve(XtX, Xty)
+        test_XtX, test_Xty, test_yty, test_n, test_sum = self.regression['test']
+        sse = test_yty - 2 * beta @ test_Xty + beta @ test_XtX @ beta
+        sst = test_yty - test_sum ** 2 / test_n
+        return beta[0], beta[1:], 1 - sse / sst, sse / test_n
+    
+    def total(self, column):
+        return self.columns.loc[column, 'mean'] * self.columns.loc[column, 'n']
+
 # Data Analysis Example: Sales Performance Analysis
 class SalesAnalyzer:
-    def __init__(self, data_file=None):
-        """Initialize the Sales Analyzer with optional data file"""
-        if data_file:
-            self.df = pd.read_csv(data_file)
+    # Explicit column types; categories store product and region as small integer codes
+    DTYPES = {
+        'product': 'category',
+        'region': 'category',
+        'sales': 'float64',
+        'marketing_spend': 'float64',
+        'temperature': 'float64'
+    }
+    DATE_COLUMNS = ['date']
+    
+    def __init__(self, data_file=None, chunksize=None):
+        """Initialize the Sales Analyzer with optional data file, read in chunks if chunksize is set"""
+        self.aggregates = None
+        if data_file and chunksize:
+            # Out of core: only the report aggregates are kept, never the rows
+            self.df = None
+            self.aggregates = self.aggregate_csv(data_file, chunksize)
+        elif data_file:
+            self.df = self.load_csv(data_file)
         else:
             # Generate sample data for demonstration
             self.df = self.generate_sample_data()
     
+    def load_csv(self, data_file, chunksize=None):
+        """Read sales CSV with explicit dtypes and dates parsed at load time"""
+        return pd.read_csv(data_file, dtype=self.DTYPES, parse_dates=self.DATE_COLUMNS, chunksize=chunksize)
+    
+    def aggregate_csv(self, data_file, chunksize):
+        """Stream the CSV through the report aggregates one chunk at a time"""
+        aggregates = ChunkedSalesAggregates()
+        with self.load_csv(data_file, chunksize=chunksize) as reader:
+            for chunk in reader:
+                aggregates.update(chunk)
+        return aggregates
+    
     def generate_sample_data(self):
         """Generate sample sales data for demonstration"""
         np.random.seed(42)
@@ -30,7 +206,7 @@ class SalesAnalyzer:
             'region': np.random.choice(['North', 'South', 'East', 'West'], 365)
         }
         
-        df = pd.DataFrame(data)
+        df = pd.DataFrame(data).astype({'product': 'category', 'region': 'category'})
         # Add some correlation between marketing spend and sales
         df['sales'] = df['sales'] + df['marketing_spend'] * 2 + np.random.normal(0, 50, 365)
         df['sales'] = np.maximum(df['sales'], 0)  # Ensure no negative sales
@@ -40,6 +216,14 @@ class SalesAnalyzer:
     def basic_statistics(self):
         """Generate basic statistical summary"""
         print("=== BASIC STATISTICS ===")
+        if self.df is None:
+            # Quartiles need every value, so the chunked summary stops at count/mean/std/min/max
+            stats = self.aggregates.describe()
+            print(stats)
+            print(f"\nDataset shape: ({self.aggregates.rows}, {len(self.aggregates.missing)})")
+            print(f"Missing values:\n{self.aggregates.missing.astype(int)}")
+            return stats
+        
         print(self.df.describe())
         print(f"\nDataset shape: {self.df.shape}")
         print(f"Missing values:\n{self.df.isnull().sum()}")
@@ -49,15 +233,19 @@ class SalesAnalyzer:
     def analyze_by_product(self):
         """Analyze sales performance by product"""
         print("\n=== PRODUCT ANALYSIS ===")
-        product_stats = self.df.groupby('product').agg({
-            'sales': ['mean', 'sum', 'std', 'count'],
-            'marketing_spend': 'mean'
-        }).round(2)
+        if self.df is None:
+            product_stats = self.aggregates.product_stats()
+            avg_sales = self.aggregates.products['mean']
+        else:
+            product_stats = self.df.groupby('product', observed=True).agg({
+                'sales': ['mean', 'sum', 'std', 'count'],
+                'marketing_spend': 'mean'
+            }).round(2)
+            avg_sales = self.df.groupby('product', observed=True)['sales'].mean()
         
         print(product_stats)
         
         # Find best and worst performing products
-        avg_sales = self.df.groupby('product')['sales'].mean()
         best_product = avg_sales.idxmax()
         worst_product = avg_sales.idxmin()
         
@@ -70,11 +258,15 @@ class SalesAnalyzer:
         """Analyze sales trends over time"""
         print("\n=== TIME SERIES ANALYSIS ===")
         
-        # Convert date to datetime if not already
-        self.df['date'] = pd.to_datetime(self.df['date'])
-        
-        # Create monthly aggregations
-        monthly_sales = self.df.groupby(self.df['date'].dt.to_period('M'))['sales'].sum()
+        if self.df is None:
+            monthly_sales = self.aggregates.monthly_sales()
+        else:
+            # Dates are parsed at load; convert only frames built some other way
+            if not pd.api.types.is_datetime64_any_dtype(self.df['date']):
+                self.df['date'] = pd.to_datetime(self.df['date'])
+            
+            # Create monthly aggregations
+            monthly_sales = self.df.groupby(self.df['date'].dt.to_period('M'))['sales'].sum()
         
         print("Monthly sales totals:")
         print(monthly_sales.head(10))
@@ -89,8 +281,15 @@ class SalesAnalyzer:
         """Analyze correlations between variables"""
         print("\n=== CORRELATION ANALYSIS ===")
         
-        numeric_cols = self.df.select_dtypes(include=[np.number]).columns
-        correlation_matrix = self.df[numeric_cols].corr()
+        if self.df is None:
+            correlation_matrix = self.aggregates.correlation()
+        else:
+            numeric_cols = self.df.select_dtypes(include=[np.number]).columns
+            correlation_matrix = self.df[numeric_cols].corr()
+        
+        if correlation_matrix.empty:
+            print("No rows with every numeric column filled in; nothing to correlate")
+            return correlation_matrix
         
         print("Correlation Matrix:")
         print(correlation_matrix.round(3))
@@ -109,22 +308,28 @@ class SalesAnalyzer:
         
         # Prepare features for modeling
         features = ['marketing_spend', 'temperature']
-        X = self.df[features]
-        y = self.df['sales']
-        
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        
-        # Train model
-        model = LinearRegression()
-        model.fit(X_train, y_train)
-        
-        # Make predictions
-        y_pred = model.predict(X_test)
-        
-        # Evaluate model
-        mse = mean_squared_error(y_test, y_pred)
-        r2 = r2_score(y_test, y_pred)
+        if self.df is None:
+            # Fitted from accumulated normal equations; the model predicts like a fitted LinearRegression
+            intercept, coefficients, r2, mse = self.aggregates.fit()
+            model = LinearRegression()
+            model.intercept_, model.coef_, model.n_features_in_ = intercept, coefficients, len(features)
+        else:
+            X = self.df[features]
+            y = self.df['sales']
+            
+            # Split data
+            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+            
+            # Train model
+            model = LinearRegression()
+            model.fit(X_train, y_train)
+            
+            # Make predictions
+            y_pred = model.predict(X_test)
+            
+            # Evaluate model
+            mse = mean_squared_error(y_test, y_pred)
+            r2 = r2_score(y_test, y_pred)
         
         print(f"Model Performance:")
         print(f"R² Score: {r2:.3f}")
@@ -153,19 +358,27 @@ class SalesAnalyzer:
         
         # Summary insights
         print("\n=== KEY INSIGHTS ===")
-        total_sales = self.df['sales'].sum()
-        avg_daily_sales = self.df['sales'].mean()
+        if self.df is None:
+            total_sales = self.aggregates.total('sales')
+            avg_daily_sales = self.aggregates.columns.loc['sales', 'mean']
+            total_spend = self.aggregates.total('marketing_spend')
+            best_product = self.aggregates.products['mean'].idxmax()
+        else:
+            total_sales = self.df['sales'].sum()
+            avg_daily_sales = self.df['sales'].mean()
+            total_spend = self.df['marketing_spend'].sum()
+            best_product = self.df.groupby('product', observed=True)['sales'].mean().idxmax()
         
         print(f"• Total sales: ${total_sales:,.2f}")
         print(f"• Average daily sales: ${avg_daily_sales:.2f}")
-        print(f"• Marketing ROI: {(self.df['sales'].sum() / self.df['marketing_spend'].sum()):.2f}x")
+        print(f"• Marketing ROI: {(total_sales / total_spend):.2f}x")
         print(f"• Sales prediction accuracy (R²): {r2:.3f}")
         
         return {
             'total_sales': total_sales,
             'avg_daily_sales': avg_daily_sales,
             'model_accuracy': r2,
-            'best_product': self.df.groupby('product')['sales'].mean().idxmax()
+            'best_product': best_product
         }
 
 # Example usage
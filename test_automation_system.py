@@ -0,0 +1,574 @@
+import json
+import os
+import random
+import smtplib
+import socketserver
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Dict
+from unittest import mock
+
+import automation_system
+from automation_system import (ArchiveBackup, AutomationScheduler, BackupManager, ChunkStore, DeadlineScheduler,
+                               EmailAutomation, FileOrganizer, LatencyStore, RenameEngine, RenameRule, TaskMetrics)
+
+
+class StandInSMTPHandler(socketserver.StreamRequestHandler):
+    """Minimal SMTP server: refuses configured recipients and can drop a session mid-transaction"""
+
+    def reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+            connection = server.connections
+        self.reply("220 stand-in ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip()
+            verb = command.split(' ', 1)[0].upper()
+            if verb in ('EHLO', 'HELO'):
+                self.reply("250 stand-in")
+            elif verb == 'MAIL':
+                if connection in server.drop_connections:
+                    return
+                self.reply("250 OK")
+            elif verb == 'RCPT':
+                with server.lock:
+                    server.rcpt_commands += 1
+                address = command.split(':', 1)[1].strip().strip('<>')
+                if address in server.refused:
+                    self.reply(f"{server.refused[address]} mailbox unavailable")
+                else:
+                    self.reply("250 OK")
+            elif verb == 'DATA':
+                self.reply("354 go ahead")
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                with server.lock:
+                    server.delivered += 1
+                self.reply("250 queued")
+            elif verb in ('RSET', 'NOOP'):
+                self.reply("250 OK")
+            elif verb == 'QUIT':
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("502 not implemented")
+
+
+class StandInSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, refused=(), drop_connections=()):
+        super().__init__(('127.0.0.1', 0), StandInSMTPHandler)
+        self.lock = threading.Lock()
+        # Address -> RCPT reply code; a plain collection of addresses means 550
+        self.refused = dict(refused) if isinstance(refused, dict) else {address: 550 for address in refused}
+        self.drop_connections = set(drop_connections)
+        self.connections = 0
+        self.rcpt_commands = 0
+        self.delivered = 0
+
+
+class SMTPRefusalTest(unittest.TestCase):
+    def start_server(self, **options) -> StandInSMTPServer:
+        server = StandInSMTPServer(**options)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def automation(self, server: StandInSMTPServer, pool_size: int = 1) -> EmailAutomation:
+        automation = EmailAutomation('127.0.0.1', server.server_address[1], 'sender@example.com', None,
+                                     use_tls=False, pool_size=pool_size)
+        self.addCleanup(automation.pool.close)
+        return automation
+
+    def test_refused_recipient_is_not_retried(self):
+        server = self.start_server(refused={'nobody@example.com'})
+        automation = self.automation(server)
+        message = automation.build_message('nobody@example.com', 'Subject', 'Body')
+
+        with self.assertRaises(smtplib.SMTPRecipientsRefused):
+            automation.pool.send(automation.email, 'nobody@example.com', message)
+
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(server.rcpt_commands, 1)
+        self.assertEqual(len(automation.pool.idle), 1)
+
+    def test_batch_refusal_keeps_session(self):
+        server = self.start_server(refused={'nobody@example.com'})
+        automation = self.automation(server)
+        results = automation.send_batch([
+            {'to_email': 'nobody@example.com', 'subject': 'One', 'body': 'Body'},
+            {'to_email': 'somebody@example.com', 'subject': 'Two', 'body': 'Body'},
+        ], connections=1)
+
+        self.assertEqual(results, [False, True])
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(server.rcpt_commands, 2)
+        self.assertEqual(server.delivered, 1)
+
+    def test_dropped_session_is_retried(self):
+        server = self.start_server(drop_connections={1})
+        automation = self.automation(server)
+        message = automation.build_message('somebody@example.com', 'Subject', 'Body')
+
+        automation.pool.send(automation.email, 'somebody@example.com', message)
+
+        self.assertEqual(server.connections, 2)
+        self.assertEqual(server.delivered, 1)
+
+    def queued_outcome(self, code: int) -> tuple:
+        """Queue one message to a recipient refused with code; return (spool folder, message)"""
+        server = self.start_server(refused={'nobody@example.com': code})
+        spool = tempfile.TemporaryDirectory()
+        self.addCleanup(spool.cleanup)
+        automation = EmailAutomation('127.0.0.1', server.server_address[1], 'sender@example.com', None,
+                                     use_tls=False, pool_size=1, spool_dir=spool.name, queue_workers=1)
+        self.addCleanup(automation.pool.close)
+        self.addCleanup(automation.queue.stop)
+        message_id = automation.queue.enqueue('nobody@example.com', 'Subject', 'Body')
+
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            for folder in ('dead', 'new'):
+                path = Path(spool.name) / folder / f"{message_id}.json"
+                if path.exists():
+                    message = json.loads(path.read_text())
+                    if message['attempts']:
+                        return folder, message
+            time.sleep(0.02)
+        self.fail("message was never attempted")
+
+    def test_queue_retries_temporary_refusal(self):
+        folder, message = self.queued_outcome(451)
+        self.assertEqual(folder, 'new')
+        self.assertEqual(message['attempts'], 1)
+        self.assertGreater(message['next_attempt'], time.time())
+
+    def test_queue_dead_letters_permanent_refusal(self):
+        folder, message = self.queued_outcome(550)
+        self.assertEqual(folder, 'dead')
+        self.assertEqual(message['attempts'], 1)
+
+
+class LatencyStoreRestartTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.history_dir = directory.name
+        # A minute that has already finished, so every record lands in a known bucket
+        self.base = int(time.time() // 60 * 60) - 300
+
+    def append(self, store: LatencyStore, offset: float, response_time: float = 0.1):
+        store.append('site', {'timestamp': datetime.fromtimestamp(self.base + offset).isoformat(),
+                              'status': 'UP', 'status_code': 200, 'response_time': response_time})
+
+    def checks(self, store: LatencyStore) -> int:
+        report = store.query('site', datetime.fromtimestamp(self.base - 1))
+        self.assertEqual(report['resolution'], 'minute')
+        return report['checks']
+
+    def test_counts_survive_restarts(self):
+        self.append(LatencyStore(self.history_dir), 1)
+        self.assertEqual(self.checks(LatencyStore(self.history_dir)), 1)
+
+        store = LatencyStore(self.history_dir)
+        self.append(store, 2)
+        self.assertEqual(self.checks(store), 2)
+
+        store = LatencyStore(self.history_dir)
+        self.assertEqual(self.checks(store), 2)
+        # Moving into the next minute closes the first bucket on disk
+        self.append(store, 70)
+        self.assertEqual(self.checks(store), 3)
+        self.assertEqual(self.checks(LatencyStore(self.history_dir)), 3)
+
+    def test_percentiles_stay_within_observed_range(self):
+        store = LatencyStore(self.history_dir)
+        self.append(store, 1, 0.3042)
+        self.append(store, 2, 0.321)
+        report = store.query('site', datetime.fromtimestamp(self.base - 1))
+        for key in ('p50', 'p95', 'p99'):
+            self.assertGreaterEqual(report[key], report['min'])
+            self.assertLessEqual(report[key], report['max'])
+
+
+class DeadlineSchedulerTest(unittest.TestCase):
+    def wait_for(self, condition, timeout: float = 5.0) -> bool:
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def test_instant_job_does_not_deadlock(self):
+        scheduler = DeadlineScheduler(max_workers=2)
+        runs = []
+        scheduler.add_job('instant', lambda: runs.append(time.time()), interval=0.05, catch_up='skip')
+        threading.Thread(target=scheduler.run, daemon=True).start()
+
+        # A deadlocked dispatcher never runs the job a second time and never releases the lock
+        self.assertTrue(self.wait_for(lambda: len(runs) >= 3))
+        self.assertTrue(scheduler.lock.acquire(timeout=2))
+        scheduler.lock.release()
+        scheduler.stop()
+        self.assertFalse(scheduler.jobs['instant'].last_error)
+
+    def test_job_does_not_overlap_itself(self):
+        scheduler = DeadlineScheduler(max_workers=4)
+        active = []
+        overlaps = []
+
+        def slow_job():
+            if active:
+                overlaps.append(True)
+            active.append(True)
+            time.sleep(0.2)
+            active.pop()
+
+        job = scheduler.add_job('slow', slow_job, interval=0.05, catch_up='once')
+        threading.Thread(target=scheduler.run, daemon=True).start()
+        self.assertTrue(self.wait_for(lambda: job.last_duration is not None and job.run_id >= 2))
+        scheduler.stop()
+        self.assertEqual(overlaps, [])
+
+
+class BackupRoundTripTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        self.source = self.root / 'source'
+        (self.source / 'sub').mkdir(parents=True)
+        (self.source / 'f1.txt').write_bytes(b'first file\n' * 1000)
+        (self.source / 'sub' / 'f2.bin').write_bytes(os.urandom(200 * 1024))
+        # A second name for the same inode
+        os.link(self.source / 'f1.txt', self.source / 'sub' / 'f1.txt')
+
+    def backup(self, mode: str) -> BackupManager:
+        manager = BackupManager([str(self.source)], str(self.root / f'backup_{mode}'), mode=mode)
+        self.assertEqual(len(manager.create_backup()), 1)
+        return manager
+
+    def assert_restores(self, manager: BackupManager):
+        for relative in ('f1.txt', 'sub/f1.txt', 'sub/f2.bin'):
+            destination = self.root / 'restored' / manager.mode / relative
+            self.assertEqual(manager.restore(str(self.source / relative), destination=str(destination)), destination)
+            self.assertEqual(destination.read_bytes(), (self.source / relative).read_bytes())
+
+    def test_every_mode_verifies_and_restores(self):
+        for mode in ('full', 'incremental', 'dedup', 'archive'):
+            with self.subTest(mode=mode):
+                manager = self.backup(mode)
+                verification = manager.last_verification[0]
+                self.assertEqual(verification['mismatches'], [])
+                self.assertEqual(verification['files'], 3)
+                self.assert_restores(manager)
+
+    def test_repeat_full_backup_verifies_every_file(self):
+        manager = self.backup('full')
+        time.sleep(1.1)  # Backup names carry a one-second timestamp
+        manager.create_backup()
+        self.assertEqual(manager.last_verification[0]['files'], 3)
+
+    def test_incremental_skips_only_verified_links(self):
+        manager = self.backup('incremental')
+        time.sleep(1.1)
+        (self.source / 'sub' / 'f2.bin').write_bytes(os.urandom(1024))
+        manager.create_backup()
+        verification = manager.last_verification[0]
+        self.assertEqual((verification['files'], verification['skipped']), (1, 2))
+        self.assertEqual(verification['mismatches'], [])
+
+    def test_verification_reads_only_the_backup(self):
+        hashed = []
+        def record(file_path):
+            hashed.append(Path(file_path))
+            return checksum_or_none(file_path)
+        checksum_or_none = automation_system._checksum_or_none
+        with mock.patch.object(automation_system, '_checksum_or_none', record):
+            manager = self.backup('full')
+        backup_path = Path(manager.last_verification[0]['backup'])
+        self.assertEqual(sorted(hashed), sorted(backup_path / relative
+                                                for relative in ('f1.txt', 'sub/f1.txt', 'sub/f2.bin')))
+
+    def test_verification_reports_a_corrupt_backup_file(self):
+        manager = self.backup('full')
+        backup_path = Path(manager.last_verification[0]['backup'])
+        entries = manager.scan_source(self.source, {})[0]
+        (backup_path / 'sub' / 'f2.bin').write_bytes(b'corrupted')
+        self.assertEqual(manager.verify_snapshot(backup_path, entries, set())['mismatches'], ['sub/f2.bin'])
+
+    def test_archive_stores_hard_links_as_files(self):
+        stats = ArchiveBackup().create_archive(self.source, self.root / 'source.tar.gz')
+        self.assertEqual(stats['files'], 3)
+        self.assertIn('sub/f1.txt', ArchiveBackup().load_index(self.root / 'source.tar.gz')['members'])
+
+    def test_restore_of_missing_member_returns_none(self):
+        manager = self.backup('archive')
+        index_path = ArchiveBackup.index_path(next(self.root.glob('backup_archive/*.tar.gz')))
+        index = json.loads(index_path.read_text())
+        del index['members']['sub/f2.bin']
+        index_path.write_text(json.dumps(index))
+        self.assertIsNone(manager.restore(str(self.source / 'sub' / 'f2.bin'),
+                                          destination=str(self.root / 'restored.bin')))
+
+
+class FileOrganizerCleanupTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        self.source = self.root / 'source'
+        (self.source / 'sub' / 'deep').mkdir(parents=True)
+        (self.source / 'untouched').mkdir()
+        (self.source / 'top.pdf').write_text('top')
+        (self.source / 'sub' / 'a.txt').write_text('a')
+        (self.source / 'sub' / 'deep' / 'b.jpg').write_text('b')
+
+    def run_organization(self, **options) -> FileOrganizer:
+        scheduler = AutomationScheduler()
+        scheduler.setup_task_metrics(str(self.root / 'metrics.db'), prometheus_file=None)
+        scheduler.setup_file_organizer(str(self.source), str(self.root / 'organized'), recursive=True, **options)
+        (self.root / 'organized' / 'Videos').mkdir()  # An empty category folder from an earlier run
+        self.assertEqual(scheduler.run_file_organization(), 3)
+        return scheduler.file_organizer
+
+    def test_source_folders_are_kept_by_default(self):
+        self.run_organization()
+        self.assertTrue((self.source / 'sub' / 'deep').is_dir())
+        self.assertTrue((self.source / 'untouched').is_dir())
+        self.assertFalse((self.root / 'organized' / 'Videos').exists())
+
+    def test_setup_passes_options_through(self):
+        organizer = self.run_organization(dedup='link', prune_source=True)
+        self.assertEqual((organizer.recursive, organizer.dedup, organizer.prune_source), (True, 'link', True))
+
+    def test_prune_source_removes_only_emptied_folders(self):
+        self.run_organization(prune_source=True)
+        self.assertFalse((self.source / 'sub').exists())
+        self.assertTrue((self.source / 'untouched').is_dir())
+        self.assertTrue(self.source.is_dir())
+        self.assertEqual(sorted(path.name for path in (self.root / 'organized').rglob('*.*') if path.is_file()
+                                and not path.name.startswith('.')), ['a.txt', 'b.jpg', 'top.pdf'])
+
+
+class FileOrganizerWatchTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        self.source = self.root / 'source'
+        self.source.mkdir()
+        (self.source / 'report.pdf').write_text('quarterly numbers')
+
+    def watch_arrival(self, organizer: FileOrganizer, name: str, content: str):
+        """Drop one file into a watched source folder and wait until it has been handled"""
+        stop_event = threading.Event()
+        thread = threading.Thread(target=organizer.watch, args=(stop_event,), kwargs={'settle_time': 0.01})
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(stop_event.set)
+        deadline = time.monotonic() + 5
+        while (self.source / 'report.pdf').exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        (self.source / name).write_text(content)
+        while (self.source / name).exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        stop_event.set()
+        thread.join()
+        self.assertFalse((self.source / name).exists())
+
+    def test_duplicate_arrival_is_linked(self):
+        organizer = FileOrganizer(str(self.source), str(self.root / 'organized'), dedup='link')
+        self.watch_arrival(organizer, 'copy.pdf', 'quarterly numbers')
+        original = self.root / 'organized' / 'Documents' / 'report.pdf'
+        self.assertEqual(os.stat(original).st_nlink, 2)
+        self.assertTrue((self.root / 'organized' / 'Documents' / 'copy.pdf').samefile(original))
+
+    def test_duplicate_arrival_is_skipped(self):
+        organizer = FileOrganizer(str(self.source), str(self.root / 'organized'), dedup='skip')
+        self.watch_arrival(organizer, 'copy.pdf', 'quarterly numbers')
+        self.assertEqual(sorted(path.name for path in (self.root / 'organized' / 'Documents').iterdir()),
+                         ['report.pdf'])
+
+    def test_distinct_arrival_is_moved(self):
+        organizer = FileOrganizer(str(self.source), str(self.root / 'organized'), dedup='skip')
+        self.watch_arrival(organizer, 'other.pdf', 'yearly numbers')
+        self.assertEqual(sorted(path.name for path in (self.root / 'organized' / 'Documents').iterdir()),
+                         ['other.pdf', 'report.pdf'])
+
+
+class TaskMetricsTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+
+    def counter(self, metrics: TaskMetrics, name: str) -> float:
+        for line in metrics.prometheus_text().splitlines():
+            if line.startswith(f'{name}{{task="backup"}} '):
+                return float(line.split()[-1])
+        self.fail(f"{name} not exported")
+
+    def record(self, metrics: TaskMetrics, success: bool, started: float):
+        run = automation_system.TaskRun('backup')
+        run.success = success
+        run.started = started
+        metrics.record(run)
+
+    def test_counters_survive_pruning(self):
+        metrics = TaskMetrics(str(self.root / 'metrics.db'), prometheus_file=None, retention_days=1)
+        old = time.time() - 2 * 86400
+        self.record(metrics, False, old)
+        self.record(metrics, True, old)
+        # Recording this run prunes both older ones from the history
+        self.record(metrics, True, time.time())
+        self.assertEqual(metrics.summary()['backup']['runs'], 1)
+        self.assertEqual(self.counter(metrics, 'automation_task_runs_total'), 3)
+        self.assertEqual(self.counter(metrics, 'automation_task_failures_total'), 1)
+
+    def test_totals_are_seeded_from_existing_history(self):
+        metrics = TaskMetrics(str(self.root / 'metrics.db'), prometheus_file=None)
+        self.record(metrics, False, time.time())
+        with closing(metrics.connect()) as conn, conn:
+            conn.execute("DROP TABLE totals")
+        metrics = TaskMetrics(str(self.root / 'metrics.db'), prometheus_file=None)
+        self.assertEqual(metrics.totals(), {'backup': (1, 1)})
+
+    def test_scheduler_creates_metrics_on_first_run(self):
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.root)
+        scheduler = AutomationScheduler()
+        self.assertFalse((self.root / 'task_metrics.db').exists())
+        scheduler.setup_task_metrics(str(self.root / 'custom.db'), prometheus_file=None)
+        with scheduler.track('backup'):
+            pass
+        self.assertFalse((self.root / 'task_metrics.db').exists())
+        self.assertEqual(scheduler.metrics.totals(), {'backup': (1, 0)})
+
+
+class ChunkStoreSplitTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = ChunkStore(directory.name, min_chunk=2 * 1024, avg_chunk=8 * 1024, max_chunk=32 * 1024)
+        self.data = random.Random(7).randbytes(512 * 1024)
+
+    def test_chunks_reassemble_within_size_bounds(self):
+        chunks = list(self.store.split_chunks(self.data))
+        self.assertEqual(b''.join(chunks), self.data)
+        self.assertTrue(all(self.store.min_chunk < len(chunk) <= self.store.max_chunk for chunk in chunks[:-1]))
+
+    @unittest.skipIf(automation_system.np is None, "numpy not installed")
+    def test_numpy_boundaries_match_pure_python(self):
+        with_numpy = [len(chunk) for chunk in self.store.split_chunks(self.data)]
+        with mock.patch.object(automation_system, 'np', None):
+            without_numpy = [len(chunk) for chunk in self.store.split_chunks(self.data)]
+        self.assertEqual(with_numpy, without_numpy)
+
+    def test_insertion_only_changes_nearby_chunks(self):
+        before = set(self.store.split_chunks(self.data))
+        after = list(self.store.split_chunks(b'inserted' + self.data))
+        self.assertGreater(sum(chunk in before for chunk in after), len(after) - 3)
+
+
+class FileOrganizerDedupTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        self.source = self.root / 'source'
+        self.source.mkdir()
+        self.documents = self.root / 'organized' / 'Documents'
+
+    def organize(self, dedup: str, files: Dict[str, str]) -> FileOrganizer:
+        organizer = FileOrganizer(str(self.source), str(self.root / 'organized'), dedup=dedup)
+        for name, content in files.items():
+            (self.source / name).write_text(content)
+        organizer.organize_files()
+        return organizer
+
+    def test_duplicates_are_linked_to_one_copy(self):
+        self.organize('link', {'report.pdf': 'numbers'})
+        self.organize('link', {'copy.pdf': 'numbers', 'again.pdf': 'numbers', 'other.pdf': 'words'})
+        self.assertEqual(sorted(path.name for path in self.documents.iterdir()),
+                         ['again.pdf', 'copy.pdf', 'other.pdf', 'report.pdf'])
+        self.assertEqual(os.stat(self.documents / 'report.pdf').st_nlink, 3)
+        self.assertEqual(os.stat(self.documents / 'other.pdf').st_nlink, 1)
+        self.assertEqual(list(self.source.iterdir()), [])
+
+    def test_duplicates_are_skipped(self):
+        self.organize('skip', {'report.pdf': 'numbers'})
+        self.organize('skip', {'copy.pdf': 'numbers', 'other.pdf': 'words'})
+        self.assertEqual(sorted(path.name for path in self.documents.iterdir()), ['other.pdf', 'report.pdf'])
+        self.assertEqual(list(self.source.iterdir()), [])
+
+    def test_incoming_duplicates_keep_one_copy(self):
+        self.organize('skip', {'a.pdf': 'numbers', 'b.pdf': 'numbers'})
+        self.assertEqual(len(list(self.documents.iterdir())), 1)
+
+
+class RenameEngineTest(unittest.TestCase):
+    # a.txt -> b.txt and b.txt -> a.txt through an intermediate name only the rules see
+    SWAP = [RenameRule(r'^a\.txt$', 'c_.txt'), RenameRule(r'^b\.txt$', 'a.txt'), RenameRule(r'^c_\.txt$', 'b.txt')]
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        self.folder = self.root / 'files'
+        self.folder.mkdir()
+        self.engine = RenameEngine(str(self.folder), journal_dir=str(self.root / 'journals'), keep_journals=1)
+
+    def write(self, *names: str):
+        for name in names:
+            (self.folder / name).write_text(name)
+
+    def contents(self) -> Dict[str, str]:
+        return {path.name: path.read_text() for path in self.folder.iterdir()}
+
+    def test_swap_cycle_executes_and_undoes(self):
+        self.write('a.txt', 'b.txt')
+        result = self.engine.execute(self.engine.plan(self.SWAP))
+        self.assertEqual((result['status'], result['renamed']), ('SUCCESS', 2))
+        self.assertEqual(self.contents(), {'a.txt': 'b.txt', 'b.txt': 'a.txt'})
+        self.assertEqual(self.engine.undo(result['journal'])['restored'], 2)
+        self.assertEqual(self.contents(), {'a.txt': 'a.txt', 'b.txt': 'b.txt'})
+
+    def test_conflicts_block_the_whole_plan(self):
+        self.write('x.log', 'y.log', 'p.md', 'q.md')
+        plan = self.engine.plan([RenameRule(r'^[xy]', 'z'), RenameRule(r'^p', 'q')])
+        self.assertEqual(sorted(reason.split(' as ')[0] for _, _, reason in plan['conflicts']),
+                         ['same target', 'target exists'])
+        self.assertEqual(self.engine.execute(plan)['status'], 'CONFLICTS')
+        self.assertEqual(sorted(self.contents()), ['p.md', 'q.md', 'x.log', 'y.log'])
+
+    def test_template_numbers_files_in_name_order(self):
+        self.write('b.jpg', 'a.jpg')
+        self.engine.execute(self.engine.plan([RenameRule(r'.*', template='img_{n:03d}{suffix}')], match='*.jpg'))
+        self.assertEqual(self.contents(), {'img_001.jpg': 'a.jpg', 'img_002.jpg': 'b.jpg'})
+
+    def test_only_the_newest_finished_journals_are_kept(self):
+        self.write('a.txt', 'b.txt')
+        for _ in range(3):
+            journal = self.engine.execute(self.engine.plan(self.SWAP))['journal']
+        self.assertEqual(list((self.root / 'journals').iterdir()), [Path(journal)])
+
+
+if __name__ == '__main__':
+    unittest.main()